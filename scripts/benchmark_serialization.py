@@ -0,0 +1,82 @@
+import argparse
+import json
+import sys
+import os
+import time
+from typing import List
+
+# Add src to path so we can import shared modules
+sys.path.append(os.getcwd())
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.shared.models.question import GeneratedQuestion
+from src.shared.utils.json_utils import dumps, loads, questions_json
+
+
+def make_questions(count):
+    return [
+        GeneratedQuestion(
+            id=i + 1,
+            subject="Physics",
+            grade="11",
+            medium="English",
+            chapter_id="PH01",
+            chapter_name="Measurement",
+            question_text=f"Which of the following is the SI unit of quantity {i}?",
+            question_type="mcq",
+            options=["metre", "kilogram", "second", "ampere"],
+            answer=["kilogram"],
+            explanation="The kilogram is the SI base unit of mass." * 3,
+        )
+        for i in range(count)
+    ]
+
+
+def timed(label, fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<48} {best * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare question payload serialisation paths.")
+    parser.add_argument("--count", type=int, default=10000, help="Questions per payload")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    questions = make_questions(args.count)
+    adapter = TypeAdapter(List[GeneratedQuestion])
+    print(f"Serialising {args.count} questions (best of {args.repeat})\n")
+
+    # Service side: producing the response body
+    before = timed(
+        "before: jsonable_encoder + json.dumps",
+        lambda: json.dumps(jsonable_encoder(questions)).encode(),
+        args.repeat
+    )
+    after = timed("after:  pydantic-core dump_json", lambda: questions_json(questions), args.repeat)
+    assert json.loads(before) == json.loads(after)
+
+    # Gateway side: relaying an upstream body to the client
+    timed(
+        "before: json.loads + validate + re-encode",
+        lambda: json.dumps(jsonable_encoder(adapter.validate_python(json.loads(before)))).encode(),
+        args.repeat
+    )
+    timed("after:  pass-through", lambda: bytes(after), args.repeat)
+
+    # Dict payloads (chunk results merged by /generate/pdf)
+    payload = loads(after)
+    timed("before: json.dumps (dicts)", lambda: json.dumps(payload).encode(), args.repeat)
+    timed("after:  orjson.dumps (dicts)", lambda: dumps(payload), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import sys
+import os
+
+# Add src to path so we can import shared modules
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from src.shared.core.database import create_indexes
+from src.shared.models.question import GeneratedQuestion # noqa: F401 (registers the table and its indexes)
+
+# One-time migration of GeneratedQuestion.options/answer from JSON-encoded text to
+# native JSON columns (JSONB on Postgres, JSON1 text on SQLite). Safe to re-run.
+# Run it before starting the upgraded services.
+
+BATCH_SIZE = 1000
+
+
+def to_string_list(raw):
+    """
+    Returns (value, changed): the stored value as a list of strings, and whether it
+    differs from what is stored. Plain strings (old answers) become one-item lists.
+    """
+    if raw is None or raw == "":
+        return [], True
+    if isinstance(raw, list):
+        value = raw
+    else:
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return [raw], True
+    if value is None:
+        return [], True
+    if not isinstance(value, list):
+        return [value if isinstance(value, str) else json.dumps(value)], True
+    strings = [v if isinstance(v, str) else json.dumps(v) for v in value]
+    return strings, strings != value
+
+
+def is_native(engine) -> bool:
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns("generatedquestion")}
+    return engine.dialect.name == "postgresql" and all(
+        isinstance(columns[name], JSONB) for name in ("options", "answer")
+    )
+
+
+def migrate(db_url=None, dry_run=False):
+    if not db_url:
+        db_url = os.getenv("DATABASE_URL")
+        if not db_url:
+            # Fallback to local sqlite if not specified
+            db_url = "sqlite:///database.db"
+
+    print(f"Connecting to database: {db_url}")
+    engine = create_engine(db_url)
+
+    if is_native(engine):
+        print("Columns are already JSONB; nothing to convert.")
+    else:
+        with engine.begin() as connection:
+            # Rewrite values that are not JSON arrays of strings, so every row parses
+            rewritten = 0
+            last_id = 0
+            while True:
+                rows = connection.execute(
+                    text("SELECT id, options, answer FROM generatedquestion WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                    {"last_id": last_id, "limit": BATCH_SIZE}
+                ).all()
+                if not rows:
+                    break
+                updates = []
+                for question_id, options, answer in rows:
+                    new_options, options_changed = to_string_list(options)
+                    new_answer, answer_changed = to_string_list(answer)
+                    if options_changed or answer_changed:
+                        updates.append({
+                            "id": question_id,
+                            "options": json.dumps(new_options, ensure_ascii=False),
+                            "answer": json.dumps(new_answer, ensure_ascii=False),
+                        })
+                if updates and not dry_run:
+                    connection.execute(
+                        text("UPDATE generatedquestion SET options = :options, answer = :answer WHERE id = :id"),
+                        updates
+                    )
+                rewritten += len(updates)
+                last_id = rows[-1][0]
+            print(f"{'Would rewrite' if dry_run else 'Rewrote'} {rewritten} rows.")
+
+            if engine.dialect.name == "postgresql" and not dry_run:
+                print("Converting columns to JSONB...")
+                connection.execute(text(
+                    "ALTER TABLE generatedquestion "
+                    "ALTER COLUMN options TYPE JSONB USING options::jsonb, "
+                    "ALTER COLUMN answer TYPE JSONB USING answer::jsonb"
+                ))
+            if dry_run:
+                connection.rollback()
+
+    if not dry_run:
+        # Includes the (question_type, option count) expression index
+        create_indexes(engine)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate question options/answer to native JSON columns")
+    parser.add_argument("--db", help="Database URL (optional)")
+    parser.add_argument("--dry-run", action="store_true", help="Report how many rows would change without writing")
+
+    args = parser.parse_args()
+    migrate(args.db, args.dry_run)
@@ -1,14 +1,15 @@
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from typing import List, Annotated
 import os
-import httpx
-import time
 import uuid
 from contextlib import asynccontextmanager
 
 from src.shared.core.database import get_session, create_db_and_tables
+from src.shared.utils.registration import GatewayRegistration
+from src.shared.utils.internal import gateway_urls, notify_gateways
 from src.shared.models.auth import (
     AdminUser, APIKeyMetadata, Token, TokenData, UserLogin, 
     APIKeyRequest, APIKeyResponse
@@ -24,6 +25,7 @@ SERVICE_NAME = "auth_service"
 GATEWAY_URL = os.getenv("GATEWAY_URL", "http://gateway:8000")
 SERVICE_HOST = os.getenv("SERVICE_HOST", "auth")
 SERVICE_URL = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+registration = GatewayRegistration(SERVICE_NAME, SERVICE_URL, GATEWAY_URL)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -31,43 +33,24 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     
-    # Registration with Retry
-    max_retries = 10
-    for attempt in range(max_retries):
-        try:
-            async with httpx.AsyncClient() as client:
-                print(f"Registering {SERVICE_NAME} at {SERVICE_URL} with Gateway (Attempt {attempt+1}/{max_retries})...")
-                resp = await client.post(
-                    f"{GATEWAY_URL}/registry/register", 
-                    json={"name": SERVICE_NAME, "url": SERVICE_URL},
-                    timeout=5.0
-                )
-                if resp.status_code == 200:
-                    print(f"Successfully registered {SERVICE_NAME}")
-                    break
-        except Exception as e:
-            print(f"Failed to register service (Attempt {attempt+1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-        else:
-             if resp.status_code != 200:
-                 print(f"Registration failed with status {resp.status_code}")
-                 if attempt < max_retries - 1:
-                    time.sleep(2)
-    
+    await registration.start()
+
     yield
     
-    # Deregistration
-    try:
-        async with httpx.AsyncClient() as client:
-             await client.post(
-                f"{GATEWAY_URL}/registry/deregister", 
-                json={"name": SERVICE_NAME, "url": SERVICE_URL}
-            )
-    except Exception as e:
-        print(f"Failed to deregister service: {e}")
-
-app = FastAPI(title="Auth Service", lifespan=lifespan)
+    await registration.stop()
+
+app = FastAPI(title="Auth Service", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+async def publish_token_invalidation(token_type: str, subject: str):
+    """
+    Tells every Gateway replica to drop cached verifications for a revoked key or
+    deactivated admin. Failures are logged only; the Gateway cache TTL bounds how long
+    a stale entry can live on a replica that missed the call.
+    """
+    urls = gateway_urls(GATEWAY_URL)
+    notified = await notify_gateways(urls, "/internal/auth/invalidate", [{"type": token_type, "sub": subject}])
+    if notified < len(urls):
+        print(f"Token invalidation for {token_type}:{subject} reached {notified}/{len(urls)} gateway(s)")
 
 # --- Dependencies ---
 
@@ -167,8 +150,30 @@ async def revoke_api_key(
     key_meta.is_active = False
     session.add(key_meta)
     session.commit()
+    await publish_token_invalidation("api_key", key_id)
     return {"status": "revoked", "key_id": key_id}
 
+# --- Admin Management (Admin Only) ---
+
+@app.post("/admins/{username}/deactivate")
+async def deactivate_admin(
+    username: str,
+    current_user: Annotated[AdminUser, Depends(get_current_admin)],
+    session: Session = Depends(get_session)
+):
+    if username == current_user.username:
+        raise HTTPException(status_code=400, detail="Admins cannot deactivate themselves")
+
+    user = session.exec(select(AdminUser).where(AdminUser.username == username)).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Admin user not found")
+
+    user.is_active = False
+    session.add(user)
+    session.commit()
+    await publish_token_invalidation("admin", username)
+    return {"status": "deactivated", "username": username}
+
 # --- Internal Verification Endpoint ---
 
 @app.post("/verify")
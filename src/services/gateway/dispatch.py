@@ -0,0 +1,165 @@
+import asyncio
+import os
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional, Set, Tuple, Union
+
+import httpx
+
+from src.shared.utils.json_utils import loads
+
+GATEWAY_CHUNK_CONCURRENCY = int(os.getenv("GATEWAY_CHUNK_CONCURRENCY", "4"))
+GATEWAY_CHUNK_ATTEMPTS = int(os.getenv("GATEWAY_CHUNK_ATTEMPTS", "3"))
+GATEWAY_CHUNK_TIMEOUT = float(os.getenv("GATEWAY_CHUNK_TIMEOUT", "120"))
+
+# Either a fixed list of instance URLs (used round-robin), or a picker that returns the
+# instance to use next given the ones already tried (e.g. ServiceRegistry.picker)
+Instances = Union[List[str], Callable[[Set[str]], Optional[str]]]
+
+
+class ChunkGenerationError(Exception):
+    """
+    Raised when a chunk could not be generated on any generator instance.
+    """
+
+    def __init__(self, index: int, status_code: int, detail: str):
+        super().__init__(detail)
+        self.index = index
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _pick_instance(instances: Instances, index: int, attempt: int, tried: Set[str]) -> Optional[str]:
+    if callable(instances):
+        return instances(tried)
+    return instances[(index + attempt) % len(instances)]
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.RequestError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return False
+
+
+async def generate_chunk(
+    client: httpx.AsyncClient,
+    instances: Instances,
+    index: int,
+    payload: dict,
+    semaphore: asyncio.Semaphore,
+    max_attempts: int = GATEWAY_CHUNK_ATTEMPTS,
+    timeout: float = GATEWAY_CHUNK_TIMEOUT
+) -> list:
+    """
+    Sends one chunk to a generator instance, retrying on another instance on failure.
+    With a list, chunks start on different instances (round-robin by index); with a
+    picker, each attempt goes to the least loaded instance not yet tried.
+    """
+    async with semaphore:
+        last_error: Optional[Exception] = None
+        tried: Set[str] = set()
+        for attempt in range(max_attempts):
+            target_url = _pick_instance(instances, index, attempt, tried)
+            if target_url is None:
+                break
+            tried.add(target_url)
+            try:
+                print(f"Processing chunk {index+1} on {target_url} (attempt {attempt+1}/{max_attempts})...")
+                response = await client.post(f"{target_url}/generate", json=payload, timeout=timeout)
+                response.raise_for_status()
+                questions = loads(response.content)
+                print(f"Got {len(questions)} questions from chunk {index+1}")
+                return questions
+            except (httpx.RequestError, httpx.HTTPStatusError) as exc:
+                last_error = exc
+                print(f"Error processing chunk {index+1} on {target_url}: {exc}")
+                if not _is_retryable(exc):
+                    break
+
+        if isinstance(last_error, httpx.HTTPStatusError):
+            raise ChunkGenerationError(index, last_error.response.status_code, last_error.response.text)
+        if last_error is None:
+            raise ChunkGenerationError(index, 503, "No healthy instances for service: generator")
+        raise ChunkGenerationError(index, 503, f"Generation service unreachable: {last_error}")
+
+
+async def dispatch_chunks(
+    client: httpx.AsyncClient,
+    instances: Instances,
+    payloads: List[dict],
+    concurrency: int = GATEWAY_CHUNK_CONCURRENCY
+) -> List[list]:
+    """
+    Generates all chunks concurrently (bounded by `concurrency`) across the given instances.
+    Results are returned in chunk order. If any chunk fails on every attempt, the
+    remaining chunks are cancelled and the ChunkGenerationError is raised.
+    """
+    if not instances:
+        raise ChunkGenerationError(0, 503, "No healthy instances for service: generator")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.create_task(generate_chunk(client, instances, i, payload, semaphore))
+        for i, payload in enumerate(payloads)
+    ]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def stream_chunks(
+    client: httpx.AsyncClient,
+    instances: Instances,
+    payloads: AsyncIterable[dict],
+    concurrency: int = GATEWAY_CHUNK_CONCURRENCY
+) -> AsyncIterator[Tuple[int, Optional[list], Optional[ChunkGenerationError]]]:
+    """
+    Generates chunks as they arrive from `payloads` and yields (index, questions, error)
+    in completion order, so callers can forward each chunk's questions immediately.
+    A failed chunk is reported with its error and does not stop the others.
+    """
+    if not instances:
+        raise ChunkGenerationError(0, 503, "No healthy instances for service: generator")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+
+    async def run(index: int, payload: dict):
+        try:
+            questions = await generate_chunk(client, instances, index, payload, semaphore)
+            results.put_nowait((index, questions, None))
+        except ChunkGenerationError as exc:
+            results.put_nowait((index, None, exc))
+        except Exception as exc:
+            # e.g. a 200 with a non-JSON body; every task must report, or the stream waits forever
+            print(f"Unexpected error processing chunk {index+1}: {exc}")
+            results.put_nowait((index, None, ChunkGenerationError(index, 502, str(exc))))
+
+    async def produce():
+        async for payload in payloads:
+            tasks.append(asyncio.create_task(run(len(tasks), payload)))
+
+    producer = asyncio.create_task(produce())
+    received = 0
+    try:
+        while not (producer.done() and received == len(tasks)):
+            getter = asyncio.ensure_future(results.get())
+            waiting = {getter} if producer.done() else {getter, producer}
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                received += 1
+                yield getter.result()
+            else:
+                getter.cancel()
+            if producer.done() and producer.exception() is not None:
+                raise producer.exception()
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(producer, *tasks, return_exceptions=True)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional
+
+GATEWAY_EXPORT_CACHE_ENABLED = os.getenv("GATEWAY_EXPORT_CACHE_ENABLED", "true").lower() == "true"
+GATEWAY_EXPORT_CACHE_DIR = os.getenv(
+    "GATEWAY_EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "qgen-export-cache")
+)
+GATEWAY_EXPORT_CACHE_MAX_BYTES = int(os.getenv("GATEWAY_EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def chapter_hash(subject: str, grade: str, medium: str, chapter_id: str) -> str:
+    """
+    Prefix shared by every cached artefact of one chapter, so the chapter can be invalidated at once.
+    """
+    raw = json.dumps([subject, grade, medium, chapter_id], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def export_key(params: dict, version: dict) -> str:
+    """
+    Content address of an export: its query parameters plus the QBank version of the matching questions.
+    """
+    raw = json.dumps([sorted(params.items()), version.get("count"), version.get("max_id")], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """
+    Finished PDF exports on local disk, evicted least-recently-used beyond max_bytes.
+    Files are named <chapter_hash>-<export_key>.pdf; the index is rebuilt from the
+    directory on start, so artefacts survive restarts.
+    """
+
+    def __init__(
+        self,
+        directory: str = GATEWAY_EXPORT_CACHE_DIR,
+        max_bytes: int = GATEWAY_EXPORT_CACHE_MAX_BYTES,
+        enabled: bool = GATEWAY_EXPORT_CACHE_ENABLED
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, int]" = OrderedDict() # filename -> size, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pdf"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def _filename(self, chapter: str, key: str) -> str:
+        return f"{chapter}-{key}.pdf"
+
+    def open(self, chapter: str, key: str) -> Optional[BinaryIO]:
+        """
+        Returns an open handle on a cached artefact, or None. The handle stays valid
+        even if the file is evicted while it is being sent.
+        """
+        if not self.enabled:
+            return None
+        name = self._filename(chapter, key)
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                fileobj = open(os.path.join(self.directory, name), "rb")
+            except FileNotFoundError:
+                self._bytes -= self._entries.pop(name)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return fileobj
+
+    def put(self, chapter: str, key: str, source: BinaryIO):
+        """
+        Copies a finished PDF (read from its current position) into the cache.
+        """
+        if not self.enabled:
+            return
+        name = self._filename(chapter, key)
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(source, f)
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to cache export {name}: {e}")
+            return
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._remove(name)
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def invalidate_chapter(self, chapter: str) -> int:
+        """
+        Drops every cached artefact of a chapter. Returns how many were removed.
+        """
+        prefix = f"{chapter}-"
+        with self._lock:
+            names = [name for name in self._entries if name.startswith(prefix)]
+            for name in names:
+                self._bytes -= self._entries.pop(name)
+                self._remove(name)
+        return len(names)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,21 +1,54 @@
 import httpx
-from fastapi import FastAPI, HTTPException, Query, Request, UploadFile, File, Form, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, UploadFile, File, Form, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from typing import List, Optional
 from src.shared.models.question import GeneratedQuestion, SyllabusContent
-from src.shared.utils.pdf_utils import extract_text_from_pdf
-from src.shared.utils.pdf_generator import generate_question_pdf
-from src.shared.utils.text_utils import chunk_text
+from src.shared.models.job import JobRequest, JobStatus
+from src.shared.utils.pdf_utils import spool_to_disk, aextract_pdf_pages, aiter_pdf_pages, text_cache_stats
+from src.shared.utils.pdf_generator import write_question_pdf, prerender_math
+from src.shared.utils.workers import shutdown_process_pool
+from src.shared.utils.json_utils import dumps, loads, passthrough
+from src.shared.utils.internal import verify_internal_token
+from src.shared.utils.text_utils import iter_chunks, aiter_chunks
+from src.services.gateway.upstream import UpstreamPools
+from src.services.gateway.registry import ServiceRegistry, for_service
+from src.services.gateway.token_cache import TokenCache
+from src.services.gateway.export_cache import ExportCache, chapter_hash, export_key
+from src.services.gateway.response_cache import ResponseCache, cache_key
+from src.services.gateway.singleflight import SingleFlight, SharedFile
+from src.services.gateway.dispatch import dispatch_chunks, stream_chunks, ChunkGenerationError, Instances
+from contextlib import asynccontextmanager
+import asyncio
+import itertools
 import os
+import tempfile
+
+# Service Registry: instances register with leases renewed by heartbeats and are health-checked
+service_registry = ServiceRegistry(["science_qbank", "general_qbank", "generator", "auth_service"])
+
+# Shared connection pools to the upstream services (one pool per upstream group)
+upstreams = UpstreamPools(service_registry)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    upstreams.start(["auth_service", "general_qbank", "generator"])
+    service_registry.start()
+    yield
+    await service_registry.stop()
+    await upstreams.aclose()
+    shutdown_process_pool()
 
 app = FastAPI(
     title="Question Gen Gateway",
     description="Gateway service for the Question Generation Engine. Routes requests to specialized services.",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Mount Static Documentation (MkDocs)
@@ -32,46 +65,50 @@ def root():
 # Configuration
 from pydantic import BaseModel
 
-# Service Registry
-SERVICE_REGISTRY = {
-    "science_qbank": [], 
-    "general_qbank": [],
-    "generator": [],
-    "auth_service": []
-}
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Verified token payloads; the Auth Service pushes invalidations on revocation
+token_cache = TokenCache()
+
 async def verify_auth_token(token: str = Depends(oauth2_scheme)):
     """
     Verifies the token by calling the Auth Service.
     We proxy the verification to ensure revocation checks are respected.
+    Successful verifications are cached until the TTL or token expiry, and are
+    evicted as soon as the Auth Service reports a revocation.
     """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     auth_service_url = get_service_url("auth_service")
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{auth_service_url}/verify", json={"token": token})
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail="Invalid Authentication")
-        except httpx.RequestError:
-             raise HTTPException(status_code=503, detail="Auth Service Unavailable")
+    client = upstreams.client_for("auth_service")
+    generation = token_cache.generation(token)
+    try:
+        response = await client.post(f"{auth_service_url}/verify", json={"token": token})
+        response.raise_for_status()
+        payload = response.json()
+        token_cache.put(token, payload, generation)
+        return payload
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail="Invalid Authentication")
+    except httpx.RequestError:
+         raise HTTPException(status_code=503, detail="Auth Service Unavailable")
 
 # --- Auth Proxy Endpoints ---
 
 @app.post("/auth/token", tags=["Auth"], summary="Admin Login")
 async def login_proxy(form_data: OAuth2PasswordRequestForm = Depends()):
     auth_service_url = get_service_url("auth_service")
-    async with httpx.AsyncClient() as client:
-        # Re-construct form data
-        response = await client.post(
-            f"{auth_service_url}/token", 
-            data={"username": form_data.username, "password": form_data.password}
-        )
-        if response.status_code != 200:
-             raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+    client = upstreams.client_for("auth_service")
+    # Re-construct form data
+    response = await client.post(
+        f"{auth_service_url}/token", 
+        data={"username": form_data.username, "password": form_data.password}
+    )
+    if response.status_code != 200:
+         raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
 
 @app.get("/auth/users/me", tags=["Auth"])
 async def read_users_me_proxy(current_user: dict = Depends(verify_auth_token)):
@@ -87,32 +124,85 @@ async def create_api_key_proxy(request: Request, current_user: dict = Depends(ve
     body = await request.json()
     headers = {"Authorization": request.headers.get("Authorization")}
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{auth_service_url}/api-keys", json=body, headers=headers)
-        return response.json()
+    client = upstreams.client_for("auth_service")
+    response = await client.post(f"{auth_service_url}/api-keys", json=body, headers=headers)
+    return response.json()
 
 @app.get("/auth/api-keys", tags=["Auth"])
 async def list_api_keys_proxy(request: Request, current_user: dict = Depends(verify_auth_token)):
     auth_service_url = get_service_url("auth_service")
     headers = {"Authorization": request.headers.get("Authorization")}
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{auth_service_url}/api-keys", headers=headers)
-        if response.status_code != 200:
-             raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+    client = upstreams.client_for("auth_service")
+    response = await client.get(f"{auth_service_url}/api-keys", headers=headers)
+    if response.status_code != 200:
+         raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
 
 @app.delete("/auth/api-keys/{key_id}", tags=["Auth"])
 async def revoke_api_key_proxy(key_id: str, request: Request, current_user: dict = Depends(verify_auth_token)):
     auth_service_url = get_service_url("auth_service")
     headers = {"Authorization": request.headers.get("Authorization")}
     
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{auth_service_url}/api-keys/{key_id}", headers=headers)
-        if response.status_code != 200:
-             raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+    client = upstreams.client_for("auth_service")
+    response = await client.delete(f"{auth_service_url}/api-keys/{key_id}", headers=headers)
+    if response.status_code != 200:
+         raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
 
+@app.post("/auth/admins/{username}/deactivate", tags=["Auth"])
+async def deactivate_admin_proxy(username: str, request: Request, current_user: dict = Depends(verify_auth_token)):
+    auth_service_url = get_service_url("auth_service")
+    headers = {"Authorization": request.headers.get("Authorization")}
+    
+    client = upstreams.client_for("auth_service")
+    response = await client.post(f"{auth_service_url}/admins/{username}/deactivate", headers=headers)
+    if response.status_code != 200:
+         raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
+
+class TokenInvalidation(BaseModel):
+    type: str # "api_key" or "admin"
+    sub: str # key_id or username
+
+@app.post(
+    "/internal/auth/invalidate",
+    tags=["System"],
+    summary="Invalidate Cached Tokens",
+    dependencies=[Depends(verify_internal_token)]
+)
+def invalidate_tokens(param: TokenInvalidation):
+    """
+    Called by the Auth Service when an API key is revoked or an admin is deactivated.
+    Evicts every cached verification for that subject. Requires the X-Internal-Token header.
+    """
+    removed = token_cache.invalidate(param.type, param.sub)
+    print(f"Invalidated {removed} cached token(s) for {param.type}:{param.sub}")
+    return {"status": "invalidated", "removed": removed}
+
+class QuestionsChanged(BaseModel):
+    subject: str
+    grade: str
+    medium: str
+    chapter_id: str
+
+@app.post(
+    "/internal/questions/invalidate",
+    tags=["System"],
+    summary="Invalidate Cached Exports",
+    dependencies=[Depends(verify_internal_token)]
+)
+def invalidate_questions(param: QuestionsChanged):
+    """
+    Called by the Generator after it saves new questions for a chapter.
+    Drops the chapter's cached PDF exports and every cached `/questions` response that
+    could include the chapter. Requires the X-Internal-Token header.
+    """
+    removed = export_cache.invalidate_chapter(chapter_hash(param.subject, param.grade, param.medium, param.chapter_id))
+    responses = response_cache.invalidate_chapter(param.subject, param.grade, param.medium, param.chapter_id)
+    chapter = f"{param.subject}/{param.grade}/{param.medium}/{param.chapter_id}"
+    print(f"Invalidated {removed} cached export(s) and {responses} cached response(s) for {chapter}")
+    return {"status": "invalidated", "removed": removed, "responses_removed": responses}
 
 class ServiceRegistration(BaseModel):
     name: str
@@ -121,43 +211,187 @@ class ServiceRegistration(BaseModel):
 @app.post("/registry/register", tags=["System"], summary="Register a Service")
 def register_service(param: ServiceRegistration):
     """
-    Registers a new service instance with the gateway.
+    Registers a new service instance with the gateway, or renews its lease.
+    Instances must call this again within `lease_seconds` to stay registered.
     """
-    if param.name not in SERVICE_REGISTRY:
-        SERVICE_REGISTRY[param.name] = []
-    
-    if param.url not in SERVICE_REGISTRY[param.name]:
-        SERVICE_REGISTRY[param.name].append(param.url)
-        print(f"Registered {param.name} at {param.url}")
-    return {"status": "registered", "current_nodes": len(SERVICE_REGISTRY[param.name])}
+    nodes = service_registry.register(param.name, param.url)
+    return {"status": "registered", "current_nodes": nodes, "lease_seconds": service_registry.lease}
 
 @app.post("/registry/deregister", tags=["System"], summary="Deregister a Service")
 def deregister_service(param: ServiceRegistration):
     """
     Removes a service instance from the gateway registry.
     """
-    if param.name in SERVICE_REGISTRY and param.url in SERVICE_REGISTRY[param.name]:
-        SERVICE_REGISTRY[param.name].remove(param.url)
-        print(f"Deregistered {param.name} at {param.url}")
+    service_registry.deregister(param.name, param.url)
     return {"status": "deregistered"}
 
-import random
-
 def get_service_url(service_name: str) -> str:
-    urls = SERVICE_REGISTRY.get(service_name, [])
-    if not urls:
+    """
+    Returns the least loaded healthy instance of a service.
+    """
+    url = service_registry.pick(service_name)
+    if url is None:
         raise HTTPException(status_code=503, detail=f"No healthy instances for service: {service_name}")
-    return random.choice(urls)
+    return url
+
+def _qbank_for(subject: Optional[str], warn: bool = False) -> str:
+    """
+    The subject's dedicated QBank service if one is registered, else general_qbank.
+    """
+    if subject:
+        potential_service = f"{subject.lower()}_qbank"
+        if service_registry.has(potential_service):
+            return potential_service
+        if warn:
+            print(f"Warning: No dedicated service found for '{subject}', falling back to general_qbank.")
+    return "general_qbank"
 
 @app.get("/health", tags=["System"], summary="Health Check")
 def health_check():
     """
     Checks the health of the Gateway service.
+    Includes registered instances with their load, and connection pool utilisation
+    for each upstream group.
+    """
+    return {
+        "status": "ok",
+        "service": "Gateway",
+        "registry": service_registry.stats(),
+        "pools": upstreams.stats(),
+        "token_cache": token_cache.stats(),
+        "export_cache": export_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": {"exports": export_flights.stats(), "questions": question_flights.stats()},
+        "pdf_text_cache": text_cache_stats()
+    }
+
+# PDF exports are CPU heavy; beyond this many at once, requests wait their turn
+GATEWAY_MAX_CONCURRENT_EXPORTS = int(os.getenv("GATEWAY_MAX_CONCURRENT_EXPORTS", "2"))
+export_semaphore = asyncio.Semaphore(max(1, GATEWAY_MAX_CONCURRENT_EXPORTS))
+
+# Export page size requested from the QBank, and how much of a finished PDF stays in memory
+GATEWAY_EXPORT_PAGE_SIZE = int(os.getenv("GATEWAY_EXPORT_PAGE_SIZE", "200"))
+GATEWAY_EXPORT_SPOOL_BYTES = int(os.getenv("GATEWAY_EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+EXPORT_READ_SIZE = 64 * 1024
+
+# Finished PDF artefacts, keyed by export parameters + QBank version
+export_cache = ExportCache()
+
+# Identical exports and /questions reads in flight at the same time share one build / upstream call
+export_flights = SingleFlight()
+question_flights = SingleFlight()
+
+async def _iter_question_pages(client: httpx.AsyncClient, service: str, url: str, params: dict):
+    """
+    Follows the QBank's keyset pagination, yielding one page of questions at a time
+    with its math already rendered by the worker pool.
     """
-    return {"status": "ok", "service": "Gateway", "registry": SERVICE_REGISTRY}
+    page_params = dict(params, limit=GATEWAY_EXPORT_PAGE_SIZE)
+    while True:
+        response = await client.get(url, params=page_params, extensions=for_service(service))
+        response.raise_for_status()
+        questions = [GeneratedQuestion(**q) for q in loads(response.content)]
+        await prerender_math(questions)
+        yield questions
+        next_after_id = response.headers.get("X-Next-After-Id")
+        if not next_after_id:
+            return
+        page_params["after_id"] = next_after_id
+
+def _pages_from_thread(loop: asyncio.AbstractEventLoop, pages):
+    """
+    Lets the PDF build thread pull pages from an async iterator running on the event loop.
+    """
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(pages.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+def _iter_file(fileobj):
+    try:
+        while True:
+            data = fileobj.read(EXPORT_READ_SIZE)
+            if not data:
+                break
+            yield data
+    finally:
+        fileobj.close()
+
+def _etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/").strip('"') == key for tag in tags)
+
+async def _export_version(client: httpx.AsyncClient, service: str, target_url: str, params: dict) -> dict:
+    """
+    Version stamp of the matching questions; it changes whenever the chapter does.
+    """
+    version_response = await client.get(
+        f"{target_url}/questions/version", params=params, extensions=for_service(service)
+    )
+    version_response.raise_for_status()
+    version = version_response.json()
+    if not version["count"]:
+        raise HTTPException(status_code=404, detail="No questions found in the specified range.")
+    return version
+
+def _export_headers(filename: str, key: str) -> dict:
+    return {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "ETag": f'"{key}"',
+        "Cache-Control": "no-cache"
+    }
+
+async def _cached_export_response(request: Request, chapter: str, key: str, headers: dict) -> Optional[Response]:
+    """
+    `304 Not Modified` for a matching If-None-Match, the cached artefact if there is one,
+    otherwise None.
+    """
+    if _etag_matches(request.headers.get("if-none-match"), key):
+        return Response(status_code=304, headers={"ETag": headers["ETag"]})
+    cached = await asyncio.to_thread(export_cache.open, chapter, key)
+    if cached is None:
+        return None
+    return StreamingResponse(_iter_file(cached), media_type="application/pdf", headers=headers)
+
+async def _build_export(
+    client: httpx.AsyncClient, service: str, target_url: str, params: dict, chapter: str, key: str
+) -> SharedFile:
+    """
+    Builds the PDF into a spooled temporary file and stores it in the export cache.
+    """
+    print(f"Fetching questions from {target_url} with params {params}")
+    async with export_semaphore:
+        pages = _iter_question_pages(client, service, f"{target_url}/questions", params)
+        first_page = await anext(pages, None)
+        if not first_page:
+            await pages.aclose()
+            # Return empty PDF or error? Error is better to inform user.
+            raise HTTPException(status_code=404, detail="No questions found in the specified range.")
+
+        # 2. Generate PDF (off the event loop; later pages are fetched as the build reaches them)
+        spool = tempfile.SpooledTemporaryFile(max_size=GATEWAY_EXPORT_SPOOL_BYTES)
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.to_thread(
+                write_question_pdf,
+                itertools.chain([first_page], _pages_from_thread(loop, pages)),
+                spool
+            )
+            spool.seek(0)
+            await asyncio.to_thread(export_cache.put, chapter, key, spool)
+        except BaseException:
+            spool.close()
+            raise
+        finally:
+            await pages.aclose()
+    return SharedFile(spool)
 
 @app.get("/questions/export/pdf", tags=["Export"], summary="Export Questions to PDF")
 async def export_questions_pdf(
+    request: Request,
     subject: str,
     grade: str,
     medium: str,
@@ -166,97 +400,159 @@ async def export_questions_pdf(
     end_id: Optional[int] = None
 ):
     """
-    Fetches questions from the QBank and generates a PDF file.
+    Fetches questions from the QBank page by page and generates a PDF file.
+    The document is written to a spooled temporary file, so memory stays bounded
+    however large the bank is.
+
+    Finished PDFs are cached on disk against the chapter's QBank version and served
+    with an ETag; a matching `If-None-Match` gets `304 Not Modified`. Concurrent
+    requests for the same export share a single build.
     """
     # 1. Fetch questions from QBank (or specific subject QBank)
-    target_service = "general_qbank"
-    if subject:
-         # Try to find a specific service
-        potential_service = f"{subject.lower()}_qbank"
-        if potential_service in SERVICE_REGISTRY and SERVICE_REGISTRY[potential_service]:
-            target_service = potential_service
-            
+    target_service = _qbank_for(subject)
     target_url = get_service_url(target_service)
+    client = upstreams.client_for(target_service)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            params = {
-                "subject": subject,
-                "grade": grade,
-                "medium": medium,
-                "chapter_id": chapter_id
-            }
-            if start_id:
-                params["start_id"] = start_id
-            if end_id:
-                params["end_id"] = end_id
-                
-            print(f"Fetching questions from {target_url} with params {params}")
-            response = await client.get(f"{target_url}/questions", params=params)
-                
-            print(f"Fetching questions from {target_url} with params {params}")
-            response = await client.get(f"{target_url}/questions", params=params)
-            response.raise_for_status()
-            questions_data = response.json()
-            
-            # Convert back to objects
-            questions = [GeneratedQuestion(**q) for q in questions_data]
-            
-            if not questions:
-                # Return empty PDF or error? Error is better to inform user.
-                raise HTTPException(status_code=404, detail="No questions found in the specified range.")
-            
-            # 2. Generate PDF
-            pdf_buffer = generate_question_pdf(questions)
-            
-            # 3. Stream Response
-            filename = f"questions_{subject}_{chapter_id}.pdf"
-            return StreamingResponse(
-                pdf_buffer, 
-                media_type="application/pdf",
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
+    try:
+        params = {
+            "subject": subject,
+            "grade": grade,
+            "medium": medium,
+            "chapter_id": chapter_id
+        }
+        if start_id:
+            params["start_id"] = start_id
+        if end_id:
+            params["end_id"] = end_id
             
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+        version = await _export_version(client, target_service, target_url, params)
+        chapter = chapter_hash(subject, grade, medium, chapter_id)
+        key = export_key(params, version)
+        headers = _export_headers(f"questions_{subject}_{chapter_id}.pdf", key)
+        cached = await _cached_export_response(request, chapter, key, headers)
+        if cached is not None:
+            return cached
+
+        # Pin the export to the versioned questions, so the artefact matches its key
+        if end_id is None or end_id > version["max_id"]:
+            params["end_id"] = version["max_id"]
+
+        # Concurrent requests for the same export wait for one build and stream the same file
+        shared = await export_flights.do(
+            key, lambda: _build_export(client, target_service, target_url, params, chapter, key),
+            on_shared=lambda result, waiters: result.share(waiters),
+            on_abandoned=lambda result: result.release()
+        )
+        
+        # 3. Stream Response (the share is also released if the body is never streamed)
+        reader = shared.iter_chunks(EXPORT_READ_SIZE)
+        return StreamingResponse(
+            reader, media_type="application/pdf", headers=headers, background=BackgroundTask(reader.close)
+        )
+        
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+
+# Pagination headers set by the QBank and passed through to clients
+PAGINATION_HEADERS = ["X-Next-After-Id", "X-Total-Count"]
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Raw QBank response bodies for repeated /questions reads, dropped when a chapter changes
+response_cache = ResponseCache()
+
+def _forward_params(**values) -> dict:
+    """
+    Query params for the QBank: unset and empty values are dropped, True becomes "true".
+    """
+    return {
+        name: "true" if value is True else value
+        for name, value in values.items()
+        if value is not None and value is not False and value != ""
+    }
+
+def _cached_questions_response(key: str) -> Optional[Response]:
+    cached = response_cache.get(key)
+    if cached is None:
+        return None
+    return Response(content=cached.body, media_type="application/json", headers={**cached.headers, "X-Cache": "HIT"})
+
+async def _fetch_questions(client: httpx.AsyncClient, service: str, target_url: str, params: dict, key: str):
+    """
+    Reads one page from the QBank and stores it in the response cache, unless the
+    chapter was invalidated while the call was in flight.
+    """
+    generation = response_cache.generation()
+    upstream = await client.get(f"{target_url}/questions", params=params, extensions=for_service(service))
+    upstream.raise_for_status()
+    headers = {h: upstream.headers[h] for h in PAGINATION_HEADERS if h in upstream.headers}
+    response_cache.put(key, upstream.content, headers, generation)
+    return upstream.content, headers
 
 @app.get("/questions", response_model=List[GeneratedQuestion], tags=["QBank"], summary="List Questions")
 async def list_questions(
+    request: Request,
     medium: Optional[str] = None, 
-    subject: Optional[str] = None
+    subject: Optional[str] = None,
+    grade: Optional[str] = None,
+    chapter_id: Optional[str] = None,
+    question_type: Optional[str] = None,
+    option_count: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = None,
+    include_total: bool = False
 ):
     """
-    Retrieves a list of questions from the appropriate QBank service.
+    Retrieves a page of questions from the appropriate QBank service.
+    Follow the `X-Next-After-Id` header (pass it as `after_id`) to fetch the next page.
+    Send `Accept: application/x-ndjson` to stream every matching question instead; the
+    QBank's bytes are piped straight through without being parsed here.
+
+    Pages are served from the gateway's response cache when the same query was answered
+    recently and the chapter has not changed since (`X-Cache: HIT`).
     """
-    # Dynamic Lookup
-    target_service = "general_qbank"
-    
-    if subject:
-        # Try to find a specific service for this subject
-        potential_service = f"{subject.lower()}_qbank"
-        if potential_service in SERVICE_REGISTRY and SERVICE_REGISTRY[potential_service]:
-            target_service = potential_service
-        else:
-            print(f"Warning: No dedicated service found for '{subject}', falling back to general_qbank.")
-    
+    target_service = _qbank_for(subject, warn=True)
     target_url = get_service_url(target_service)
+    client = upstreams.client_for(target_service)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            # Forward query params
-            params = {}
-            if medium: params['medium'] = medium
-            if subject: params['subject'] = subject
-            
-            response = await client.get(f"{target_url}/questions", params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+    try:
+        # Forward query params
+        params = _forward_params(
+            medium=medium,
+            subject=subject,
+            grade=grade,
+            chapter_id=chapter_id,
+            question_type=question_type,
+            option_count=option_count,
+            limit=limit,
+            after_id=after_id,
+            include_total=include_total
+        )
+
+        if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            return await _proxy_stream(
+                client, "GET", f"{target_url}/questions",
+                params=params,
+                headers={"Accept": NDJSON_MEDIA_TYPE},
+                extensions=for_service(target_service)
+            )
+        
+        key = cache_key({**params, "service": target_service})
+        cached = _cached_questions_response(key)
+        if cached is not None:
+            return cached
+
+        # Identical reads arriving together share one QBank call
+        body, headers = await question_flights.do(
+            key, lambda: _fetch_questions(client, target_service, target_url, params, key)
+        )
+        # The QBank's JSON is passed through as-is rather than parsed and re-serialised
+        return Response(content=body, media_type="application/json", headers={**headers, "X-Cache": "MISS"})
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
 
 @app.post("/generate", response_model=List[GeneratedQuestion], tags=["Generator"], summary="Generate Questions")
 async def generate_questions(
@@ -268,26 +564,125 @@ async def generate_questions(
     """
     target_url = get_service_url("generator")
     print(f"Routing generation request to: {target_url}") 
+    client = upstreams.client_for("generator")
+    
+    try:
+        # Forward the request body
+        response = await client.post(
+            f"{target_url}/generate", 
+            json=content.model_dump(),
+            timeout=60.0 # Generation takes time
+        )
+        response.raise_for_status()
+        return passthrough(response)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+
+
+
+# Token budget of one generation chunk, estimated with GATEWAY_TOKEN_PROFILE (see text_utils.TOKEN_PROFILES)
+GATEWAY_CHUNK_TOKENS = int(os.getenv("GATEWAY_CHUNK_TOKENS", "7500"))
+GATEWAY_CHUNK_OVERLAP_TOKENS = int(os.getenv("GATEWAY_CHUNK_OVERLAP_TOKENS", "0"))
+GATEWAY_TOKEN_PROFILE = os.getenv("GATEWAY_TOKEN_PROFILE", "default")
+
+def _chunk_for_generation(text) -> List[str]:
+    return list(iter_chunks(
+        text,
+        GATEWAY_CHUNK_TOKENS,
+        overlap_tokens=GATEWAY_CHUNK_OVERLAP_TOKENS,
+        provider=GATEWAY_TOKEN_PROFILE
+    ))
+
+async def _pdf_to_chunks(file: UploadFile) -> List[str]:
+    """
+    Extracts the text of an uploaded PDF and splits it into generation-sized chunks.
+    """
+    # Spool the upload to disk (never the whole file in memory) and hash it for the text cache
+    path, content_hash = await asyncio.to_thread(spool_to_disk, file.file)
+    try:
+        pages = await aextract_pdf_pages(path, content_hash)
+    finally:
+        os.remove(path)
+    
+    if not any(page.strip() for page in pages):
+        raise HTTPException(status_code=400, detail="Could not extract text from PDF")
+        
+    print(f"Extracted {sum(len(page) for page in pages)} chars from {len(pages)} PDF pages")
     
-    async with httpx.AsyncClient() as client:
+    # Chunk the pages to the generators' token budget
+    chunks = _chunk_for_generation(pages)
+    print(f"Split into {len(chunks)} chunks")
+    return chunks
+
+async def _generate_pdf_stream(path: str, content_hash: str, base_payload: dict, instances: Instances):
+    """
+    Extraction -> chunking -> generation pipeline for one spooled PDF, as NDJSON lines.
+    """
+    chunk_count = 0
+
+    async def payloads():
+        nonlocal chunk_count
+        pages = aiter_pdf_pages(path, content_hash)
+        async for chunk in aiter_chunks(pages, GATEWAY_CHUNK_TOKENS, GATEWAY_CHUNK_OVERLAP_TOKENS, GATEWAY_TOKEN_PROFILE):
+            chunk_count += 1
+            yield dict(base_payload, content=chunk)
+
+    question_count = 0
+    failed = 0
+    try:
+        async for index, questions, error in stream_chunks(upstreams.client_for("generator"), instances, payloads()):
+            if error is not None:
+                failed += 1
+                line = {"chunk_index": index, "status": "failed", "status_code": error.status_code, "error": error.detail}
+            else:
+                question_count += len(questions)
+                line = {"chunk_index": index, "status": "completed", "questions": questions}
+            yield dumps(line) + b"\n"
+        if chunk_count == 0:
+            yield dumps({"status": "error", "error": "Could not extract text from PDF"}) + b"\n"
+            return
+        yield dumps({"status": "done", "chunks": chunk_count, "failed": failed, "question_count": question_count}) + b"\n"
+    except Exception as e:
+        print(f"Error processing PDF: {e}")
+        yield dumps({"status": "error", "error": str(e)}) + b"\n"
+    finally:
+        _remove_spool(path)
+
+def _remove_spool(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class CleanupStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose background task always runs: also when the body is never
+    iterated or the client disconnects (Starlette skips `background` then under ASGI 2.4).
+    """
+
+    async def __call__(self, scope, receive, send):
+        background, self.background = self.background, None
         try:
-            # Forward the request body
-            response = await client.post(
-                f"{target_url}/generate", 
-                json=content.model_dump(),
-                timeout=60.0 # Generation takes time
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await background()
+
+def _pdf_stream_response(path: str, content_hash: str, base_payload: dict, instances: Instances) -> StreamingResponse:
+    stream = _generate_pdf_stream(path, content_hash, base_payload, instances)
 
+    async def cleanup():
+        # The generator's own finally only runs if it was started
+        _remove_spool(path)
+        await stream.aclose()
 
+    return CleanupStreamingResponse(stream, media_type=NDJSON_MEDIA_TYPE, background=BackgroundTask(cleanup))
 
 @app.post("/generate/pdf", response_model=List[GeneratedQuestion])
 async def generate_questions_from_pdf(
+    request: Request,
     file: UploadFile = File(...),
     subject: str = Form(...),
     grade: str = Form(...),
@@ -295,70 +690,187 @@ async def generate_questions_from_pdf(
     chapter_id: str = Form(...),
     chapter_name: str = Form(...),
     generation_type: str = Form("general"),
+    force_regenerate: bool = Form(False),
     user: dict = Depends(verify_auth_token)
 ):
+    """
+    Generates questions from an uploaded PDF and returns them all once every chunk is done.
+
+    With `Accept: application/x-ndjson` the upload is processed as a pipeline instead:
+    pages are chunked as they are extracted, each chunk is dispatched as soon as it is
+    complete, and one JSON line per chunk is streamed back as it finishes, ending with a
+    `{"status": "done", ...}` summary line. A failed chunk is reported on its own line.
+    """
     print(f"Received PDF upload for {subject} - {chapter_name} ({generation_type})")
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        if not service_registry.has("generator"):
+            raise HTTPException(status_code=503, detail="No healthy instances for service: generator")
+        instances = service_registry.picker("generator")
+        # The upload is closed when this handler returns, so spool it before streaming
+        path, content_hash = await asyncio.to_thread(spool_to_disk, file.file)
+        base_payload = SyllabusContent(
+            subject=subject,
+            grade=grade,
+            medium=medium,
+            chapter_id=chapter_id,
+            chapter_name=chapter_name,
+            content="",
+            generation_type=generation_type,
+            force_regenerate=force_regenerate
+        ).model_dump()
+        return _pdf_stream_response(path, content_hash, base_payload, instances)
+
     try:
-        file_content = await file.read()
-        text = extract_text_from_pdf(file_content)
+        chunks = await _pdf_to_chunks(file)
         
-        if not text:
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-            
-        print(f"Extracted {len(text)} chars from PDF")
+        if not service_registry.has("generator"):
+            raise HTTPException(status_code=503, detail="No healthy instances for service: generator")
+        instances = service_registry.picker("generator")
+        print(f"Dispatching {len(chunks)} chunks across {len(service_registry.urls('generator'))} generator instance(s)")
+        client = upstreams.client_for("generator")
         
-        # Chunk the text to avoid token limits
-        chunks = chunk_text(text, max_chars=30000) # approx 7-8k tokens
-        print(f"Split into {len(chunks)} chunks")
+        payloads = [
+            SyllabusContent(
+                subject=subject,
+                grade=grade,
+                medium=medium,
+                chapter_id=chapter_id,
+                chapter_name=chapter_name,
+                content=chunk,
+                generation_type=generation_type,
+                force_regenerate=force_regenerate
+            ).model_dump()
+            for chunk in chunks
+        ]
         
-        all_questions = []
-        target_url = get_service_url("generator")
-        print(f"Routing PDF generation requests to: {target_url}") 
+        try:
+            results = await dispatch_chunks(client, instances, payloads)
+        except ChunkGenerationError as exc:
+            # Fail the whole upload rather than return partial results masquerading as full success
+            raise HTTPException(status_code=exc.status_code, detail=f"Error in chunk {exc.index+1}: {exc.detail}")
         
-        async with httpx.AsyncClient() as client:
-            for i, chunk in enumerate(chunks):
-                print(f"Processing chunk {i+1}/{len(chunks)} ({len(chunk)} chars)...")
-                
-                # Create content object for this chunk
-                content = SyllabusContent(
-                    subject=subject,
-                    grade=grade,
-                    medium=medium,
-                    chapter_id=chapter_id,
-                    chapter_name=chapter_name,
-                    content=chunk,
-                    generation_type=generation_type
-                )
-                
-                try:
-                    # Forward the request body
-                    response = await client.post(
-                        f"{target_url}/generate", 
-                        json=content.model_dump(),
-                        timeout=120.0 
-                    )
-                    response.raise_for_status()
-                    questions = response.json()
-                    print(f"Got {len(questions)} questions from chunk {i+1}")
-                    
-                    # Convert dicts back to objects to ensure structure (optional but good practice)
-                    # For now just extend the list
-                    all_questions.extend(questions)
-                    
-                except httpx.RequestError as exc:
-                    print(f"Error processing chunk {i+1}: {exc}")
-                    # Decide if we want to fail completely or continue. 
-                    # Failing completely is probably safer for now to avoid partial results masquerading as full success?
-                    # But for large docs, partial might be better. Let's fail for now as requested by user effectively.
-                    raise HTTPException(status_code=503, detail=f"Generation service unreachable during chunk {i+1}: {exc}")
-                except httpx.HTTPStatusError as exc:
-                    print(f"Error processing chunk {i+1}: {exc.response.text}")
-                    raise HTTPException(status_code=exc.response.status_code, detail=f"Error in chunk {i+1}: {exc.response.text}")
-                    
-        return all_questions
+        all_questions = []
+        for questions in results:
+            all_questions.extend(questions)
+
+        # Already validated by the generator; re-encode without a response_model round trip
+        return Response(content=dumps(all_questions), media_type="application/json")
 
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error processing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _proxy_stream(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> StreamingResponse:
+    """
+    Pipes an upstream response body to the client chunk by chunk without parsing it.
+    The upstream connection is released once the client has received everything.
+    """
+    request = client.build_request(method, url, **kwargs)
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Service unreachable ({url}): {exc}")
+    if response.status_code != 200:
+        detail = (await response.aread()).decode()
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=detail)
+    headers = {h: response.headers[h] for h in PAGINATION_HEADERS if h in response.headers}
+    return StreamingResponse(
+        response.aiter_raw(),
+        media_type=response.headers.get("content-type"),
+        headers=headers,
+        background=BackgroundTask(response.aclose)
+    )
+
+# --- Generation Jobs ---
+# Jobs are persisted in the shared database, so any generator instance can answer for any job.
+
+async def _proxy_job_request(method: str, path: str, **kwargs):
+    target_url = get_service_url("generator")
+    client = upstreams.client_for("generator")
+    try:
+        response = await client.request(method, f"{target_url}{path}", **kwargs)
+        response.raise_for_status()
+        return passthrough(response)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Service unreachable ({target_url}): {exc}")
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail=exc.response.text)
+
+@app.post("/jobs", response_model=JobStatus, status_code=202, tags=["Jobs"], summary="Submit Generation Job")
+async def submit_generation_job(
+    content: SyllabusContent,
+    user: dict = Depends(verify_auth_token)
+):
+    """
+    Queues question generation and returns a job ID immediately. Poll `/jobs/{id}` for progress.
+    """
+    request = JobRequest(
+        **content.model_dump(exclude={"content"}),
+        chunks=_chunk_for_generation(content.content)
+    )
+    return await _proxy_job_request("POST", "/jobs", json=request.model_dump())
+
+@app.post("/jobs/pdf", response_model=JobStatus, status_code=202, tags=["Jobs"], summary="Submit PDF Generation Job")
+async def submit_pdf_generation_job(
+    file: UploadFile = File(...),
+    subject: str = Form(...),
+    grade: str = Form(...),
+    medium: str = Form(...),
+    chapter_id: str = Form(...),
+    chapter_name: str = Form(...),
+    generation_type: str = Form("general"),
+    force_regenerate: bool = Form(False),
+    user: dict = Depends(verify_auth_token)
+):
+    """
+    Extracts and chunks the PDF, then queues every chunk as a background job.
+    """
+    print(f"Received PDF job for {subject} - {chapter_name} ({generation_type})")
+    request = JobRequest(
+        subject=subject,
+        grade=grade,
+        medium=medium,
+        chapter_id=chapter_id,
+        chapter_name=chapter_name,
+        generation_type=generation_type,
+        force_regenerate=force_regenerate,
+        chunks=await _pdf_to_chunks(file)
+    )
+    return await _proxy_job_request("POST", "/jobs", json=request.model_dump())
+
+@app.get("/jobs/{job_id}", response_model=JobStatus, tags=["Jobs"], summary="Get Job Status")
+async def get_generation_job(job_id: str, user: dict = Depends(verify_auth_token)):
+    return await _proxy_job_request("GET", f"/jobs/{job_id}")
+
+@app.get("/jobs/{job_id}/questions", response_model=List[GeneratedQuestion], tags=["Jobs"], summary="Get Job Results")
+async def get_generation_job_questions(
+    job_id: str,
+    after_chunk: Optional[int] = None,
+    user: dict = Depends(verify_auth_token)
+):
+    """
+    Returns the questions generated so far. Use `after_chunk` to fetch only newer results.
+    """
+    params = {"after_chunk": after_chunk} if after_chunk is not None else {}
+    return await _proxy_job_request("GET", f"/jobs/{job_id}/questions", params=params)
+
+@app.get("/jobs/{job_id}/stream", tags=["Jobs"], summary="Stream Job Results")
+async def stream_generation_job(job_id: str, user: dict = Depends(verify_auth_token)):
+    """
+    Streams NDJSON lines: one per finished chunk, then a final status line.
+    """
+    target_url = get_service_url("generator")
+    client = upstreams.client_for("generator")
+    # Chunks can take minutes each, so there is no read timeout on the stream
+    return await _proxy_stream(
+        client, "GET", f"{target_url}/jobs/{job_id}/stream",
+        timeout=httpx.Timeout(None, connect=5.0)
+    )
+
+@app.delete("/jobs/{job_id}", response_model=JobStatus, tags=["Jobs"], summary="Cancel Job")
+async def cancel_generation_job(job_id: str, user: dict = Depends(verify_auth_token)):
+    return await _proxy_job_request("DELETE", f"/jobs/{job_id}")
@@ -0,0 +1,327 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+# Seconds a registration stays valid without a heartbeat (0 disables expiry)
+REGISTRY_LEASE = float(os.getenv("GATEWAY_REGISTRY_LEASE_S", "30"))
+# Active health checks: GET <instance>/health every interval
+HEALTH_CHECK_INTERVAL = float(os.getenv("GATEWAY_HEALTH_CHECK_INTERVAL_S", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("GATEWAY_HEALTH_CHECK_TIMEOUT_S", "2"))
+# Consecutive failed checks (or connection errors) before an instance stops receiving
+# traffic, and consecutive passed checks before it is re-admitted
+EVICT_AFTER_FAILURES = int(os.getenv("GATEWAY_EVICT_AFTER_FAILURES", "3"))
+READMIT_AFTER_SUCCESSES = int(os.getenv("GATEWAY_READMIT_AFTER_SUCCESSES", "2"))
+# "ewma": fewest outstanding requests weighted by EWMA latency; "least_outstanding"; "random"
+ROUTING_POLICY = os.getenv("GATEWAY_ROUTING", "ewma").lower()
+# Weight of the newest latency sample in the moving average
+EWMA_ALPHA = float(os.getenv("GATEWAY_EWMA_ALPHA", "0.3"))
+
+
+def origin(url) -> str:
+    url = httpx.URL(url)
+    return f"{url.scheme}://{url.host}:{url.port or (443 if url.scheme == 'https' else 80)}"
+
+
+def for_service(service: str) -> dict:
+    """
+    Request extensions naming the service a request is for. Needed when several services
+    are registered at the same origin, so the request is counted against the right one.
+    """
+    return {"service": service}
+
+
+class Instance:
+    """
+    One registered instance of a service, with its lease and load statistics.
+    """
+
+    def __init__(self, service: str, url: str, expires_at: float):
+        self.service = service
+        self.url = url.rstrip("/")
+        self.expires_at = expires_at
+        self.healthy = True
+        self.failures = 0 # consecutive failed checks
+        self.successes = 0 # consecutive passed checks
+        self.outstanding = 0
+        self.ewma: Optional[float] = None # seconds to response headers
+        self.requests = 0
+        self.errors = 0
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000) if self.ewma is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "lease_remaining_s": round(self.expires_at - now, 1) if self.expires_at != float("inf") else None,
+        }
+
+
+class ServiceRegistry:
+    """
+    Registered service instances, kept current by heartbeats (leases) and active health
+    checks, and routed to by load instead of at random.
+
+    Requests made through `transport()` are counted against the instance they target,
+    so routing sees every request in flight (including streamed ones until they close).
+    Instances are matched by (service, origin): the service comes from the request's
+    `for_service` extension, or is implied when only one service is registered at the origin.
+    """
+
+    def __init__(
+        self,
+        services: Iterable[str] = (),
+        lease: float = REGISTRY_LEASE,
+        evict_after: int = EVICT_AFTER_FAILURES,
+        readmit_after: int = READMIT_AFTER_SUCCESSES,
+        policy: str = ROUTING_POLICY,
+        timer=time.monotonic
+    ):
+        self.lease = lease
+        self.evict_after = evict_after
+        self.readmit_after = readmit_after
+        self.policy = policy
+        self._timer = timer
+        self._services: Dict[str, Dict[str, Instance]] = {name: {} for name in services}
+        self._by_origin: Dict[str, Dict[str, Instance]] = {}
+        self._lock = threading.Lock()
+        self._checker: Optional[asyncio.Task] = None
+
+    def _expiry(self) -> float:
+        return self._timer() + self.lease if self.lease > 0 else float("inf")
+
+    def register(self, service: str, url: str) -> int:
+        """
+        Registers an instance or renews its lease (heartbeat). Returns the service's instance count.
+        """
+        url = url.rstrip("/")
+        with self._lock:
+            instances = self._services.setdefault(service, {})
+            instance = instances.get(url)
+            if instance is None:
+                instance = instances[url] = Instance(service, url, self._expiry())
+                self._by_origin.setdefault(origin(url), {})[service] = instance
+                print(f"Registered {service} at {url}")
+            else:
+                instance.expires_at = self._expiry()
+            return len(instances)
+
+    def deregister(self, service: str, url: str):
+        url = url.rstrip("/")
+        with self._lock:
+            instance = self._services.get(service, {}).pop(url, None)
+            if instance is not None:
+                self._untrack(service, url)
+                print(f"Deregistered {service} at {url}")
+
+    def _expire(self):
+        now = self._timer()
+        for service, instances in self._services.items():
+            for url in [url for url, i in instances.items() if i.expires_at < now]:
+                del instances[url]
+                self._untrack(service, url)
+                print(f"Lease of {service} at {url} expired")
+
+    def _untrack(self, service: str, url: str):
+        services = self._by_origin.get(origin(url), {})
+        services.pop(service, None)
+        if not services:
+            self._by_origin.pop(origin(url), None)
+
+    def _available(self, service: str) -> List[Instance]:
+        now = self._timer()
+        return [i for i in self._services.get(service, {}).values() if i.healthy and i.expires_at >= now]
+
+    def has(self, service: str) -> bool:
+        with self._lock:
+            return bool(self._available(service))
+
+    def urls(self, service: str) -> List[str]:
+        with self._lock:
+            return [i.url for i in self._available(service)]
+
+    def _score(self, instance: Instance, default_latency: float) -> float:
+        if self.policy == "least_outstanding":
+            return instance.outstanding
+        latency = instance.ewma if instance.ewma is not None else default_latency
+        return (instance.outstanding + 1) * latency
+
+    def pick(self, service: str, exclude: Set[str] = frozenset()) -> Optional[str]:
+        """
+        Returns the URL of the least loaded healthy instance, preferring ones not in
+        `exclude` (e.g. already tried for this request). None if there is none.
+        """
+        with self._lock:
+            instances = self._available(service)
+            candidates = [i for i in instances if i.url not in exclude] or instances
+            if not candidates:
+                return None
+            if self.policy == "random":
+                return random.choice(candidates).url
+            # Instances without latency samples are assumed to be average
+            known = [i.ewma for i in candidates if i.ewma is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            scores = [self._score(i, default_latency) for i in candidates]
+            best = min(scores)
+            return random.choice([i for i, s in zip(candidates, scores) if s == best]).url
+
+    def picker(self, service: str) -> Callable[[Set[str]], Optional[str]]:
+        return lambda exclude: self.pick(service, exclude)
+
+    # --- Load tracking ---
+
+    def _begin(self, request: httpx.Request) -> Optional[Instance]:
+        with self._lock:
+            services = self._by_origin.get(origin(request.url), {})
+            service = request.extensions.get("service")
+            if service is not None:
+                instance = services.get(service)
+            else:
+                # Untagged requests are only counted when the origin is unambiguous
+                instance = next(iter(services.values())) if len(services) == 1 else None
+            if instance is not None:
+                instance.outstanding += 1
+                instance.requests += 1
+            return instance
+
+    def _observe(self, instance: Instance, seconds: float):
+        with self._lock:
+            if instance.ewma is None:
+                instance.ewma = seconds
+            else:
+                instance.ewma = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * instance.ewma
+
+    def _end(self, instance: Instance, failed: bool = False):
+        with self._lock:
+            instance.outstanding -= 1
+            if failed:
+                instance.errors += 1
+                self._record_check(instance, False)
+
+    def transport(self, inner: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        return _TrackingTransport(inner, self)
+
+    # --- Health checks ---
+
+    def _record_check(self, instance: Instance, ok: bool):
+        if ok:
+            instance.failures = 0
+            instance.successes += 1
+            if not instance.healthy and instance.successes >= self.readmit_after:
+                instance.healthy = True
+                print(f"Re-admitted {instance.service} at {instance.url}")
+        else:
+            instance.successes = 0
+            instance.failures += 1
+            if instance.healthy and instance.failures >= self.evict_after:
+                instance.healthy = False
+                print(f"Evicted {instance.service} at {instance.url} after {instance.failures} failed checks")
+
+    async def _check(self, client: httpx.AsyncClient, instance: Instance):
+        try:
+            response = await client.get(f"{instance.url}/health")
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        with self._lock:
+            self._record_check(instance, ok)
+
+    async def check_all(self, client: httpx.AsyncClient):
+        """
+        Drops expired leases and health-checks every remaining instance concurrently.
+        """
+        with self._lock:
+            self._expire()
+            instances = [i for service in self._services.values() for i in service.values()]
+        await asyncio.gather(*(self._check(client, i) for i in instances))
+
+    async def _run_checks(self, interval: float, timeout: float):
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.check_all(client)
+                except Exception as e:
+                    print(f"Registry health check failed: {e}")
+
+    def start(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._run_checks(interval, timeout))
+
+    async def stop(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+
+    def stats(self) -> dict:
+        now = self._timer()
+        with self._lock:
+            return {
+                service: [i.snapshot(now) for i in instances.values()]
+                for service, instances in self._services.items()
+            }
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """
+    Response body that reports back to the registry once it is closed.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class _TrackingTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps an upstream transport to count outstanding requests and latency per instance.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, registry: ServiceRegistry):
+        self.inner = inner
+        self.registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        instance = self.registry._begin(request)
+        if instance is None:
+            return await self.inner.handle_async_request(request)
+        start = time.monotonic()
+        try:
+            response = await self.inner.handle_async_request(request)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            # The instance could not be reached: counts like a failed health check
+            self.registry._end(instance, failed=True)
+            raise
+        except BaseException:
+            self.registry._end(instance)
+            raise
+        self.registry._observe(instance, time.monotonic() - start)
+        if response.is_closed:
+            # The body was already read in full (e.g. an in-memory response)
+            self.registry._end(instance)
+        else:
+            response.stream = _TrackedStream(response.stream, lambda: self.registry._end(instance))
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
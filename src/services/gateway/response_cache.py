@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from cachetools import TLRUCache
+
+GATEWAY_RESPONSE_CACHE_ENABLED = os.getenv("GATEWAY_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+GATEWAY_RESPONSE_CACHE_TTL = float(os.getenv("GATEWAY_RESPONSE_CACHE_TTL", "60"))
+GATEWAY_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("GATEWAY_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Larger bodies (e.g. very big pages) are passed through without being cached
+GATEWAY_RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("GATEWAY_RESPONSE_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+
+# Query parameters that scope a response to chapters; used to match invalidations
+CHAPTER_FILTERS = ("subject", "grade", "medium", "chapter_id")
+
+CacheKey = Tuple[Tuple[str, str], ...]
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    filters: Dict[str, str]
+    expires_at: float
+
+
+def cache_key(params: dict) -> CacheKey:
+    """
+    Normalised query: parameter order and value types do not matter.
+    """
+    return tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of raw upstream response bodies, bounded by total bytes.
+
+    Entries are invalidated by chapter: an invalidation for (subject, grade, medium,
+    chapter_id) drops every entry whose chapter filters all match it, including
+    broader queries such as one filtered by subject only.
+    """
+
+    def __init__(
+        self,
+        ttl: float = GATEWAY_RESPONSE_CACHE_TTL,
+        max_bytes: int = GATEWAY_RESPONSE_CACHE_MAX_BYTES,
+        max_entry_bytes: int = GATEWAY_RESPONSE_CACHE_MAX_ENTRY_BYTES,
+        enabled: bool = GATEWAY_RESPONSE_CACHE_ENABLED,
+        timer=time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.enabled = enabled and ttl > 0 and max_bytes > 0
+        self._timer = timer
+        self._cache = TLRUCache(
+            maxsize=max(1, max_bytes),
+            ttu=lambda key, value, now: value.expires_at,
+            timer=timer,
+            getsizeof=lambda value: len(value.body) + 256
+        )
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a fill that started before one is discarded
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def generation(self) -> int:
+        """
+        Token to pass to put(); taken before the upstream request is sent.
+        """
+        return self._generation
+
+    def put(self, key: CacheKey, body: bytes, headers: Dict[str, str], generation: int):
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return
+        filters = {name: value for name, value in key if name in CHAPTER_FILTERS}
+        entry = CachedResponse(body, headers, filters, self._timer() + self.ttl)
+        with self._lock:
+            if generation != self._generation:
+                # Questions changed while this response was being fetched; it may be stale
+                return
+            self._cache[key] = entry
+
+    def invalidate_chapter(self, subject: str, grade: str, medium: str, chapter_id: str) -> int:
+        """
+        Drops every entry that could include questions of the given chapter. Returns how many were removed.
+        """
+        changed = {"subject": subject, "grade": grade, "medium": medium, "chapter_id": chapter_id}
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            stale = [
+                key for key, entry in self._cache.items()
+                if all(changed[name] == value for name, value in entry.filters.items())
+            ]
+            for key in stale:
+                self._cache.pop(key, None)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._cache),
+                "bytes": self._cache.currsize,
+                "max_bytes": self._cache.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Hashable, Iterator, Optional
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts the work,
+    callers arriving while it runs wait for the same result instead of repeating it.
+
+    The work runs in its own task, so a caller that disconnects does not cancel it for
+    the others. Once it finishes the key is forgotten; later calls start afresh.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        on_shared: Optional[Callable[[Any, int], None]] = None,
+        on_abandoned: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """
+        Returns the result of `fn()`, shared with every concurrent caller for `key`.
+        `on_shared(result, waiters)` is called once, before any caller resumes, with
+        the number of callers that will receive the result. A caller counted there but
+        cancelled before it resumes calls `on_abandoned(result)` instead of returning it.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight, on_shared))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        flight.waiters += 1
+        received = False
+        try:
+            result = await asyncio.shield(flight.task)
+            received = True
+            return result
+        finally:
+            if not received:
+                self._abandon(key, flight, on_abandoned)
+
+    def _abandon(self, key: Hashable, flight: _Flight, on_abandoned):
+        if self._flights.get(key) is flight:
+            # Not shared out yet; on_shared will not count this caller
+            flight.waiters -= 1
+        elif not flight.task.cancelled() and flight.task.exception() is None and on_abandoned is not None:
+            on_abandoned(flight.task.result())
+
+    def _finish(self, key: Hashable, flight: _Flight, on_shared):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.cancelled() or flight.task.exception() is not None:
+            return
+        if on_shared is not None:
+            on_shared(flight.task.result(), flight.waiters)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "shared": self.shared,
+        }
+
+
+class SharedFile:
+    """
+    A finished file read by several responses at once. Each reader keeps its own
+    offset; the file is closed when the last reader is done or gives up its share.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._file = fileobj
+        self._lock = threading.Lock()
+        self._readers = 1
+
+    def share(self, readers: int):
+        with self._lock:
+            self._readers = readers
+        if readers <= 0:
+            self._file.close()
+
+    def release(self):
+        """
+        Gives up one reader's share without reading.
+        """
+        with self._lock:
+            self._readers -= 1
+            last = self._readers <= 0
+        if last:
+            self._file.close()
+
+    def _read(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    def iter_chunks(self, chunk_size: int) -> "SharedFileReader":
+        return SharedFileReader(self, chunk_size)
+
+
+class SharedFileReader:
+    """
+    One reader's pass over a SharedFile. Its share is released once, when iteration
+    ends or on close(); responses should also close it in case they are never iterated.
+    """
+
+    def __init__(self, shared: SharedFile, chunk_size: int):
+        self._shared = shared
+        self._chunk_size = chunk_size
+        self._offset = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        if self._closed:
+            raise StopIteration
+        data = self._shared._read(self._offset, self._chunk_size)
+        if not data:
+            self.close()
+            raise StopIteration
+        self._offset += len(data)
+        return data
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._shared.release()
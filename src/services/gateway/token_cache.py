@@ -0,0 +1,112 @@
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from cachetools import TLRUCache
+from jose import jwt, JWTError
+
+TOKEN_CACHE_SIZE = int(os.getenv("GATEWAY_TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("GATEWAY_TOKEN_CACHE_TTL", "60"))
+
+
+def hash_token(token: str) -> str:
+    """
+    Raw tokens are never used as cache keys; only their SHA-256 digest is kept.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """
+    TTL + LRU cache of verified token payloads returned by the Auth Service.
+
+    Entries expire after `ttl` seconds or at the JWT `exp`, whichever comes first.
+    A (type, sub) index allows the Auth Service to evict every cached token
+    belonging to a revoked API key or a deactivated admin. Each invalidation also bumps
+    the subject's generation, so a verification that was in flight at the time is not cached.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL, timer=time.time):
+        self.ttl = ttl
+        self._timer = timer
+        # Values are (payload, expires_at, subject); expiry is fixed when the entry is stored.
+        self._cache = TLRUCache(maxsize=maxsize, ttu=lambda key, value, now: value[1], timer=timer)
+        self._by_subject: Dict[Tuple[str, str], Set[str]] = {}
+        # Bumped by invalidate(); only subjects that were ever invalidated are present
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._cache.get(hash_token(token))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def generation(self, token: str) -> int:
+        """
+        Token to pass to put(); taken before the token is sent for verification.
+        """
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except JWTError:
+            return 0
+        return self._generations.get((str(claims.get("type")), str(claims.get("sub"))), 0)
+
+    def put(self, token: str, payload: dict, generation: Optional[int] = None):
+        if self.ttl <= 0:
+            return
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except JWTError:
+            return
+
+        now = self._timer()
+        expires_at = now + self.ttl
+        exp = claims.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        subject = (str(claims.get("type")), str(claims.get("sub")))
+        if generation is not None and generation != self._generations.get(subject, 0):
+            # Invalidated while this token was being verified; the payload may be stale
+            return
+        token_hash = hash_token(token)
+        self._cache[token_hash] = (payload, expires_at, subject)
+        # Forget hashes that have already been evicted so the index stays bounded by the cache.
+        hashes = {h for h in self._by_subject.get(subject, ()) if h in self._cache}
+        hashes.add(token_hash)
+        self._by_subject[subject] = hashes
+
+    def invalidate(self, token_type: str, subject: str) -> int:
+        """
+        Drops every cached token for the given (type, sub). Returns how many entries were removed.
+        """
+        subject_key = (token_type, subject)
+        self._generations[subject_key] = self._generations.get(subject_key, 0) + 1
+        removed = 0
+        for token_hash in self._by_subject.pop(subject_key, set()):
+            if self._cache.pop(token_hash, None) is not None:
+                removed += 1
+        self.invalidations += 1
+        return removed
+
+    def clear(self):
+        self._cache.clear()
+        self._by_subject.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._cache),
+            "max_size": self._cache.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
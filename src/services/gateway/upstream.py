@@ -0,0 +1,134 @@
+import os
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+# Upstream groups that get their own connection pool.
+# Dynamic subject QBanks (science_qbank, maths_qbank, ...) all share the "qbank" pool.
+UPSTREAM_DEFAULTS = {
+    "auth": {"max_connections": 50, "max_keepalive": 20, "read_timeout": 5.0},
+    "qbank": {"max_connections": 100, "max_keepalive": 40, "read_timeout": 30.0},
+    "generator": {"max_connections": 50, "max_keepalive": 20, "read_timeout": 120.0},
+    "default": {"max_connections": 20, "max_keepalive": 10, "read_timeout": 30.0},
+}
+
+
+def _env(upstream: str, key: str, default):
+    """
+    Reads GATEWAY_POOL_<UPSTREAM>_<KEY>, then GATEWAY_POOL_<KEY>, then falls back to the default.
+    """
+    value = os.getenv(f"GATEWAY_POOL_{upstream.upper()}_{key}") or os.getenv(f"GATEWAY_POOL_{key}")
+    if value is None:
+        return default
+    return type(default)(value)
+
+
+def upstream_for(service_name: str) -> str:
+    """
+    Maps a registry service name onto the pool it should use.
+    """
+    if service_name == "auth_service":
+        return "auth"
+    if service_name.endswith("_qbank"):
+        return "qbank"
+    if service_name == "generator":
+        return "generator"
+    return "default"
+
+
+class UpstreamPool:
+    """
+    A long-lived AsyncClient (and its connection pool) for a single upstream group.
+    """
+
+    def __init__(self, name: str, registry=None):
+        defaults = UPSTREAM_DEFAULTS.get(name, UPSTREAM_DEFAULTS["default"])
+        self.name = name
+        self.max_connections = _env(name, "MAX_CONNECTIONS", defaults["max_connections"])
+        self.max_keepalive = _env(name, "MAX_KEEPALIVE", defaults["max_keepalive"])
+        self.keepalive_expiry = _env(name, "KEEPALIVE_EXPIRY", 30.0)
+        self.connect_timeout = _env(name, "CONNECT_TIMEOUT", 5.0)
+        self.read_timeout = _env(name, "READ_TIMEOUT", defaults["read_timeout"])
+        self.pool_timeout = _env(name, "POOL_TIMEOUT", 10.0)
+        self.http2 = os.getenv("GATEWAY_HTTP2", "false").lower() == "true"
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            print("Warning: GATEWAY_HTTP2 is enabled but the 'h2' package is not installed. Using HTTP/1.1.")
+            self.http2 = False
+
+        self.total_requests = 0
+        self.transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        self.client = httpx.AsyncClient(
+            # The registry counts outstanding requests per instance for load-aware routing
+            transport=registry.transport(self.transport) if registry is not None else self.transport,
+            timeout=httpx.Timeout(
+                self.read_timeout,
+                connect=self.connect_timeout,
+                pool=self.pool_timeout,
+            ),
+            event_hooks={"request": [self._count_request]},
+        )
+
+    async def _count_request(self, request: httpx.Request):
+        self.total_requests += 1
+
+    def stats(self) -> dict:
+        # httpx does not expose the pool publicly; read it defensively from the transport.
+        pool = getattr(self.transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry": self.keepalive_expiry,
+            "http2": self.http2,
+            "open_connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle,
+            "utilisation": round((len(connections) - idle) / self.max_connections, 3),
+            "total_requests": self.total_requests,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class UpstreamPools:
+    """
+    Registry of per-upstream pools shared by every gateway handler.
+    Pools are created lazily so handlers work even before the app lifespan has run.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry
+        self._pools: Dict[str, UpstreamPool] = {}
+
+    def pool_for(self, service_name: str) -> UpstreamPool:
+        name = upstream_for(service_name)
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = UpstreamPool(name, self.registry)
+            self._pools[name] = pool
+        return pool
+
+    def client_for(self, service_name: str) -> httpx.AsyncClient:
+        return self.pool_for(service_name).client
+
+    def start(self, service_names: Optional[list] = None):
+        for service_name in service_names or []:
+            self.pool_for(service_name)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+    async def aclose(self):
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._pools.clear()
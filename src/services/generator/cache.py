@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, SQLModel, Field, select
+
+from src.shared.core.database import engine
+from src.shared.models.question import SyllabusContent, GeneratedQuestion
+from src.shared.models.generation_schema import QuestionBank, Question
+from src.services.generator.providers.base import question_bank_to_questions
+
+# Bump whenever the provider prompts change, so old generations are no longer served
+PROMPT_VERSION = "1"
+
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "5000"))
+GENERATION_CACHE_MAX_AGE_DAYS = int(os.getenv("GENERATION_CACHE_MAX_AGE_DAYS", "30"))
+
+
+class GenerationCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True) # sha256 of the generation parameters
+    provider: str
+    model: str
+    # QuestionBank JSON, independent of chapter_id/chapter_name
+    payload: str
+    question_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+def cache_key(content: SyllabusContent, provider_name: str, model_name: str) -> str:
+    """
+    Content address of a generation: the chunk text plus everything that shapes the prompt.
+    Chapter id/name are not part of the prompt, so they are not part of the key.
+    """
+    parts = [
+        content.content,
+        content.subject,
+        content.grade,
+        content.medium,
+        content.generation_type,
+        provider_name,
+        model_name,
+        PROMPT_VERSION,
+    ]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def questions_to_question_bank(questions: List[GeneratedQuestion]) -> QuestionBank:
+    return QuestionBank(questions=[
+        Question(
+            type=q.question_type,
+            question_text=q.question_text,
+            options=q.options or [],
+            answer=q.answer or [],
+            explanation=q.explanation or ""
+        )
+        for q in questions
+    ])
+
+
+class GenerationCache:
+    """
+    Persistent cache of LLM generations, keyed by cache_key().
+    Entries older than max_age_days are ignored and pruned; beyond max_entries the least
+    recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        engine=engine,
+        enabled: bool = GENERATION_CACHE_ENABLED,
+        max_entries: int = GENERATION_CACHE_MAX_ENTRIES,
+        max_age_days: int = GENERATION_CACHE_MAX_AGE_DAYS
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_age = timedelta(days=max_age_days)
+        self.hits = 0
+        self.misses = 0
+
+    def _key_for(self, content: SyllabusContent, provider) -> str:
+        return cache_key(content, provider.provider_name, getattr(provider, "model_name", ""))
+
+    def lookup(self, content: SyllabusContent, providers: list) -> Optional[List[GeneratedQuestion]]:
+        """
+        Returns cached questions from the first provider (in priority order) that has an entry.
+        """
+        if not self.enabled or content.force_regenerate:
+            return None
+        keys = [self._key_for(content, provider) for provider in providers]
+        if not keys:
+            return None
+        with Session(self.engine) as session:
+            rows = session.exec(select(GenerationCacheEntry).where(GenerationCacheEntry.key.in_(keys))).all()
+            by_key = {row.key: row for row in rows}
+            cutoff = datetime.utcnow() - self.max_age
+            for key in keys:
+                entry = by_key.get(key)
+                if entry is None or entry.created_at < cutoff:
+                    continue
+                entry.last_used_at = datetime.utcnow()
+                session.add(entry)
+                session.commit()
+                self.hits += 1
+                print(f"Generation cache hit ({entry.provider}, {entry.question_count} questions)")
+                question_bank = QuestionBank.model_validate_json(entry.payload)
+                return question_bank_to_questions(question_bank, content)
+        self.misses += 1
+        return None
+
+    def store(self, content: SyllabusContent, provider, questions: List[GeneratedQuestion]):
+        if not self.enabled or not questions:
+            return
+        key = self._key_for(content, provider)
+        now = datetime.utcnow()
+        with Session(self.engine) as session:
+            entry = session.get(GenerationCacheEntry, key) or GenerationCacheEntry(
+                key=key,
+                provider=provider.provider_name,
+                model=getattr(provider, "model_name", "")
+            )
+            entry.payload = questions_to_question_bank(questions).model_dump_json()
+            entry.question_count = len(questions)
+            entry.created_at = now
+            entry.last_used_at = now
+            session.add(entry)
+            session.commit()
+            self._evict(session)
+
+    def _evict(self, session: Session):
+        session.exec(delete(GenerationCacheEntry).where(GenerationCacheEntry.created_at < datetime.utcnow() - self.max_age))
+        count = session.exec(select(func.count()).select_from(GenerationCacheEntry)).one()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            oldest = select(GenerationCacheEntry.key).order_by(GenerationCacheEntry.last_used_at).limit(overflow)
+            session.exec(delete(GenerationCacheEntry).where(GenerationCacheEntry.key.in_(oldest)))
+        session.commit()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_entries": self.max_entries,
+            "max_age_days": self.max_age.days,
+        }
@@ -0,0 +1,203 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+# Outcomes and latencies of the most recent calls kept per provider
+HEALTH_WINDOW = int(os.getenv("GENERATOR_HEALTH_WINDOW", "100"))
+# Percentiles, success rates and routing weights are only trusted once this many samples exist
+HEALTH_MIN_SAMPLES = int(os.getenv("GENERATOR_HEALTH_MIN_SAMPLES", "20"))
+
+# Circuit breaker: open after this many consecutive failures, or when the success rate
+# over the window drops below the minimum; probe an open provider every cooldown
+BREAKER_FAILURES = int(os.getenv("GENERATOR_BREAKER_FAILURES", "5"))
+BREAKER_MIN_SUCCESS_RATE = float(os.getenv("GENERATOR_BREAKER_MIN_SUCCESS_RATE", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("GENERATOR_BREAKER_COOLDOWN_S", "30"))
+
+# Reorder providers by observed success rate, latency and cost instead of the configured order
+ADAPTIVE_ROUTING = os.getenv("GENERATOR_ADAPTIVE_ROUTING", "true").lower() == "true"
+# Relative cost per call. Override with <PROVIDER>_COST, e.g. GEMINI_COST=2.
+DEFAULT_COSTS = {
+    "gemini": 1.0,
+    "groq": 1.0,
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def provider_cost(provider: str) -> float:
+    return float(os.getenv(f"{provider.upper()}_COST", DEFAULT_COSTS.get(provider.lower(), 1.0)))
+
+
+class ProviderStats:
+    """
+    Rolling outcome/latency windows and circuit breaker state for one provider.
+    """
+
+    def __init__(self, window: int = HEALTH_WINDOW, cost: float = 1.0):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cost = cost
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        p50 = percentile(self.latencies, 0.5)
+        p95 = percentile(self.latencies, 0.95)
+        rate = self.success_rate
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": round(rate, 3) if rate is not None else None,
+            "samples": len(self.latencies),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "cost": self.cost,
+        }
+
+
+class ProviderHealth:
+    """
+    Per-provider success rate and latency statistics, with a circuit breaker per provider.
+
+    Used to decide when to hedge a slow call, to skip providers whose breaker is open,
+    and to order providers by observed success rate, latency and cost.
+    """
+
+    def __init__(
+        self,
+        window: int = HEALTH_WINDOW,
+        min_samples: int = HEALTH_MIN_SAMPLES,
+        failure_threshold: int = BREAKER_FAILURES,
+        min_success_rate: float = BREAKER_MIN_SUCCESS_RATE,
+        cooldown: float = BREAKER_COOLDOWN,
+        adaptive: bool = ADAPTIVE_ROUTING,
+        timer=time.monotonic
+    ):
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.min_success_rate = min_success_rate
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+        self._timer = timer
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str) -> ProviderStats:
+        stats = self._stats.get(provider)
+        if stats is None:
+            stats = self._stats[provider] = ProviderStats(self.window, provider_cost(provider))
+        return stats
+
+    def record_success(self, provider: str, seconds: float):
+        with self._lock:
+            stats = self._get(provider)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.latencies.append(seconds)
+            stats.outcomes.append(True)
+            if stats.state != CLOSED:
+                print(f"Circuit for provider {provider} closed")
+                stats.state = CLOSED
+                # Start afresh so the failures that opened it cannot re-open it at once
+                stats.outcomes.clear()
+                stats.outcomes.append(True)
+
+    def record_failure(self, provider: str, seconds: float):
+        with self._lock:
+            stats = self._get(provider)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.outcomes.append(False)
+            failing = stats.consecutive_failures >= self.failure_threshold or (
+                len(stats.outcomes) >= self.min_samples and stats.success_rate < self.min_success_rate
+            )
+            if stats.state == HALF_OPEN or (stats.state == CLOSED and failing):
+                print(f"Circuit for provider {provider} opened after {stats.consecutive_failures} consecutive failures")
+                stats.state = OPEN
+                stats.opened_at = self._timer()
+
+    def allow(self, provider: str) -> bool:
+        """
+        Whether a call to `provider` may start. An open circuit lets one probe through
+        per cooldown; the probe's outcome closes or re-opens it.
+        """
+        with self._lock:
+            stats = self._get(provider)
+            if stats.state == CLOSED:
+                return True
+            if self._timer() - stats.opened_at < self.cooldown:
+                return False
+            # A probe that never reports back (e.g. cancelled) is replaced after another cooldown
+            stats.state = HALF_OPEN
+            stats.opened_at = self._timer()
+            print(f"Probing provider {provider}")
+            return True
+
+    def p95(self, provider: str) -> Optional[float]:
+        """
+        95th percentile latency of recent successful calls, or None until enough samples exist.
+        """
+        with self._lock:
+            stats = self._stats.get(provider)
+            if stats is None or len(stats.latencies) < self.min_samples:
+                return None
+            return percentile(stats.latencies, 0.95)
+
+    def _weight(self, stats: ProviderStats) -> Optional[float]:
+        if len(stats.latencies) < self.min_samples:
+            return None
+        p50 = max(percentile(stats.latencies, 0.5), 1e-3)
+        return stats.success_rate / (p50 * stats.cost)
+
+    def weights(self) -> Dict[str, Optional[float]]:
+        """
+        Routing weight per provider: success rate / (median latency x cost), normalised to sum to 1.
+        """
+        with self._lock:
+            raw = {name: self._weight(stats) for name, stats in self._stats.items()}
+        total = sum(w for w in raw.values() if w)
+        return {name: round(w / total, 3) if w and total else None for name, w in raw.items()}
+
+    def route(self, providers: List) -> List:
+        """
+        Orders providers for a call. Keeps the configured order until every provider has
+        enough samples, then sorts by routing weight, highest first.
+        """
+        if not self.adaptive or len(providers) < 2:
+            return list(providers)
+        with self._lock:
+            weights = [self._weight(self._get(p.provider_name)) for p in providers]
+        if any(w is None for w in weights):
+            return list(providers)
+        # Stable sort: ties keep the configured primary first
+        order = sorted(range(len(providers)), key=lambda i: -weights[i])
+        return [providers[i] for i in order]
+
+    def stats(self) -> dict:
+        weights = self.weights()
+        with self._lock:
+            return {
+                name: {**stats.snapshot(), "weight": weights.get(name)}
+                for name, stats in self._stats.items()
+            }
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import update, or_, and_
+from sqlmodel import Session, select
+
+from src.shared.core.database import engine
+from src.shared.models.question import SyllabusContent, GeneratedQuestion
+from src.shared.models.job import (
+    GenerationJob, GenerationJobChunk, JobRequest, JobStatus, JobChunkStatus,
+    JOB_PENDING, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED, TERMINAL_STATES
+)
+
+JOB_WORKERS = int(os.getenv("GENERATOR_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("GENERATOR_JOB_POLL_INTERVAL", "1.0"))
+JOB_CHUNK_MAX_ATTEMPTS = int(os.getenv("GENERATOR_JOB_CHUNK_ATTEMPTS", "3"))
+# A chunk left "running" longer than this is assumed to belong to a dead worker and is reclaimed
+JOB_CHUNK_LEASE_SECONDS = int(os.getenv("GENERATOR_JOB_CHUNK_LEASE", "900"))
+
+
+def create_job(session: Session, request: JobRequest) -> GenerationJob:
+    job = GenerationJob(
+        id=str(uuid.uuid4()),
+        subject=request.subject,
+        grade=request.grade,
+        medium=request.medium,
+        chapter_id=request.chapter_id,
+        chapter_name=request.chapter_name,
+        generation_type=request.generation_type,
+        force_regenerate=request.force_regenerate,
+        total_chunks=len(request.chunks),
+        status=JOB_PENDING if request.chunks else JOB_COMPLETED
+    )
+    session.add(job)
+    for i, chunk in enumerate(request.chunks):
+        session.add(GenerationJobChunk(job_id=job.id, chunk_index=i, content=chunk))
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def get_job_chunks(session: Session, job_id: str) -> List[GenerationJobChunk]:
+    query = select(GenerationJobChunk).where(GenerationJobChunk.job_id == job_id).order_by(GenerationJobChunk.chunk_index)
+    return session.exec(query).all()
+
+
+def job_status(session: Session, job: GenerationJob) -> JobStatus:
+    chunks = get_job_chunks(session, job.id)
+    chunk_statuses = [
+        JobChunkStatus(
+            chunk_index=c.chunk_index,
+            status=c.status,
+            attempts=c.attempts,
+            question_count=len(json.loads(c.question_ids)),
+            error=c.error
+        )
+        for c in chunks
+    ]
+    return JobStatus(
+        id=job.id,
+        status=job.status,
+        subject=job.subject,
+        chapter_id=job.chapter_id,
+        total_chunks=job.total_chunks,
+        completed_chunks=sum(1 for c in chunks if c.status == JOB_COMPLETED),
+        failed_chunks=sum(1 for c in chunks if c.status == JOB_FAILED),
+        question_count=sum(c.question_count for c in chunk_statuses),
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        error=job.error,
+        chunks=chunk_statuses
+    )
+
+
+def job_questions(session: Session, job_id: str, after_chunk: Optional[int] = None) -> List[GeneratedQuestion]:
+    """
+    Returns the questions of every finished chunk so far, in chunk order.
+    """
+    ids = []
+    for chunk in get_job_chunks(session, job_id):
+        if chunk.status != JOB_COMPLETED:
+            continue
+        if after_chunk is not None and chunk.chunk_index <= after_chunk:
+            continue
+        ids.extend(json.loads(chunk.question_ids))
+    return load_questions(session, ids)
+
+
+def load_questions(session: Session, ids: List[int]) -> List[GeneratedQuestion]:
+    """
+    Loads questions by id, preserving the order of `ids`.
+    """
+    if not ids:
+        return []
+    rows = session.exec(select(GeneratedQuestion).where(GeneratedQuestion.id.in_(ids))).all()
+    by_id = {q.id: q for q in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def cancel_job(session: Session, job: GenerationJob) -> GenerationJob:
+    """
+    Cancels a job. Pending chunks are never started; a chunk already running finishes
+    and keeps its questions, but the job stays cancelled.
+    """
+    if job.status in TERMINAL_STATES:
+        return job
+    session.exec(
+        update(GenerationJobChunk)
+        .where(GenerationJobChunk.job_id == job.id, GenerationJobChunk.status == JOB_PENDING)
+        .values(status=JOB_CANCELLED, finished_at=datetime.utcnow())
+    )
+    job.status = JOB_CANCELLED
+    job.updated_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def _refresh_job_state(session: Session, job_id: str):
+    job = session.get(GenerationJob, job_id)
+    if job is None or job.status == JOB_CANCELLED:
+        return
+    statuses = [c.status for c in get_job_chunks(session, job_id)]
+    if any(s in (JOB_PENDING, JOB_RUNNING) for s in statuses):
+        job.status = JOB_RUNNING
+    else:
+        failed = statuses.count(JOB_FAILED)
+        job.status = JOB_FAILED if failed == len(statuses) else JOB_COMPLETED
+        job.error = f"{failed} of {len(statuses)} chunk(s) failed" if failed else None
+    job.updated_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+
+
+class JobWorker:
+    """
+    Background workers that claim pending job chunks from the shared database and process them.
+    Every generator replica runs its own workers; claiming is an atomic conditional UPDATE,
+    so a chunk is only ever processed by one replica at a time.
+    """
+
+    def __init__(self, process: Callable[[SyllabusContent], Awaitable[List[GeneratedQuestion]]], name: str):
+        self.process = process
+        self.name = name
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, workers: int = JOB_WORKERS):
+        for i in range(workers):
+            self._tasks.append(asyncio.create_task(self._run(f"{self.name}#{i}")))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, worker_name: str):
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self.claim_next, worker_name)
+                if claimed is None:
+                    await asyncio.sleep(JOB_POLL_INTERVAL)
+                    continue
+                await self.process_chunk(*claimed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker {worker_name} error: {e}")
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    def claim_next(self, worker_name: str):
+        """
+        Claims the oldest runnable chunk. Returns (chunk_id, job_id, SyllabusContent,
+        worker_name, attempt) or None; the last two identify this claim when finishing.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=JOB_CHUNK_LEASE_SECONDS)
+        runnable = or_(
+            GenerationJobChunk.status == JOB_PENDING,
+            and_(GenerationJobChunk.status == JOB_RUNNING, GenerationJobChunk.started_at < stale_before)
+        )
+        with Session(engine) as session:
+            for _ in range(5):
+                query = (
+                    select(GenerationJobChunk, GenerationJob)
+                    .join(GenerationJob, GenerationJob.id == GenerationJobChunk.job_id)
+                    .where(runnable, GenerationJob.status.in_([JOB_PENDING, JOB_RUNNING]))
+                    .order_by(GenerationJobChunk.id)
+                    .limit(1)
+                )
+                row = session.exec(query).first()
+                if row is None:
+                    return None
+                chunk, job = row
+
+                attempt = chunk.attempts + 1
+                result = session.exec(
+                    update(GenerationJobChunk)
+                    .where(GenerationJobChunk.id == chunk.id, GenerationJobChunk.attempts == chunk.attempts, runnable)
+                    .values(
+                        status=JOB_RUNNING,
+                        worker=worker_name,
+                        started_at=datetime.utcnow(),
+                        attempts=attempt
+                    )
+                )
+                session.commit()
+                if result.rowcount != 1:
+                    # Another replica claimed it first
+                    continue
+
+                if job.status == JOB_PENDING:
+                    _refresh_job_state(session, job.id)
+
+                content = SyllabusContent(
+                    subject=job.subject,
+                    grade=job.grade,
+                    medium=job.medium,
+                    chapter_id=job.chapter_id,
+                    chapter_name=job.chapter_name,
+                    content=chunk.content,
+                    generation_type=job.generation_type,
+                    force_regenerate=job.force_regenerate
+                )
+                return chunk.id, job.id, content, worker_name, attempt
+        return None
+
+    async def process_chunk(self, chunk_id: int, job_id: str, content: SyllabusContent, worker_name: str, attempt: int):
+        print(f"Processing job {job_id} chunk {chunk_id}...")
+        try:
+            questions = await self.process(content)
+            ids = [q.id for q in questions]
+            await asyncio.to_thread(self._finish_chunk, chunk_id, job_id, worker_name, attempt, ids, None)
+        except Exception as e:
+            print(f"Job {job_id} chunk {chunk_id} failed: {e}")
+            await asyncio.to_thread(self._finish_chunk, chunk_id, job_id, worker_name, attempt, [], str(e))
+
+    def _finish_chunk(
+        self,
+        chunk_id: int,
+        job_id: str,
+        worker_name: str,
+        attempt: int,
+        question_ids: List[int],
+        error: Optional[str]
+    ):
+        with Session(engine) as session:
+            job = session.get(GenerationJob, job_id)
+            if error is None:
+                values = {"status": JOB_COMPLETED, "question_ids": json.dumps(question_ids), "error": None}
+            elif job.status == JOB_CANCELLED:
+                values = {"status": JOB_CANCELLED, "error": error}
+            elif attempt < JOB_CHUNK_MAX_ATTEMPTS:
+                values = {"status": JOB_PENDING, "error": error}
+            else:
+                values = {"status": JOB_FAILED, "error": error}
+            # Only the claim that still holds the lease may finish the chunk
+            result = session.exec(
+                update(GenerationJobChunk)
+                .where(
+                    GenerationJobChunk.id == chunk_id,
+                    GenerationJobChunk.status == JOB_RUNNING,
+                    GenerationJobChunk.worker == worker_name,
+                    GenerationJobChunk.attempts == attempt
+                )
+                .values(**values, finished_at=datetime.utcnow())
+            )
+            session.commit()
+            if result.rowcount != 1:
+                print(f"Job {job_id} chunk {chunk_id}: lease was reclaimed by another worker; discarding result")
+                return
+            _refresh_job_state(session, job_id)
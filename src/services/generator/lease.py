@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, Field
+
+from src.shared.core.database import engine
+from src.shared.models.question import SyllabusContent, GeneratedQuestion
+from src.services.generator.cache import PROMPT_VERSION
+
+# Identical chunks generated at the same time on any replica share one LLM call
+GENERATION_DEDUP_ENABLED = os.getenv("GENERATION_DEDUP_ENABLED", "true").lower() == "true"
+# A lease not renewed for this long is considered abandoned (e.g. the replica died)
+GENERATION_LEASE_S = float(os.getenv("GENERATION_LEASE_S", "60"))
+# How often a waiting replica checks whether the lease has been released
+GENERATION_LEASE_POLL_S = float(os.getenv("GENERATION_LEASE_POLL_S", "0.5"))
+
+
+class GenerationLease(SQLModel, table=True):
+    """
+    Marks a generation in progress somewhere in the cluster. The row is deleted when
+    the generation finishes; an expired row can be taken over.
+    """
+    key: str = Field(primary_key=True) # flight_key() of the content
+    owner: str
+    expires_at: float
+
+
+def flight_key(content: SyllabusContent) -> str:
+    """
+    Provider-agnostic address of a generation: the chunk text and the generation parameters.
+    """
+    parts = [
+        content.content,
+        content.subject,
+        content.grade,
+        content.medium,
+        content.generation_type,
+        PROMPT_VERSION,
+    ]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class GenerationLeases:
+    """
+    Cluster-wide single-flight for generations, backed by lease rows in the shared database.
+
+    The first replica to insert the lease row generates; others wait until the row is
+    gone and then read the result from the generation cache. If the leader failed (no
+    cached result) or its lease expired, a waiter takes over and generates itself.
+    """
+
+    def __init__(
+        self,
+        engine=engine,
+        enabled: bool = GENERATION_DEDUP_ENABLED,
+        lease: float = GENERATION_LEASE_S,
+        poll_interval: float = GENERATION_LEASE_POLL_S
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.shared = 0
+        self.takeovers = 0
+
+    def try_acquire(self, key: str, owner: str) -> bool:
+        now = time.time()
+        with Session(self.engine) as session:
+            session.add(GenerationLease(key=key, owner=owner, expires_at=now + self.lease))
+            try:
+                session.commit()
+                return True
+            except IntegrityError:
+                session.rollback()
+            # Take over a lease whose holder stopped renewing it
+            result = session.exec(
+                update(GenerationLease)
+                .where(GenerationLease.key == key, GenerationLease.expires_at < now)
+                .values(owner=owner, expires_at=now + self.lease)
+            )
+            session.commit()
+            if result.rowcount == 1:
+                print(f"Took over expired generation lease {key[:12]}")
+                self.takeovers += 1
+                return True
+            return False
+
+    def renew(self, key: str, owner: str):
+        with Session(self.engine) as session:
+            session.exec(
+                update(GenerationLease)
+                .where(GenerationLease.key == key, GenerationLease.owner == owner)
+                .values(expires_at=time.time() + self.lease)
+            )
+            session.commit()
+
+    def release(self, key: str, owner: str):
+        with Session(self.engine) as session:
+            session.exec(delete(GenerationLease).where(GenerationLease.key == key, GenerationLease.owner == owner))
+            session.commit()
+
+    def is_held(self, key: str) -> bool:
+        with Session(self.engine) as session:
+            lease = session.get(GenerationLease, key)
+            return lease is not None and lease.expires_at >= time.time()
+
+    async def _keep_alive(self, key: str, owner: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self.renew, key, owner)
+            except Exception as e:
+                print(f"Failed to renew generation lease: {e}")
+
+    async def run(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[List[GeneratedQuestion]]],
+        lookup: Callable[[], Optional[List[GeneratedQuestion]]]
+    ) -> List[GeneratedQuestion]:
+        """
+        Runs `generate()` unless another replica is already generating `key`, in which
+        case waits for it and returns `lookup()` (the cached result) instead. `lookup()`
+        is also checked once the lease is won, in case a generation just finished.
+        """
+        owner = uuid.uuid4().hex
+        while True:
+            if await asyncio.to_thread(self.try_acquire, key, owner):
+                keep_alive = asyncio.create_task(self._keep_alive(key, owner))
+                try:
+                    # The previous holder may have finished after the caller's cache miss
+                    result = await asyncio.to_thread(lookup)
+                    if result:
+                        self.shared += 1
+                        return result
+                    self.leaders += 1
+                    return await generate()
+                finally:
+                    keep_alive.cancel()
+                    await asyncio.to_thread(self.release, key, owner)
+
+            print(f"Identical generation in progress elsewhere; waiting for {key[:12]}")
+            while await asyncio.to_thread(self.is_held, key):
+                await asyncio.sleep(self.poll_interval)
+            result = await asyncio.to_thread(lookup)
+            if result:
+                self.shared += 1
+                return result
+            # The leader produced nothing; try to generate ourselves
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "takeovers": self.takeovers,
+        }
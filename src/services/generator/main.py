@@ -1,85 +1,172 @@
 from fastapi import FastAPI, Depends, HTTPException
-from typing import List
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 from sqlmodel import Session
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
-import httpx
 
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
-from src.shared.core.database import get_session, create_db_and_tables
+from src.shared.models.job import GenerationJob, JobRequest, JobStatus, JOB_COMPLETED, TERMINAL_STATES
+from src.shared.core.database import engine, get_session, create_db_and_tables
 from src.services.generator.service import GeneratorService
+from src.services.generator import jobs
+from src.services.generator.rate_limit import rate_limiter_stats
+from src.services.generator.writer import QuestionWriter
+from src.shared.utils.registration import GatewayRegistration
+from src.shared.utils.internal import gateway_urls, notify_gateways
+from src.shared.utils.json_utils import dumps, questions_response
 
 GATEWAY_URL = os.getenv("GATEWAY_URL", "http://127.0.0.1:8000")
 SERVICE_PORT = os.getenv("SERVICE_PORT", "8004")
 SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
 SERVICE_URL = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+registration = GatewayRegistration("generator", SERVICE_URL, GATEWAY_URL, display_name="Generator")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     
-    # Registration with Retry
-    import time
-    max_retries = 10
-    for attempt in range(max_retries):
-        try:
-            async with httpx.AsyncClient() as client:
-                print(f"Registering Generator at {SERVICE_URL} with Gateway {GATEWAY_URL} (Attempt {attempt+1}/{max_retries})...")
-                resp = await client.post(
-                    f"{GATEWAY_URL}/registry/register", 
-                    json={"name": "generator", "url": SERVICE_URL},
-                    timeout=5.0
-                )
-                if resp.status_code == 200:
-                    print(f"Successfully registered Generator")
-                    break
-        except Exception as e:
-            print(f"Failed to register service (Attempt {attempt+1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-        else:
-             if resp.status_code != 200:
-                 print(f"Registration failed with status {resp.status_code}")
-                 if attempt < max_retries - 1:
-                    time.sleep(2)
-    else:
-        print("CRITICAL: Failed to register service after all attempts.")
+    await registration.start()
+
+    job_worker.start()
 
     yield
     
-    # Deregistration
-    try:
-        async with httpx.AsyncClient() as client:
-             await client.post(
-                f"{GATEWAY_URL}/registry/deregister", 
-                json={"name": "generator", "url": SERVICE_URL}
-            )
-    except Exception as e:
-        print(f"Failed to deregister service: {e}")
+    await job_worker.stop()
+    await question_writer.stop()
 
-app = FastAPI(title="Generation Service", lifespan=lifespan)
+    await registration.stop()
+
+app = FastAPI(title="Generation Service", lifespan=lifespan, default_response_class=ORJSONResponse)
 generator_service = GeneratorService()
 
+# Questions from concurrent requests and job chunks are inserted together in short windows
+question_writer = QuestionWriter()
+
+async def publish_questions_changed(questions: List[GeneratedQuestion]):
+    """
+    Tells every Gateway replica which chapters gained questions, so their cached exports
+    and `/questions` responses are dropped. Failures are logged only; cached exports are
+    also keyed on the QBank version, and cached responses expire after their TTL.
+    """
+    chapters = {(q.subject, q.grade, q.medium, q.chapter_id) for q in questions}
+    payloads = [
+        {"subject": subject, "grade": grade, "medium": medium, "chapter_id": chapter_id}
+        for subject, grade, medium, chapter_id in chapters
+    ]
+    if payloads:
+        await notify_gateways(gateway_urls(GATEWAY_URL), "/internal/questions/invalidate", payloads)
+
+async def process_job_chunk(content: SyllabusContent) -> List[GeneratedQuestion]:
+    """
+    Generates and saves questions for one job chunk. Used by the background job workers.
+    """
+    questions = await generator_service.agenerate_questions(content)
+    if not questions:
+        raise ValueError("No questions were generated for this chunk")
+    saved = await question_writer.write(questions)
+    await publish_questions_changed(saved)
+    return saved
+
+job_worker = jobs.JobWorker(process_job_chunk, name=SERVICE_URL)
+
 @app.post("/generate", response_model=List[GeneratedQuestion])
-def generate_questions_endpoint(content: SyllabusContent, session: Session = Depends(get_session)):
+async def generate_questions_endpoint(content: SyllabusContent):
     try:
-        # 1. Generate
-        questions = generator_service.generate_questions(content)
+        # 1. Generate (awaited on the event loop, no thread held during the LLM call)
+        questions = await generator_service.agenerate_questions(content)
         
         # 2. Save (The Generation Service handles writing to DB)
-        for q in questions:
-            session.add(q)
-        session.commit()
-        
-        # 3. Refresh
-        for q in questions:
-            session.refresh(q)
-            
-        return questions
+        saved = await question_writer.write(questions)
+        await publish_questions_changed(saved)
+        return questions_response(saved)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Generation Jobs ---
+
+def _get_job_or_404(session: Session, job_id: str) -> GenerationJob:
+    job = session.get(GenerationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+def create_generation_job(request: JobRequest, session: Session = Depends(get_session)):
+    """
+    Queues a generation job; chunks are processed by the background workers of any generator replica.
+    """
+    job = jobs.create_job(session, request)
+    print(f"Queued job {job.id} with {job.total_chunks} chunk(s)")
+    return jobs.job_status(session, job)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def get_generation_job(job_id: str, session: Session = Depends(get_session)):
+    return jobs.job_status(session, _get_job_or_404(session, job_id))
+
+@app.get("/jobs/{job_id}/questions", response_model=List[GeneratedQuestion])
+def get_generation_job_questions(job_id: str, after_chunk: Optional[int] = None, session: Session = Depends(get_session)):
+    """
+    Returns the questions generated so far (partial results while the job is still running).
+    """
+    _get_job_or_404(session, job_id)
+    return questions_response(jobs.job_questions(session, job_id, after_chunk))
+
+@app.delete("/jobs/{job_id}", response_model=JobStatus)
+def cancel_generation_job(job_id: str, session: Session = Depends(get_session)):
+    job = jobs.cancel_job(session, _get_job_or_404(session, job_id))
+    return jobs.job_status(session, job)
+
+def _poll_job(job_id: str, sent: set):
+    with Session(engine) as session:
+        job = session.get(GenerationJob, job_id)
+        lines = []
+        for chunk in jobs.get_job_chunks(session, job_id):
+            if chunk.status == JOB_COMPLETED and chunk.chunk_index not in sent:
+                questions = jobs.load_questions(session, json.loads(chunk.question_ids))
+                lines.append({
+                    "type": "chunk",
+                    "chunk_index": chunk.chunk_index,
+                    "questions": [q.model_dump(mode="json") for q in questions]
+                })
+                sent.add(chunk.chunk_index)
+        if job.status in TERMINAL_STATES:
+            lines.append({"type": "status", **jobs.job_status(session, job).model_dump(mode="json", exclude={"chunks"})})
+        return lines, job.status in TERMINAL_STATES
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_generation_job(job_id: str, session: Session = Depends(get_session)):
+    """
+    Streams each chunk's questions as NDJSON as soon as the chunk finishes,
+    followed by a final status line once the job is done.
+    """
+    _get_job_or_404(session, job_id)
+
+    async def event_stream():
+        sent = set()
+        while True:
+            lines, done = await run_in_threadpool(_poll_job, job_id, sent)
+            for line in lines:
+                yield dumps(line) + b"\n"
+            if done:
+                break
+            await asyncio.sleep(jobs.JOB_POLL_INTERVAL)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/health")
 def health_check():
-    import os
-    return {"status": "ok", "service": "Generation Service", "port": os.getenv("SERVICE_PORT")}
+    return {
+        "status": "ok",
+        "service": "Generation Service",
+        "port": os.getenv("SERVICE_PORT"),
+        "rate_limits": rate_limiter_stats(),
+        "generation_cache": generator_service.cache.stats(),
+        "dispatch_policy": generator_service.dispatch_policy,
+        "providers": generator_service.health.stats(),
+        "question_writer": question_writer.stats(),
+        "generation_dedup": generator_service.leases.stats()
+    }
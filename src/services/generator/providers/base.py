@@ -1,6 +1,27 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
+from src.shared.models.generation_schema import QuestionBank
+
+def question_bank_to_questions(question_bank: QuestionBank, content: SyllabusContent) -> List[GeneratedQuestion]:
+    """
+    Converts a structured LLM response into GeneratedQuestion rows for the given content.
+    """
+    results = []
+    for item in question_bank.questions:
+        results.append(GeneratedQuestion(
+            subject=content.subject,
+            grade=content.grade,
+            medium=content.medium,
+            chapter_id=content.chapter_id,
+            chapter_name=content.chapter_name,
+            question_type=item.type.value,
+            question_text=item.question_text,
+            options=list(item.options),
+            answer=list(item.answer),
+            explanation=item.explanation
+        ))
+    return results
 
 class BaseLLMProvider(ABC):
     """
@@ -19,9 +40,28 @@ class BaseLLMProvider(ABC):
             List[GeneratedQuestion]: A list of generated questions.
         """
         pass
+
+    @abstractmethod
+    async def agenerate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        """
+        Async variant of generate_questions, using the provider SDK's async client
+        so no thread is held while waiting on the LLM.
+        
+        Args:
+            content (SyllabusContent): The content to generate questions from.
+            
+        Returns:
+            List[GeneratedQuestion]: A list of generated questions.
+        """
+        pass
     
     @property
     @abstractmethod
     def provider_name(self) -> str:
         """Returns the name of the provider."""
         pass
+
+    def _convert_to_generated_questions(
+        self, question_bank: QuestionBank, content: SyllabusContent
+    ) -> List[GeneratedQuestion]:
+        return question_bank_to_questions(question_bank, content)
@@ -1,19 +1,26 @@
 import os
-import json
+import asyncio
 import google.generativeai as genai
-from typing import List
+from typing import List, Optional
 from src.services.generator.providers.base import BaseLLMProvider
+from src.services.generator.rate_limit import get_rate_limiter
+from src.shared.utils.text_utils import estimate_tokens
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
 from src.shared.models.generation_schema import QuestionBank
 
 class GeminiProvider(BaseLLMProvider):
-    def __init__(self, api_key: str = None):
+    # Completion tokens reserved up-front for each call; settled against real usage afterwards
+    EXPECTED_COMPLETION_TOKENS = int(os.getenv("GEMINI_EXPECTED_COMPLETION_TOKENS", "4000"))
+
+    def __init__(self, api_key: str = None, model: str = "gemini-2.5-pro"):
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.model_name = model
+        self.rate_limiter = get_rate_limiter("gemini", model)
         if not self.api_key:
             print("WARNING: GOOGLE_API_KEY not found for GeminiProvider.")
         else:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-pro')
+            self.model = genai.GenerativeModel(self.model_name)
 
     @property
     def provider_name(self) -> str:
@@ -24,34 +31,67 @@ class GeminiProvider(BaseLLMProvider):
             raise ValueError("Google API Key is missing")
 
         prompt = self._build_prompt(content)
+        estimated = estimate_tokens(prompt, "gemini") + self.EXPECTED_COMPLETION_TOKENS
+        self.rate_limiter.acquire_blocking(estimated)
         
         try:
             print(f"DEBUG: Generating content ({content.subject}) with Gemini...")
             
             response = self.model.generate_content(
                 prompt,
-                generation_config={
-                    "response_mime_type": "application/json",
-                    "response_schema": QuestionBank,
-                }
+                generation_config=self._generation_config()
             )
+            self.rate_limiter.settle(estimated, self._total_tokens(response))
+            return self._parse_response(response.text, content)
+
+        except Exception as e:
+            print(f"Error in GeminiProvider: {e}")
+            raise e
+
+    async def agenerate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        if not self.api_key:
+            raise ValueError("Google API Key is missing")
+
+        prompt = self._build_prompt(content)
+        estimated = estimate_tokens(prompt, "gemini") + self.EXPECTED_COMPLETION_TOKENS
+        await self.rate_limiter.acquire(estimated)
+        
+        try:
+            print(f"DEBUG: Generating content ({content.subject}) with Gemini (async)...")
             
-            # Parse the structured response
-            try:
-                question_bank = QuestionBank.model_validate_json(response.text)
-            except Exception as parse_error:
-                print(f"Error parsing JSON from Gemini: {parse_error}")
-                print(f"Raw response: {response.text}")
-                # We might want to raise this so the fallback can handle it if it's a parsing error?
-                # For now, let's treat parsing error as a failure to generate valid questions.
-                raise parse_error
-            
-            return self._convert_to_generated_questions(question_bank, content)
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._generation_config()
+            )
+            await asyncio.to_thread(self.rate_limiter.settle, estimated, self._total_tokens(response))
+            return self._parse_response(response.text, content)
 
         except Exception as e:
             print(f"Error in GeminiProvider: {e}")
             raise e
 
+    def _total_tokens(self, response) -> Optional[int]:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) if usage else None
+
+    def _generation_config(self) -> dict:
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": QuestionBank,
+        }
+
+    def _parse_response(self, response_text: str, content: SyllabusContent) -> List[GeneratedQuestion]:
+        # Parse the structured response
+        try:
+            question_bank = QuestionBank.model_validate_json(response_text)
+        except Exception as parse_error:
+            print(f"Error parsing JSON from Gemini: {parse_error}")
+            print(f"Raw response: {response_text}")
+            # Treat a parsing error as a failure to generate valid questions so the fallback can handle it.
+            raise parse_error
+        
+        return self._convert_to_generated_questions(question_bank, content)
+
     def _build_prompt(self, content: SyllabusContent) -> str:
         base_prompt = f"""
         You are an expert educational content creator.
@@ -107,23 +147,3 @@ class GeminiProvider(BaseLLMProvider):
         """
         
         return base_prompt + instructions + common_instructions
-
-    def _convert_to_generated_questions(self, question_bank: QuestionBank, content: SyllabusContent) -> List[GeneratedQuestion]:
-        results = []
-        for item in question_bank.questions:
-            options_str = json.dumps(item.options)
-            answer_str = json.dumps(item.answer)
-
-            results.append(GeneratedQuestion(
-                subject=content.subject,
-                grade=content.grade,
-                medium=content.medium,
-                chapter_id=content.chapter_id,
-                chapter_name=content.chapter_name,
-                question_type=item.type.value,
-                question_text=item.question_text,
-                options=options_str,
-                answer=answer_str,
-                explanation=item.explanation
-            ))
-        return results
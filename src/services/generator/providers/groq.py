@@ -1,21 +1,29 @@
 import os
 import json
-import time
+import asyncio
 from typing import List, Optional
-from groq import Groq
+from groq import Groq, AsyncGroq, APIStatusError
 from src.services.generator.providers.base import BaseLLMProvider
+from src.services.generator.rate_limit import get_rate_limiter
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
 from src.shared.models.generation_schema import QuestionBank
-from src.shared.utils.text_utils import chunk_text
+from src.shared.utils.text_utils import iter_chunks, estimate_tokens
+
+# Completion tokens reserved up-front for each call; settled against real usage afterwards
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("GROQ_EXPECTED_COMPLETION_TOKENS", "2000"))
+# Content tokens per call; larger inputs are split with the token-aware chunker
+CHUNK_TOKENS = int(os.getenv("GROQ_CHUNK_TOKENS", "3750"))
 
 class GroqProvider(BaseLLMProvider):
     def __init__(self, api_key: str = None, model: str = "qwen/qwen3-32b"):
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         self.model_name = model
+        self.rate_limiter = get_rate_limiter("groq", model)
         if not self.api_key:
             print("WARNING: GROQ_API_KEY not found for GroqProvider.")
         else:
             self.client = Groq(api_key=self.api_key)
+            self.async_client = AsyncGroq(api_key=self.api_key)
 
     @property
     def provider_name(self) -> str:
@@ -25,83 +33,138 @@ class GroqProvider(BaseLLMProvider):
         if not self.api_key:
             raise ValueError("Groq API Key is missing")
 
-        # Check content length and chunk if necessary
-        # 1 token approx 4 chars. Limit 6000 TPM. 
-        # Safe limit: 4000 tokens -> ~16000 chars. 
-        # We use 15000 chars to be safe including prompt overhead.
-        MAX_CHARS_PER_CHUNK = 15000
+        chunks = self._split_content(content)
+        if len(chunks) == 1:
+            return self._generate_single_batch(content)
+
+        all_questions = []
+        for i, chunk_content in enumerate(chunks):
+            print(f"DEBUG: Processing chunk {i+1}/{len(chunks)}...")
+            try:
+                # Throttling is handled by the rate limiter inside each batch
+                questions = self._generate_single_batch(chunk_content)
+                all_questions.extend(questions)
+            except Exception as e:
+                # Log and continue to try getting partial results
+                print(f"Error processing chunk {i+1}: {e}")
+                continue
         
-        if len(content.content) > MAX_CHARS_PER_CHUNK:
-            print(f"DEBUG: Content too large ({len(content.content)} chars). Chunking...")
-            chunks = chunk_text(content.content, max_chars=MAX_CHARS_PER_CHUNK)
-            all_questions = []
-            
-            for i, chunk_text_str in enumerate(chunks):
-                print(f"DEBUG: Processing chunk {i+1}/{len(chunks)}...")
-                
-                # Create a temporary content object for this chunk
-                chunk_content = content.model_copy(update={"content": chunk_text_str})
-                
-                try:
-                    questions = self._generate_single_batch(chunk_content)
-                    all_questions.extend(questions)
-                    
-                    # Throttle if not the last chunk
-                    if i < len(chunks) - 1:
-                        print("DEBUG: Sleeping 60s to respect Rate Limit (6000 TPM)...")
-                        time.sleep(60)
-                        
-                except Exception as e:
-                    print(f"Error processing chunk {i+1}: {e}")
-                    # Continue to next chunk or raise? 
-                    # For now, let's log and continue to try getting partial results
-                    continue
-            
-            return all_questions
-        else:
-             return self._generate_single_batch(content)
+        return all_questions
 
-    def _generate_single_batch(self, content: SyllabusContent) -> List[GeneratedQuestion]:
-        prompt = self._build_prompt(content)
+    async def agenerate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        if not self.api_key:
+            raise ValueError("Groq API Key is missing")
+
+        chunks = self._split_content(content)
+        if len(chunks) == 1:
+            return await self._agenerate_single_batch(content)
+
+        all_questions = []
+        for i, chunk_content in enumerate(chunks):
+            print(f"DEBUG: Processing chunk {i+1}/{len(chunks)}...")
+            try:
+                # Throttling is handled by the rate limiter inside each batch
+                questions = await self._agenerate_single_batch(chunk_content)
+                all_questions.extend(questions)
+            except Exception as e:
+                # Log and continue to try getting partial results
+                print(f"Error processing chunk {i+1}: {e}")
+                continue
         
+        return all_questions
+
+    def _split_content(self, content: SyllabusContent) -> List[SyllabusContent]:
+        # Keep each call within the per-minute token quota, leaving room for the
+        # prompt and the completion (see GROQ_CHUNK_TOKENS).
+        if estimate_tokens(content.content, "groq") <= CHUNK_TOKENS:
+            return [content]
+
+        print(f"DEBUG: Content too large ({len(content.content)} chars). Chunking...")
+        return [
+            content.model_copy(update={"content": chunk_text_str})
+            for chunk_text_str in iter_chunks(content.content, CHUNK_TOKENS, provider="groq")
+        ]
+
+    def _generate_single_batch(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        kwargs = self._completion_kwargs(content)
+        estimated = self._estimate_request_tokens(kwargs)
+        self.rate_limiter.acquire_blocking(estimated)
         try:
             print(f"DEBUG: Generating content ({content.subject}- {content.generation_type}) with Groq ({self.model_name})...")
-            
-            completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert educational content creator. You must output a SINGLE valid JSON object. Do not wrap the output in a list."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=8192,
-                top_p=1,
-                stream=False,
-                response_format={"type": "json_object"}
+            try:
+                raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+            except APIStatusError as e:
+                self.rate_limiter.update_from_headers(e.response.headers)
+                raise
+            completion = raw.parse()
+            self.rate_limiter.settle(estimated, self._total_tokens(completion), raw.headers)
+            return self._parse_response(completion.choices[0].message.content, content)
+
+        except Exception as e:
+            print(f"Error in GroqProvider: {e}")
+            raise e
+
+    async def _agenerate_single_batch(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        kwargs = self._completion_kwargs(content)
+        estimated = self._estimate_request_tokens(kwargs)
+        await self.rate_limiter.acquire(estimated)
+        try:
+            print(
+                f"DEBUG: Generating content ({content.subject}- {content.generation_type}) "
+                f"with Groq ({self.model_name}, async)..."
             )
-            
-            response_text = completion.choices[0].message.content
-            
-            # Parse the structured response
             try:
-                question_bank = QuestionBank.model_validate_json(response_text)
-            except Exception as parse_error:
-                print(f"Error parsing JSON from Groq: {parse_error}")
-                print(f"Raw response: {response_text}")
-                raise parse_error
-            
-            return self._convert_to_generated_questions(question_bank, content)
+                raw = await self.async_client.chat.completions.with_raw_response.create(**kwargs)
+            except APIStatusError as e:
+                await asyncio.to_thread(self.rate_limiter.update_from_headers, e.response.headers)
+                raise
+            completion = raw.parse()
+            await asyncio.to_thread(self.rate_limiter.settle, estimated, self._total_tokens(completion), raw.headers)
+            return self._parse_response(completion.choices[0].message.content, content)
 
         except Exception as e:
             print(f"Error in GroqProvider: {e}")
             raise e
 
+    def _estimate_request_tokens(self, kwargs: dict) -> int:
+        prompt_tokens = sum(estimate_tokens(m["content"], "groq") for m in kwargs["messages"])
+        return prompt_tokens + EXPECTED_COMPLETION_TOKENS
+
+    def _total_tokens(self, completion) -> Optional[int]:
+        usage = getattr(completion, "usage", None)
+        return usage.total_tokens if usage else None
+
+    def _completion_kwargs(self, content: SyllabusContent) -> dict:
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert educational content creator. You must output a SINGLE valid JSON object. Do not wrap the output in a list."
+                },
+                {
+                    "role": "user",
+                    "content": self._build_prompt(content)
+                }
+            ],
+            "temperature": 0.2,
+            "max_tokens": 8192,
+            "top_p": 1,
+            "stream": False,
+            "response_format": {"type": "json_object"}
+        }
+
+    def _parse_response(self, response_text: str, content: SyllabusContent) -> List[GeneratedQuestion]:
+        # Parse the structured response
+        try:
+            question_bank = QuestionBank.model_validate_json(response_text)
+        except Exception as parse_error:
+            print(f"Error parsing JSON from Groq: {parse_error}")
+            print(f"Raw response: {response_text}")
+            raise parse_error
+        
+        return self._convert_to_generated_questions(question_bank, content)
+
     def _build_prompt(self, content: SyllabusContent) -> str:
         # Schema definition for Groq to ensure compliance
         schema_json = json.dumps(QuestionBank.model_json_schema(), indent=2)
@@ -155,23 +218,3 @@ class GroqProvider(BaseLLMProvider):
         """
         
         return base_prompt + instructions + common_instructions
-
-    def _convert_to_generated_questions(self, question_bank: QuestionBank, content: SyllabusContent) -> List[GeneratedQuestion]:
-        results = []
-        for item in question_bank.questions:
-            options_str = json.dumps(item.options)
-            answer_str = json.dumps(item.answer)
-
-            results.append(GeneratedQuestion(
-                subject=content.subject,
-                grade=content.grade,
-                medium=content.medium,
-                chapter_id=content.chapter_id,
-                chapter_name=content.chapter_name,
-                question_type=item.type.value,
-                question_text=item.question_text,
-                options=options_str,
-                answer=answer_str,
-                explanation=item.explanation
-            ))
-        return results
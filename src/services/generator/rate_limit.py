@@ -0,0 +1,280 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Field
+
+from src.shared.core.database import engine
+
+# Default quotas per provider. Override with <PROVIDER>_RPM / <PROVIDER>_TPM, e.g. GROQ_TPM=6000.
+DEFAULT_LIMITS = {
+    "groq": {"rpm": 30, "tpm": 6000},
+    "gemini": {"rpm": 5, "tpm": 250000},
+}
+
+# "memory" keeps buckets per process; "database" shares them across generator replicas
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+
+
+class RateLimitBucket(SQLModel, table=True):
+    """
+    Shared token bucket state, used when RATE_LIMIT_STORE=database.
+    """
+    key: str = Field(primary_key=True)
+    tokens: float
+    updated_at: float
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets held in process memory.
+    """
+
+    def __init__(self, timer=time.monotonic):
+        self._timer = timer
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, key: str, capacity: float, rate: float) -> list:
+        now = self._timer()
+        bucket = self._buckets.setdefault(key, [capacity, now])
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        return bucket
+
+    def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        """
+        Consumes `amount` tokens if available and returns 0, otherwise returns the seconds to wait.
+        """
+        with self._lock:
+            bucket = self._refill(key, capacity, rate)
+            if bucket[0] >= amount:
+                bucket[0] -= amount
+                return 0.0
+            return (amount - bucket[0]) / rate
+
+    def adjust(self, key: str, capacity: float, rate: float, delta: float):
+        with self._lock:
+            bucket = self._refill(key, capacity, rate)
+            bucket[0] = min(capacity, bucket[0] + delta)
+
+    def set(self, key: str, capacity: float, rate: float, tokens: float):
+        with self._lock:
+            bucket = self._refill(key, capacity, rate)
+            bucket[0] = min(capacity, tokens)
+
+
+class DatabaseBucketStore:
+    """
+    Token buckets stored in the shared database so every generator replica draws from one budget.
+    Each operation is a single UPDATE that refills and spends in the same statement, so
+    concurrent replicas never read-modify-write the same row (SELECT ... FOR UPDATE is a
+    no-op on SQLite). Rows are created with an INSERT whose duplicate-key error is ignored.
+    """
+
+    def __init__(self, timer=time.time, bind=None):
+        # Wall clock, because the timestamps are compared across processes
+        self._timer = timer
+        self._engine = bind or engine
+        self._created = set()
+
+    def _ensure_row(self, key: str, capacity: float):
+        if key in self._created:
+            return
+        try:
+            with self._engine.begin() as connection:
+                connection.execute(
+                    insert(RateLimitBucket).values(key=key, tokens=capacity, updated_at=self._timer())
+                )
+        except IntegrityError:
+            # Another replica created it first
+            pass
+        self._created.add(key)
+
+    @staticmethod
+    def _capped(value, capacity: float):
+        return case((value > capacity, capacity), else_=value)
+
+    def _refilled(self, now: float, capacity: float, rate: float):
+        elapsed = case((RateLimitBucket.updated_at < now, now - RateLimitBucket.updated_at), else_=0.0)
+        return self._capped(RateLimitBucket.tokens + elapsed * rate, capacity)
+
+    def _update(self, key: str, now: float, tokens, where=None):
+        statement = update(RateLimitBucket).where(RateLimitBucket.key == key)
+        if where is not None:
+            statement = statement.where(where)
+        statement = statement.values(tokens=tokens, updated_at=now).returning(RateLimitBucket.tokens)
+        with self._engine.begin() as connection:
+            return connection.execute(statement).first()
+
+    def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        self._ensure_row(key, capacity)
+        now = self._timer()
+        refilled = self._refilled(now, capacity, rate)
+        if self._update(key, now, refilled - amount, where=refilled >= amount) is not None:
+            return 0.0
+        # Not enough tokens: nothing was written, so a plain read is enough to size the wait
+        with self._engine.connect() as connection:
+            available = connection.execute(
+                select(refilled).where(RateLimitBucket.key == key)
+            ).scalar_one()
+        return max(0.0, (amount - available) / rate)
+
+    def adjust(self, key: str, capacity: float, rate: float, delta: float):
+        self._ensure_row(key, capacity)
+        now = self._timer()
+        refilled = self._refilled(now, capacity, rate)
+        self._update(key, now, self._capped(refilled + delta, capacity))
+
+    def set(self, key: str, capacity: float, rate: float, tokens: float):
+        self._ensure_row(key, capacity)
+        self._update(key, self._timer(), min(capacity, tokens))
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses rate limit reset values such as "7.66s", "2m59.56s", "1h2m" or "250ms" into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets for one provider/model.
+
+    Callers `acquire` an estimated token count before each LLM call and wait (in FIFO order)
+    until both budgets allow it. After the call, `record_usage` settles the estimate against
+    the real usage, and `update_from_headers` re-syncs the buckets with the provider's view.
+    """
+
+    def __init__(self, key: str, requests_per_minute: float, tokens_per_minute: float, store=None):
+        self.key = key
+        self.rpm = float(requests_per_minute)
+        self.tpm = float(tokens_per_minute)
+        self.store = store or InMemoryBucketStore()
+        self._lock: Optional[asyncio.Lock] = None
+        self._sync_lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    @property
+    def _request_bucket(self):
+        return f"{self.key}:requests", self.rpm, self.rpm / 60.0
+
+    @property
+    def _token_bucket(self):
+        return f"{self.key}:tokens", self.tpm, self.tpm / 60.0
+
+    def _try_acquire(self, tokens: int) -> float:
+        # A single call can never need more than a full minute of budget
+        tokens = min(float(tokens), self.tpm)
+        key, capacity, rate = self._token_bucket
+        wait = self.store.take(key, capacity, rate, tokens)
+        if wait > 0:
+            return wait
+        key, capacity, rate = self._request_bucket
+        wait = self.store.take(key, capacity, rate, 1)
+        if wait > 0:
+            # Give the tokens back until the request slot is free
+            self.store.adjust(*self._token_bucket, tokens)
+        return wait
+
+    async def acquire(self, tokens: int):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = await asyncio.to_thread(self._try_acquire, tokens)
+                if wait <= 0:
+                    return
+                print(f"Rate limit ({self.key}): waiting {wait:.1f}s for {tokens} tokens")
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens: int):
+        with self._sync_lock:
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait <= 0:
+                    return
+                print(f"Rate limit ({self.key}): waiting {wait:.1f}s for {tokens} tokens")
+                self.waited_seconds += wait
+                time.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int], headers: Optional[Mapping[str, str]] = None):
+        """
+        Called after each LLM call: reconcile the estimate, then trust the provider's headers.
+        """
+        self.record_usage(estimated_tokens, actual_tokens)
+        if headers is not None:
+            self.update_from_headers(headers)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if actual_tokens is None:
+            return
+        self.store.adjust(*self._token_bucket, float(estimated_tokens) - float(actual_tokens))
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Self-corrects from x-ratelimit-* / retry-after response headers.
+        """
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            try:
+                self.store.set(*self._token_bucket, float(remaining))
+            except ValueError:
+                pass
+
+        retry_after = parse_reset_duration(headers.get("retry-after"))
+        if retry_after:
+            # Drain the bucket far enough that refilling takes `retry_after` seconds
+            key, capacity, rate = self._token_bucket
+            self.store.set(key, capacity, rate, -retry_after * rate)
+
+    def stats(self) -> dict:
+        return {
+            "requests_per_minute": self.rpm,
+            "tokens_per_minute": self.tpm,
+            "waited_seconds": round(self.waited_seconds, 1),
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def _make_store():
+    if RATE_LIMIT_STORE == "database":
+        return DatabaseBucketStore()
+    return InMemoryBucketStore()
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """
+    Returns the process-wide limiter for a provider/model pair.
+    """
+    key = f"{provider.lower()}:{model}"
+    if key not in _limiters:
+        defaults = DEFAULT_LIMITS.get(provider.lower(), {"rpm": 60, "tpm": 100000})
+        rpm = float(os.getenv(f"{provider.upper()}_RPM", defaults["rpm"]))
+        tpm = float(os.getenv(f"{provider.upper()}_TPM", defaults["tpm"]))
+        _limiters[key] = RateLimiter(key, rpm, tpm, store=_make_store())
+    return _limiters[key]
+
+
+def rate_limiter_stats() -> dict:
+    return {key: limiter.stats() for key, limiter in _limiters.items()}
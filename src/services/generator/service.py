@@ -1,7 +1,7 @@
 import os
 import json
 import google.generativeai as genai
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
 from src.shared.models.generation_schema import QuestionBank
@@ -16,18 +16,44 @@ if API_KEY:
 
 import os
 import time
-from typing import List
+import asyncio
+from typing import List, Optional
 from dotenv import load_dotenv
 from src.shared.models.question import SyllabusContent, GeneratedQuestion
 from src.services.generator.providers.gemini import GeminiProvider
 from src.services.generator.providers.groq import GroqProvider
+from src.services.generator.cache import GenerationCache
+from src.services.generator.health import ProviderHealth
+from src.services.generator.lease import GenerationLeases, flight_key
 
 # Load env vars
 load_dotenv()
 
+# How providers are tried for one generation:
+#   sequential - next provider only after the previous one fails
+#   hedged     - also start the next provider once the current one runs past its p95 latency
+#   race       - start all providers at once; the first valid result wins
+DISPATCH_POLICIES = ("sequential", "hedged", "race")
+DISPATCH_POLICY = os.getenv("GENERATOR_DISPATCH_POLICY", "sequential").lower()
+# Hedge delay used until a provider has enough latency samples for a p95
+HEDGE_DELAY = float(os.getenv("GENERATOR_HEDGE_DELAY_MS", "8000")) / 1000
+
 class GeneratorService:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: GenerationCache = None,
+        dispatch_policy: str = DISPATCH_POLICY,
+        health: ProviderHealth = None,
+        leases: GenerationLeases = None
+    ):
         self.providers = []
+        self.cache = cache or GenerationCache()
+        self.health = health or ProviderHealth()
+        self.leases = leases or GenerationLeases()
+        if dispatch_policy not in DISPATCH_POLICIES:
+            print(f"Unknown GENERATOR_DISPATCH_POLICY '{dispatch_policy}', using sequential")
+            dispatch_policy = "sequential"
+        self.dispatch_policy = dispatch_policy
         
         # Load generator preferences from env
         primary = os.getenv("PRIMARY_GENERATOR", "gemini").lower()
@@ -72,7 +98,12 @@ class GeneratorService:
         """
         Attempts to generate questions using configured providers in order.
         Falls back to the next provider if the current one fails.
+        Identical content is served from the generation cache unless force_regenerate is set.
         """
+        cached = self.cache.lookup(content, self.providers)
+        if cached:
+            return cached
+
         errors = []
         
         for provider in self.providers:
@@ -81,6 +112,7 @@ class GeneratorService:
                 result = provider.generate_questions(content)
                 if result:
                     print(f"Successfully generated {len(result)} questions with {provider.provider_name}")
+                    self.cache.store(content, provider, result)
                     return result
             except Exception as e:
                 error_msg = f"Provider {provider.provider_name} failed: {str(e)}"
@@ -95,3 +127,101 @@ class GeneratorService:
             
         return []
 
+    async def agenerate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        """
+        Async version of generate_questions. Providers are awaited through their async
+        clients, so many generations can be in flight on a single event loop.
+        With the hedged or race dispatch policy, several providers may run at once;
+        the first to return questions wins and the others are cancelled. Providers are
+        ordered by observed health and skipped while their circuit breaker is open.
+        If the same chunk is already being generated on any replica, waits for that
+        generation and returns its cached result instead of calling the LLM again.
+        """
+        cached = await asyncio.to_thread(self.cache.lookup, content, self.providers)
+        if cached:
+            return cached
+
+        # Waiters read the leader's result from the generation cache, so both must be on
+        if self.leases.enabled and self.cache.enabled and not content.force_regenerate:
+            return await self.leases.run(
+                flight_key(content),
+                lambda: self._agenerate(content),
+                lambda: self.cache.lookup(content, self.providers)
+            )
+        return await self._agenerate(content)
+
+    async def _agenerate(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        errors = []
+        pending = {}
+        remaining = self.health.route(self.providers)
+
+        def launch():
+            # Providers with an open circuit are skipped instead of waiting out their timeouts
+            while remaining:
+                provider = remaining.pop(0)
+                if self.health.allow(provider.provider_name):
+                    print(f"Attempting generation with provider: {provider.provider_name}")
+                    pending[asyncio.create_task(self._attempt(provider, content))] = provider
+                    return
+                error_msg = f"Provider {provider.provider_name} skipped: circuit open"
+                print(error_msg)
+                errors.append(error_msg)
+
+        try:
+            launch()
+            while pending:
+                delay = self._hedge_delay(list(pending.values())[-1]) if remaining else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"Provider {list(pending.values())[-1].provider_name} is slow; hedging with the next provider")
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        result = task.result()
+                        print(f"Successfully generated {len(result)} questions with {provider.provider_name}")
+                        await asyncio.to_thread(self.cache.store, content, provider, result)
+                        return result
+                    error_msg = f"Provider {provider.provider_name} failed: {str(task.exception())}"
+                    print(error_msg)
+                    errors.append(error_msg)
+                    # Continue to next provider
+                    if remaining:
+                        launch()
+        finally:
+            # Cancel the losers of a hedge or race
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        # If we get here, all providers failed
+        print("All providers failed to generate questions.")
+        for err in errors:
+            print(f"- {err}")
+            
+        return []
+
+    def _hedge_delay(self, provider) -> Optional[float]:
+        """
+        Seconds to wait on `provider` before starting the next one; None waits for it to finish.
+        """
+        if self.dispatch_policy == "race":
+            return 0
+        if self.dispatch_policy == "hedged":
+            p95 = self.health.p95(provider.provider_name)
+            return p95 if p95 is not None else HEDGE_DELAY
+        return None
+
+    async def _attempt(self, provider, content: SyllabusContent) -> List[GeneratedQuestion]:
+        start = time.monotonic()
+        try:
+            result = await provider.agenerate_questions(content)
+            if not result:
+                raise ValueError("no questions returned")
+        except Exception:
+            self.health.record_failure(provider.provider_name, time.monotonic() - start)
+            raise
+        self.health.record_success(provider.provider_name, time.monotonic() - start)
+        return result
@@ -0,0 +1,130 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from src.shared.core.database import engine
+from src.shared.models.question import GeneratedQuestion
+
+# Writes arriving within this window are committed together
+WRITER_FLUSH_WINDOW = float(os.getenv("GENERATOR_WRITE_FLUSH_MS", "20")) / 1000
+WRITER_MAX_BATCH = int(os.getenv("GENERATOR_WRITE_MAX_BATCH", "1000"))
+
+QUESTION_COLUMNS = [column.name for column in GeneratedQuestion.__table__.columns if column.name != "id"]
+
+
+def bulk_insert_questions(session: Session, questions: List[GeneratedQuestion]) -> List[GeneratedQuestion]:
+    """
+    Inserts questions with a single multi-row INSERT ... RETURNING id and sets their ids.
+    Does not commit.
+    """
+    if not questions:
+        return questions
+    rows = [{name: getattr(q, name) for name in QUESTION_COLUMNS} for q in questions]
+    # Postgres: SQLAlchemy's insertmanyvalues keeps RETURNING in parameter order within one
+    # statement. SQLite would fall back to row-by-row for that, but it assigns increasing
+    # rowids in VALUES order, so sorting the returned ids is enough.
+    ordered = session.get_bind().dialect.name != "sqlite"
+    statement = insert(GeneratedQuestion).returning(GeneratedQuestion.id, sort_by_parameter_order=ordered)
+    ids = session.execute(statement, rows).scalars().all()
+    if not ordered:
+        ids = sorted(ids)
+    for q, question_id in zip(questions, ids):
+        q.id = question_id
+    return questions
+
+
+def save_questions_bulk(questions: List[GeneratedQuestion], engine=engine) -> List[GeneratedQuestion]:
+    with Session(engine) as session:
+        bulk_insert_questions(session, questions)
+        session.commit()
+    return questions
+
+
+class QuestionWriter:
+    """
+    Coalesces question writes from concurrent requests into one INSERT and one commit
+    per flush window. Callers await `write()` and get their questions back with ids.
+    """
+
+    def __init__(self, engine=engine, flush_window: float = WRITER_FLUSH_WINDOW, max_batch: int = WRITER_MAX_BATCH):
+        self.engine = engine
+        self.flush_window = flush_window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[List[GeneratedQuestion], asyncio.Future]] = []
+        self._pending_rows = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self.batches = 0
+        self.rows = 0
+
+    async def write(self, questions: List[GeneratedQuestion]) -> List[GeneratedQuestion]:
+        if not questions:
+            return questions
+        future = asyncio.get_running_loop().create_future()
+        if self._flusher is None or self._flusher.done():
+            # A new event per flusher keeps the writer usable across event loops
+            self._full = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run())
+        self._pending.append((questions, future))
+        self._pending_rows += len(questions)
+        if self._pending_rows >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        # Keeps flushing while writes keep arriving, including those queued during a flush
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_window)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        if self._full is not None:
+            self._full.clear()
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._insert, [q for questions, _ in batch for q in questions])
+            for questions, future in batch:
+                if not future.done():
+                    future.set_result(questions)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+                return
+            # Retry request by request so one bad row only fails its own caller
+            print(f"Batched question write failed ({e}); retrying {len(batch)} writes individually")
+            for questions, future in batch:
+                try:
+                    await asyncio.to_thread(self._insert, questions)
+                    if not future.done():
+                        future.set_result(questions)
+                except Exception as single_error:
+                    self._fail(future, single_error)
+
+    def _fail(self, future: asyncio.Future, error: Exception):
+        if not future.done():
+            future.set_exception(error)
+
+    def _insert(self, questions: List[GeneratedQuestion]):
+        save_questions_bulk(questions, self.engine)
+        self.batches += 1
+        self.rows += len(questions)
+
+    async def stop(self):
+        if self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "flush_window_ms": round(self.flush_window * 1000),
+        }
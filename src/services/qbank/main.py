@@ -1,13 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import List, Optional
+from sqlalchemy import func
 from sqlmodel import Session, select
 from contextlib import asynccontextmanager
 import os
-import httpx
 
 # Import shared components
-from src.shared.models.question import GeneratedQuestion
-from src.shared.core.database import get_session, create_db_and_tables
+from src.shared.models.question import GeneratedQuestion, json_array_length
+from src.shared.core.database import engine, get_session, create_db_and_tables
+from src.shared.utils.registration import GatewayRegistration
+from src.shared.utils.json_utils import questions_response
 
 # Determine Service Name based on what we are running
 # In a real setup, this might be passed as an ENV var 'SERVICE_NAME'
@@ -16,63 +19,43 @@ SERVICE_NAME = os.getenv("SERVICE_NAME", "general_qbank") # Default to general i
 GATEWAY_URL = os.getenv("GATEWAY_URL", "http://127.0.0.1:8000")
 SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
 SERVICE_URL = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+registration = GatewayRegistration(SERVICE_NAME, SERVICE_URL, GATEWAY_URL)
+
+# Keyset pagination
+DEFAULT_PAGE_SIZE = int(os.getenv("QBANK_DEFAULT_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = int(os.getenv("QBANK_MAX_PAGE_SIZE", "5000"))
+# Rows fetched per round-trip from the server-side cursor in NDJSON mode
+STREAM_BATCH_SIZE = int(os.getenv("QBANK_STREAM_BATCH_SIZE", "500"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     
-    # Registration with Retry
-    import time
-    max_retries = 10
-    for attempt in range(max_retries):
-        try:
-            async with httpx.AsyncClient() as client:
-                print(f"Registering {SERVICE_NAME} at {SERVICE_URL} with Gateway (Attempt {attempt+1}/{max_retries})...")
-                resp = await client.post(
-                    f"{GATEWAY_URL}/registry/register", 
-                    json={"name": SERVICE_NAME, "url": SERVICE_URL},
-                    timeout=5.0
-                )
-                if resp.status_code == 200:
-                    print(f"Successfully registered {SERVICE_NAME}")
-                    break
-        except Exception as e:
-            print(f"Failed to register service (Attempt {attempt+1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-        else:
-             if resp.status_code != 200:
-                 print(f"Registration failed with status {resp.status_code}")
-                 if attempt < max_retries - 1:
-                    time.sleep(2)
-    else:
-        print("CRITICAL: Failed to register service after all attempts.")
-        
+    await registration.start()
+
     yield
     
-    # Deregistration
-    try:
-        async with httpx.AsyncClient() as client:
-             await client.post(
-                f"{GATEWAY_URL}/registry/deregister", 
-                json={"name": SERVICE_NAME, "url": SERVICE_URL}
-            )
-    except Exception as e:
-        print(f"Failed to deregister service: {e}")
-
-app = FastAPI(title=f"{SERVICE_NAME.replace('_', ' ').title()}", lifespan=lifespan)
+    await registration.stop()
 
-@app.get("/questions", response_model=List[GeneratedQuestion])
-def list_questions(
-    medium: Optional[str] = None, 
-    subject: Optional[str] = None,
-    grade: Optional[str] = None,
-    chapter_id: Optional[str] = None,
-    start_id: Optional[int] = None,
-    end_id: Optional[int] = None,
-    session: Session = Depends(get_session)
-):
-    query = select(GeneratedQuestion)
+app = FastAPI(
+    title=f"{SERVICE_NAME.replace('_', ' ').title()}",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+def _stream_questions(query):
+    """
+    Yields NDJSON in batches from a server-side cursor, so memory stays flat for any result size.
+    Uses its own session because the response outlives the request-scoped one.
+    """
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for batch in result.partitions():
+            yield "".join(q.model_dump_json() + "\n" for q in batch)
+
+def _apply_filters(query, medium, subject, grade, chapter_id, start_id, end_id, question_type=None, option_count=None):
     if medium:
         query = query.where(GeneratedQuestion.medium == medium)
     if subject:
@@ -81,14 +64,95 @@ def list_questions(
         query = query.where(GeneratedQuestion.grade == grade)
     if chapter_id:
         query = query.where(GeneratedQuestion.chapter_id == chapter_id)
+    if question_type:
+        query = query.where(GeneratedQuestion.question_type == question_type)
+    # Served by the (question_type, option count) expression index
+    if option_count is not None:
+        query = query.where(json_array_length(GeneratedQuestion.options) == option_count)
     
     # ID Range Filter
     if start_id is not None:
         query = query.where(GeneratedQuestion.id >= start_id)
     if end_id is not None:
         query = query.where(GeneratedQuestion.id <= end_id)
-        
-    return session.exec(query).all()
+    return query
+
+@app.get("/questions/version")
+def questions_version(
+    medium: Optional[str] = None, 
+    subject: Optional[str] = None,
+    grade: Optional[str] = None,
+    chapter_id: Optional[str] = None,
+    start_id: Optional[int] = None,
+    end_id: Optional[int] = None,
+    question_type: Optional[str] = None,
+    option_count: Optional[int] = Query(None, ge=0),
+    session: Session = Depends(get_session)
+):
+    """
+    A cheap version stamp of the matching questions: their count and highest id.
+    Both change whenever questions are added or removed, so callers can use them as a cache key.
+    """
+    query = _apply_filters(
+        select(func.count(GeneratedQuestion.id), func.max(GeneratedQuestion.id)),
+        medium, subject, grade, chapter_id, start_id, end_id, question_type, option_count
+    )
+    count, max_id = session.exec(query).one()
+    return {"count": count, "max_id": max_id}
+
+@app.get("/questions", response_model=List[GeneratedQuestion])
+def list_questions(
+    request: Request,
+    medium: Optional[str] = None, 
+    subject: Optional[str] = None,
+    grade: Optional[str] = None,
+    chapter_id: Optional[str] = None,
+    start_id: Optional[int] = None,
+    end_id: Optional[int] = None,
+    question_type: Optional[str] = None,
+    option_count: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    include_total: bool = False,
+    session: Session = Depends(get_session)
+):
+    """
+    Lists questions ordered by id, one page at a time.
+    Pass the `X-Next-After-Id` response header back as `after_id` to fetch the next page;
+    the header is absent on the last page. `include_total` adds an `X-Total-Count` header.
+
+    With `Accept: application/x-ndjson` every matching question (after `after_id`) is streamed,
+    one JSON object per line, and `limit` is ignored.
+
+    `option_count` keeps questions with exactly that many options, e.g.
+    `question_type=mcq&option_count=4`.
+    """
+    query = _apply_filters(
+        select(GeneratedQuestion), medium, subject, grade, chapter_id, start_id, end_id, question_type, option_count
+    )
+    headers = {}
+
+    if include_total:
+        total = session.exec(select(func.count()).select_from(query.subquery())).one()
+        headers["X-Total-Count"] = str(total)
+
+    # Keyset pagination: seek past the last seen id instead of OFFSET
+    if after_id is not None:
+        query = query.where(GeneratedQuestion.id > after_id)
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_questions(query.order_by(GeneratedQuestion.id)),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers
+        )
+
+    questions = session.exec(query.order_by(GeneratedQuestion.id).limit(limit)).all()
+
+    if len(questions) == limit:
+        headers["X-Next-After-Id"] = str(questions[-1].id)
+    # Serialised to bytes in one pass rather than through response_model
+    return questions_response(questions, headers)
 
 @app.get("/health")
 def health_check():
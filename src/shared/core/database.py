@@ -1,3 +1,4 @@
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import SQLModel, create_engine, Session
 import os
 
@@ -12,8 +13,19 @@ else:
     # Postgres or other DB
     engine = create_engine(DATABASE_URL)
 
+def create_indexes(engine=engine):
+    """
+    create_all() skips indexes on tables that already exist, so add any that are missing.
+    IF NOT EXISTS rather than checkfirst: reflection does not see expression indexes.
+    """
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    create_indexes(engine)
 
 def get_session():
     with Session(engine) as session:
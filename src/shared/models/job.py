@@ -0,0 +1,76 @@
+from typing import List, Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+# Job / chunk lifecycle
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+TERMINAL_STATES = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+# --- Pydantic Schemas (for API responses/requests) ---
+
+class JobRequest(SQLModel):
+    subject: str
+    grade: str
+    medium: str
+    chapter_id: str
+    chapter_name: str
+    generation_type: str = "general"
+    force_regenerate: bool = False
+    chunks: List[str]
+
+class JobChunkStatus(SQLModel):
+    chunk_index: int
+    status: str
+    attempts: int
+    question_count: int
+    error: Optional[str] = None
+
+class JobStatus(SQLModel):
+    id: str
+    status: str
+    subject: str
+    chapter_id: str
+    total_chunks: int
+    completed_chunks: int
+    failed_chunks: int
+    question_count: int
+    created_at: datetime
+    updated_at: datetime
+    error: Optional[str] = None
+    chunks: List[JobChunkStatus] = []
+
+# --- Database Models ---
+
+class GenerationJob(SQLModel, table=True):
+    id: str = Field(primary_key=True) # uuid4
+    status: str = Field(default=JOB_PENDING, index=True)
+    subject: str
+    grade: str
+    medium: str
+    chapter_id: str
+    chapter_name: str
+    generation_type: str = Field(default="general")
+    force_regenerate: bool = Field(default=False)
+    total_chunks: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    error: Optional[str] = None
+
+class GenerationJobChunk(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: str = Field(foreign_key="generationjob.id", index=True)
+    chunk_index: int
+    status: str = Field(default=JOB_PENDING, index=True)
+    content: str
+    # JSON list of GeneratedQuestion ids produced by this chunk
+    question_ids: str = Field(default="[]")
+    attempts: int = Field(default=0)
+    worker: Optional[str] = None # Which generator instance claimed the chunk
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -1,6 +1,32 @@
-from typing import Optional
+from typing import List, Optional
+from sqlalchemy import JSON, Column, Index, Integer
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from sqlmodel import Field, SQLModel
 
+# JSONB on Postgres; elsewhere SQLAlchemy's JSON type (JSON1 text on SQLite)
+JSONList = JSON().with_variant(JSONB(), "postgresql")
+
+
+class json_array_length(FunctionElement):
+    """
+    Length of a JSON array column, compiled to the dialect's function.
+    """
+    type = Integer()
+    name = "json_array_length"
+    inherit_cache = True
+
+
+@compiles(json_array_length)
+def _compile_json_array_length(element, compiler, **kw):
+    return f"json_array_length({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_length, "postgresql")
+def _compile_jsonb_array_length(element, compiler, **kw):
+    return f"jsonb_array_length({compiler.process(element.clauses, **kw)})"
+
 class SyllabusContent(SQLModel):
     subject: str
     grade: str
@@ -9,8 +35,15 @@ class SyllabusContent(SQLModel):
     chapter_name: str
     content: str
     generation_type: str = "general"
+    force_regenerate: bool = False # Skip the generation cache
 
 class GeneratedQuestion(SQLModel, table=True):
+    # Composite indexes matching the QBank filter shapes; trailing id supports keyset pagination
+    __table_args__ = (
+        Index("ix_generatedquestion_chapter", "subject", "grade", "medium", "chapter_id", "id"),
+        Index("ix_generatedquestion_medium_subject", "medium", "subject", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     subject: str
     grade: str
@@ -21,8 +54,16 @@ class GeneratedQuestion(SQLModel, table=True):
     question_type: str # 'fill_in_the_blank', 'mcq', or 'structured'
     question_text: str 
     
-    # JSON strings for storage
-    options: str = Field(default="[]") 
-    answer: str = Field(default="")
+    # Native JSON arrays of strings
+    options: List[str] = Field(default_factory=list, sa_column=Column(JSONList, nullable=False))
+    answer: List[str] = Field(default_factory=list, sa_column=Column(JSONList, nullable=False))
     
     explanation: Optional[str] = None
+
+
+# Expression index for filters such as "MCQs with 4 options"
+Index(
+    "ix_generatedquestion_type_option_count",
+    GeneratedQuestion.__table__.c.question_type,
+    json_array_length(GeneratedQuestion.__table__.c.options)
+)
@@ -0,0 +1,49 @@
+import asyncio
+import hmac
+import os
+from typing import Iterable, List, Optional
+
+import httpx
+from fastapi import Header, HTTPException
+
+# Shared secret for service-to-gateway calls on /internal/*. Unset disables those endpoints.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+def gateway_urls(gateway_url: str) -> List[str]:
+    """
+    Every gateway replica to notify: GATEWAY_URLS (comma-separated) if set, else `gateway_url`.
+    """
+    urls = [url.strip().rstrip("/") for url in os.getenv("GATEWAY_URLS", "").split(",") if url.strip()]
+    return urls or [gateway_url]
+
+
+async def notify_gateways(urls: Iterable[str], path: str, payloads: List[dict], timeout: float = 2.0) -> int:
+    """
+    POSTs each payload to `path` on every gateway, concurrently. Failures are logged per
+    gateway and do not stop the others. Returns how many gateways accepted every payload.
+    """
+    async def notify(client: httpx.AsyncClient, url: str) -> bool:
+        try:
+            for payload in payloads:
+                response = await client.post(f"{url}{path}", json=payload, timeout=timeout)
+                response.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"Failed to notify gateway {url}{path}: {e}")
+            return False
+
+    async with httpx.AsyncClient(headers={INTERNAL_TOKEN_HEADER: INTERNAL_API_TOKEN}) as client:
+        results = await asyncio.gather(*(notify(client, url) for url in urls))
+    return sum(results)
+
+
+def verify_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """
+    FastAPI dependency guarding /internal/* endpoints with the shared INTERNAL_API_TOKEN.
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Internal endpoints are disabled (INTERNAL_API_TOKEN is not set)")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid internal token")
@@ -0,0 +1,38 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+import orjson
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from src.shared.models.question import GeneratedQuestion
+
+# Serialises question lists straight to bytes in pydantic-core, skipping the
+# jsonable_encoder + json.dumps round trip FastAPI does for response_model
+_question_list = TypeAdapter(List[GeneratedQuestion])
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data) -> Any:
+    return orjson.loads(data)
+
+
+def questions_json(questions: Iterable[GeneratedQuestion]) -> bytes:
+    return _question_list.dump_json(list(questions))
+
+
+def questions_response(questions: Iterable[GeneratedQuestion], headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=questions_json(questions), media_type="application/json", headers=headers)
+
+
+def passthrough(response) -> Response:
+    """
+    Returns an upstream httpx response's body to the client as-is, without decoding it.
+    """
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/json")
+    )
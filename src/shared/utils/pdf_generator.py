@@ -1,79 +1,223 @@
+import asyncio
+import base64
+import hashlib
 import io
-import json
-import textwrap
-from typing import List, Union
+import os
+import re
+import threading
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from cachetools import LRUCache
+from PIL import Image, PngImagePlugin
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Indenter, Image as RLImage, KeepTogether
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 
 # Matplotlib for Math Rendering
 import matplotlib
 matplotlib.use('Agg') # Non-interactive backend
-import matplotlib.pyplot as plt
+from matplotlib.font_manager import FontProperties
+from matplotlib.mathtext import MathTextParser
 
 from src.shared.models.question import GeneratedQuestion
+from src.shared.utils.workers import get_process_pool
+
+MATH_RENDER_DPI = 200
+# In-memory cache of rendered math spans, bounded by PNG bytes
+MATH_RENDER_CACHE_MAX_BYTES = int(os.getenv("MATH_RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional directory shared by workers/restarts; unset disables the disk cache
+MATH_RENDER_CACHE_DIR = os.getenv("MATH_RENDER_CACHE_DIR")
+
+MATH_SPAN_PATTERN = re.compile(r"\$([^$]+)\$")
+
+
+class MathImage(NamedTuple):
+    png: bytes
+    width: float  # points
+    height: float # points
+    depth: float  # points below the baseline
+
+
+# One parser per worker process; mathtext is not thread-safe, so rasterising is serialised
+# by _render_lock. _cache_lock only guards the cache and stats and is never held for I/O.
+_math_parser: Optional[MathTextParser] = None
+_render_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_math_cache = LRUCache(maxsize=MATH_RENDER_CACHE_MAX_BYTES, getsizeof=lambda image: len(image.png))
+_math_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "errors": 0}
 
-def render_math_to_image(text: str, fontsize=12, max_width_char=80) -> Union[RLImage, None]:
+
+def split_math_spans(text: str) -> List[Tuple[bool, str]]:
     """
-    Renders text containing LaTeX math ($...$) to a ReportLab Image using Matplotlib.
-    Returns None if rendering fails.
+    Splits text into (is_math, segment) pairs. Math segments are the contents of $...$.
     """
+    parts = []
+    position = 0
+    for match in MATH_SPAN_PATTERN.finditer(text):
+        if match.start() > position:
+            parts.append((False, text[position:match.start()]))
+        parts.append((True, match.group(1)))
+        position = match.end()
+    if position < len(text):
+        parts.append((False, text[position:]))
+    return parts
+
+
+def math_cache_key(expression: str, fontsize: float, color: str = "#000000") -> str:
+    raw = f"{expression}|{fontsize}|{color}|{MATH_RENDER_DPI}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: str) -> Optional[str]:
+    if not MATH_RENDER_CACHE_DIR:
+        return None
+    return os.path.join(MATH_RENDER_CACHE_DIR, f"{key}.png")
+
+
+def _read_disk(key: str) -> Optional[MathImage]:
+    path = _disk_path(key)
+    if path is None or not os.path.exists(path):
+        return None
     try:
-        # Wrap text for the image
-        wrapped_lines = textwrap.wrap(text, width=max_width_char)
-        wrapped_text = "\n".join(wrapped_lines)
-        
-        # Estimate height based on lines
-        # This is a bit heuristic.
-        lines_count = len(wrapped_lines)
-        fig_height = lines_count * 0.3 + 0.5 # inches
-        fig_width = 7.0 # inches (A4/Letter width minus margins approx)
-
-        fig = plt.figure(figsize=(fig_width, fig_height))
-        # Remove axes
-        ax = fig.add_axes([0, 0, 1, 1])
-        ax.axis('off')
-        
-        # Render text with Math (Matplotlib handles $...$)
-        # use raw string or escape backslashes? textwrap might mess up backslashes?
-        # We assume the input text has proper LaTeX.
-        
-        # Place text at top-left
-        ax.text(0.01, 0.9, wrapped_text, 
-                fontsize=fontsize, 
-                ha='left', 
-                va='top', 
-                wrap=True,
-                family='serif' 
-               )
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=200, transparent=True)
-        plt.close(fig)
-        buf.seek(0)
-        
-        # Create ReportLab Image
-        img = RLImage(buf)
-        # Scale to fit width of PDF column (approx 6.5 inches)
-        img.drawHeight = fig_height * 72 * 0.8 # Scale down a bit to match PDF pts
-        img.drawWidth = fig_width * 72 * 0.8
-        
-        return img
+        with open(path, "rb") as f:
+            png = f.read()
+        with Image.open(io.BytesIO(png)) as img:
+            depth = float(img.info.get("depth", 0))
+            pixel_width, pixel_height = img.size
+        scale = 72.0 / MATH_RENDER_DPI
+        return MathImage(png, pixel_width * scale, pixel_height * scale, depth)
     except Exception as e:
-        print(f"Error rendering math: {e}")
+        print(f"Error reading math cache file {path}: {e}")
         return None
 
-def generate_question_pdf(questions: List[GeneratedQuestion]) -> io.BytesIO:
+
+def _write_disk(key: str, image: MathImage):
+    path = _disk_path(key)
+    if path is None:
+        return
+    try:
+        os.makedirs(MATH_RENDER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(image.png)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing math cache file {path}: {e}")
+
+
+def _rasterise(expression: str, fontsize: float, color: str) -> MathImage:
+    global _math_parser
+    if _math_parser is None:
+        _math_parser = MathTextParser("agg")
+    prop = FontProperties(size=fontsize, family="serif")
+    result = _math_parser.parse(f"${expression}$", dpi=MATH_RENDER_DPI, prop=prop)
+    mask = np.asarray(result.image)
+
+    img = Image.new("RGBA", (mask.shape[1], mask.shape[0]), color)
+    img.putalpha(Image.fromarray(mask))
+    scale = 72.0 / MATH_RENDER_DPI
+    depth = result.depth * scale
+
+    info = PngImagePlugin.PngInfo()
+    info.add_text("depth", f"{depth:.4f}")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", pnginfo=info)
+    return MathImage(buf.getvalue(), mask.shape[1] * scale, mask.shape[0] * scale, depth)
+
+
+def render_math_span(expression: str, fontsize: float = 12, color: str = "#000000") -> Optional[MathImage]:
     """
-    Generates a PDF file from a list of GeneratedQuestion objects.
-    Correct answers are highlighted in RED.
-    Renders fields with '$' as images for Math support.
+    Renders a single math expression (without the surrounding $) to a transparent PNG.
+    Results are cached by content hash in memory and, if configured, on disk.
+    Returns None if rendering fails.
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    
+    key = math_cache_key(expression, fontsize, color)
+    with _cache_lock:
+        image = _math_cache.get(key)
+        if image is not None:
+            _math_stats["hits"] += 1
+            return image
+
+    image = _read_disk(key)
+    if image is not None:
+        with _cache_lock:
+            _math_stats["disk_hits"] += 1
+    else:
+        with _render_lock:
+            # Another thread may have rendered it while we waited
+            with _cache_lock:
+                image = _math_cache.get(key)
+                _math_stats["hits" if image is not None else "misses"] += 1
+            if image is not None:
+                return image
+            try:
+                image = _rasterise(expression, fontsize, color)
+            except Exception as e:
+                with _cache_lock:
+                    _math_stats["errors"] += 1
+                print(f"Error rendering math ${expression}$: {e}")
+                return None
+        _write_disk(key, image)
+
+    prime_math_cache([(key, image)])
+    return image
+
+
+def math_cache_stats() -> dict:
+    with _cache_lock:
+        return {
+            **_math_stats,
+            "entries": len(_math_cache),
+            "bytes": _math_cache.currsize,
+            "max_bytes": _math_cache.maxsize,
+            "disk_dir": MATH_RENDER_CACHE_DIR,
+        }
+
+
+def math_markup(text: str, fontsize: float = 12, color: str = "#000000") -> str:
+    """
+    Converts text with $...$ spans into Paragraph markup: plain text is escaped,
+    each math span becomes an inline image aligned on the text baseline.
+    Spans that fail to render are kept as literal text.
+    """
+    markup = []
+    for is_math, segment in split_math_spans(text):
+        image = render_math_span(segment, fontsize, color) if is_math else None
+        if image is None:
+            markup.append(escape(f"${segment}$" if is_math else segment))
+            continue
+        src = "data:image/png;base64," + base64.b64encode(image.png).decode("ascii")
+        markup.append(
+            f'<img src="{src}" width="{image.width:.2f}" height="{image.height:.2f}" valign="{-image.depth:.2f}"/>'
+        )
+    return "".join(markup)
+
+
+def _style_color(style: ParagraphStyle) -> str:
+    return colors.toColor(style.textColor).hexval().replace("0x", "#")
+
+
+_math_styles = {}
+
+
+def text_paragraph(text: str, style: ParagraphStyle) -> Paragraph:
+    """
+    A Paragraph for `text`, rendering any $...$ spans inline as math.
+    """
+    if "$" not in text:
+        return Paragraph(text, style)
+    # Let tall formulas (fractions, powers) grow the line instead of overlapping
+    math_style = _math_styles.get(style.name)
+    if math_style is None or math_style.parent is not style:
+        math_style = ParagraphStyle(f"{style.name}Math", parent=style, autoLeading="max")
+        _math_styles[style.name] = math_style
+    return Paragraph(math_markup(text, style.fontSize, _style_color(style)), math_style)
+
+
+def _build_styles() -> dict:
     styles = getSampleStyleSheet()
     title_style = styles["Heading1"]
     normal_style = styles["BodyText"]
@@ -128,119 +272,204 @@ def generate_question_pdf(questions: List[GeneratedQuestion]) -> io.BytesIO:
         fontName='Helvetica-Bold'
     )
 
-    story = []
-    
-    # Title
-    story.append(Paragraph("Question Bank Export", title_style))
-    story.append(Spacer(1, 20))
-    
+    return {
+        "title": title_style,
+        "normal": normal_style,
+        "question": question_style,
+        "option": option_style,
+        "correct_option": correct_option_style,
+        "explanation": explanation_style,
+        "model_answer": model_answer_style,
+        "explanation_title": explanation_title_style,
+    }
+
+
+def _question_flowables(i: int, q: GeneratedQuestion, styles: dict, paragraph=text_paragraph) -> list:
+    """
+    Flowables for one question. `paragraph` builds every paragraph that may contain math.
+    """
+    q_story = [] # Group question elements to keep together if possible
+
+    # --- Question Text ---
+    display_text = q.question_text
+    if q.question_type == "fill_in_the_blank":
+         for placeholder in range(5):
+             display_text = display_text.replace(f"{{{placeholder}}}", "_______")
+
+    q_story.append(paragraph(f"{i}. {display_text}", styles["question"]))
+
+    # --- Options ---
+    options = q.options or []
+    answers = q.answer or []
+    answer_set = set(answers)
+
+    if q.question_type == 'mcq':
+        for opt in options:
+            is_correct = opt in answer_set
+            bullet = "\u2022"
+            text_content = f"{bullet} {opt}"
+            style = styles["correct_option"] if is_correct else styles["option"]
+            q_story.append(paragraph(text_content, style))
+
+    elif q.question_type == 'fill_in_the_blank':
+        if options:
+            q_story.append(Paragraph("Word Bank:", styles["normal"]))
+            bank_text = ", ".join(options)
+            q_story.append(Paragraph(bank_text, styles["option"]))
+
+        ans_text = ", ".join(answers)
+        q_story.append(Paragraph(f"Answer: {ans_text}", styles["correct_option"]))
+
+    elif q.question_type == 'structured':
+        # For structured questions, show the model answer clearly.
+        q_story.append(Spacer(1, 10))
+
+        # Show Answer if available
+        if answers:
+            # Structured answers can be long.
+            ans_text = " ".join(answers)
+
+            q_story.append(Paragraph("Model Answer:", styles["explanation_title"]))
+            q_story.append(paragraph(ans_text, styles["model_answer"]))
+
+    # --- Explanation ---
+    if q.explanation:
+        q_story.append(Spacer(1, 5))
+        q_story.append(Paragraph("Explanation:", styles["explanation_title"]))
+        q_story.append(paragraph(q.explanation, styles["explanation"]))
+
+    q_story.append(Spacer(1, 20))
+    return q_story
+
+
+def collect_math_spans(questions: List[GeneratedQuestion]) -> List[Tuple[str, float, str]]:
+    """
+    Unique (expression, fontsize, colour) math spans needed to render `questions`.
+    """
+    styles = _build_styles()
+    spans = {}
+
+    def collect(text: str, style: ParagraphStyle):
+        if "$" in text:
+            color = _style_color(style)
+            for is_math, segment in split_math_spans(text):
+                if is_math:
+                    spans[(segment, style.fontSize, color)] = None
+        return None
+
     for i, q in enumerate(questions, 1):
-        q_story = [] # Group question elements to keep together if possible
-        
-        # --- Question Text ---
-        display_text = q.question_text
-        if q.question_type == "fill_in_the_blank":
-             for placeholder in range(5):
-                 display_text = display_text.replace(f"{{{placeholder}}}", "_______")
-
-        if "$" in display_text:
-            # Render as Image
-            img = render_math_to_image(f"{i}. {display_text}", fontsize=12, max_width_char=75)
-            if img:
-                q_story.append(img)
-            else:
-                q_story.append(Paragraph(f"{i}. {display_text}", question_style))
-        else:
-            q_story.append(Paragraph(f"{i}. {display_text}", question_style))
-        
-        
-        # --- Options ---
-        try:
-            options = json.loads(q.options)
-        except:
-            options = []
-        try:
-            answers = json.loads(q.answer)
-            answer_set = set(answers)
-        except:
-            answers = []
-            answer_set = set()
-
-        if q.question_type == 'mcq':
-            for opt in options:
-                is_correct = opt in answer_set
-                bullet = "\u2022"
-                text_content = f"{bullet} {opt}"
-                
-                # Check for math in options
-                if "$" in opt:
-                    img = render_math_to_image(text_content, fontsize=10, max_width_char=80)
-                    if img:
-                        # Indent image? RLImage doesn't support leftIndent easily in Flowable list without Table or Indenter
-                        # Use Indenter
-                        q_story.append(Indenter(left=20))
-                        q_story.append(img)
-                        q_story.append(Indenter(left=-20))
-                    else:
-                         style = correct_option_style if is_correct else option_style
-                         q_story.append(Paragraph(text_content, style))
-                else:
-                    style = correct_option_style if is_correct else option_style
-                    q_story.append(Paragraph(text_content, style))
-                
-        elif q.question_type == 'fill_in_the_blank':
-            if options:
-                q_story.append(Paragraph("Word Bank:", normal_style))
-                bank_text = ", ".join(options)
-                q_story.append(Paragraph(bank_text, option_style))
-            
-            ans_text = ", ".join(answers)
-            q_story.append(Paragraph(f"Answer: {ans_text}", correct_option_style))
-
-        elif q.question_type == 'structured':
-            # For structured questions, show the model answer clearly.
-            q_story.append(Spacer(1, 10))
-            
-            # Show Answer if available
-            if answers:
-                # Structured answers can be long.
-                ans_text = " ".join(answers) 
-                
-                q_story.append(Paragraph("Model Answer:", explanation_title_style))
-                
-                # Check for math in answer
-                if "$" in ans_text:
-                     img = render_math_to_image(ans_text, fontsize=11, max_width_char=80)
-                     if img:
-                        q_story.append(Indenter(left=20))
-                        q_story.append(img)
-                        q_story.append(Indenter(left=-20))
-                     else:
-                        q_story.append(Paragraph(ans_text, model_answer_style))
-                else:
-                    q_story.append(Paragraph(ans_text, model_answer_style))
-
-        # --- Explanation ---
-        if q.explanation:
-            q_story.append(Spacer(1, 5))
-            q_story.append(Paragraph("Explanation:", explanation_title_style))
-            
-            if "$" in q.explanation:
-                img = render_math_to_image(q.explanation, fontsize=10, max_width_char=90)
-                if img:
-                    q_story.append(Indenter(left=10))
-                    q_story.append(img)
-                    q_story.append(Indenter(left=-10))
-                else:
-                    q_story.append(Paragraph(q.explanation, explanation_style))
-            else:
-                q_story.append(Paragraph(q.explanation, explanation_style))
-            
-        q_story.append(Spacer(1, 20))
-        
-        # Add group to story
-        story.extend(q_story)
-    
+        _question_flowables(i, q, styles, paragraph=collect)
+    return list(spans)
+
+
+def uncached_math_spans(questions: List[GeneratedQuestion]) -> List[Tuple[str, float, str]]:
+    """
+    The spans of `questions` missing from this process's cache.
+    """
+    spans = collect_math_spans(questions)
+    keys = [math_cache_key(*span) for span in spans]
+    with _cache_lock:
+        return [span for span, key in zip(spans, keys) if key not in _math_cache]
+
+
+def render_math_batch(spans: List[Tuple[str, float, str]]) -> List[Tuple[str, Optional[MathImage]]]:
+    """
+    Renders a batch of spans. Runs inside the render worker processes.
+    """
+    return [
+        (math_cache_key(expression, fontsize, color), render_math_span(expression, fontsize, color))
+        for expression, fontsize, color in spans
+    ]
+
+
+def prime_math_cache(results: List[Tuple[str, Optional[MathImage]]]):
+    with _cache_lock:
+        for key, image in results:
+            if image is not None and len(image.png) <= _math_cache.maxsize:
+                _math_cache[key] = image
+
+
+async def prerender_math(questions: List[GeneratedQuestion], pool=None, batch_size: int = 32):
+    """
+    Renders the math spans of `questions` that are not cached yet across the render
+    process pool (Matplotlib is not thread-safe), then primes this process's cache.
+    Without a pool nothing is done here and spans render during the build.
+    """
+    missing = await asyncio.to_thread(uncached_math_spans, questions)
+    if not missing:
+        return
+    pool = pool or get_process_pool()
+    if pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, render_math_batch, batch) for batch in batches
+    ))
+    for batch_results in results:
+        prime_math_cache(batch_results)
+
+
+class _LazyStory(list):
+    """
+    A story that pulls the next question page only when ReportLab has consumed the
+    flowables it already has, so the whole bank is never held as flowables at once.
+    """
+
+    def __init__(self, flowables: list, more: Iterator[list]):
+        super().__init__(flowables)
+        self._more = more
+
+    def __len__(self):
+        while not list.__len__(self):
+            flowables = next(self._more, None)
+            if flowables is None:
+                break
+            self.extend(flowables)
+        return list.__len__(self)
+
+
+def write_question_pdf(question_pages: Iterable[List[GeneratedQuestion]], fileobj: BinaryIO) -> int:
+    """
+    Writes a question PDF into `fileobj` (e.g. a spooled temporary file).
+    `question_pages` may be a lazy iterator; each page is turned into flowables only
+    when the document reaches it. Returns the number of questions written.
+    Correct answers are highlighted in RED.
+    Math spans ($...$) are rendered inline as cached images.
+    """
+    doc = SimpleDocTemplate(fileobj, pagesize=letter)
+    styles = _build_styles()
+    count = 0
+
+    def page_flowables():
+        nonlocal count
+        for questions in question_pages:
+            flowables = []
+            for q in questions:
+                count += 1
+                flowables.extend(_question_flowables(count, q, styles))
+            yield flowables
+
+    # Title
+    story = _LazyStory([Paragraph("Question Bank Export", styles["title"]), Spacer(1, 20)], page_flowables())
     doc.build(story)
+    return count
+
+
+def generate_question_pdf(questions: List[GeneratedQuestion]) -> io.BytesIO:
+    """
+    Generates a PDF file in memory from a list of GeneratedQuestion objects.
+    """
+    buffer = io.BytesIO()
+    write_question_pdf([questions], buffer)
     buffer.seek(0)
     return buffer
+
+
+async def agenerate_question_pdf(questions: List[GeneratedQuestion]) -> io.BytesIO:
+    """
+    Async variant for request handlers: math is pre-rendered in the worker processes
+    and the story is built on a thread, so the event loop is never blocked.
+    """
+    await prerender_math(questions)
+    return await asyncio.to_thread(generate_question_pdf, questions)
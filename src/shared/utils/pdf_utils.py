@@ -1,5 +1,30 @@
-from pypdf import PdfReader
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
 from io import BytesIO
+from typing import AsyncIterator, BinaryIO, List, Tuple
+
+from cachetools import LRUCache
+from pypdf import PdfReader
+
+from src.shared.utils.workers import get_process_pool
+
+# Pages handed to one worker process at a time
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "20"))
+# Extracted page texts kept in memory, keyed by the PDF's sha256, bounded by characters
+PDF_TEXT_CACHE_MAX_CHARS = int(os.getenv("PDF_TEXT_CACHE_MAX_CHARS", str(64 * 1024 * 1024)))
+
+SPOOL_READ_SIZE = 1024 * 1024
+
+_text_cache = LRUCache(maxsize=PDF_TEXT_CACHE_MAX_CHARS, getsizeof=lambda pages: sum(len(p) for p in pages) or 1)
+_text_cache_lock = threading.Lock()
+
+
+def join_page_texts(pages: List[str]) -> str:
+    return "".join(page + "\n" for page in pages)
+
 
 def extract_text_from_pdf(file_content: bytes) -> str:
     """
@@ -7,10 +32,102 @@ def extract_text_from_pdf(file_content: bytes) -> str:
     """
     try:
         reader = PdfReader(BytesIO(file_content))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return join_page_texts([page.extract_text() for page in reader.pages])
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return ""
+
+
+def spool_to_disk(source: BinaryIO) -> Tuple[str, str]:
+    """
+    Copies an upload to a temporary file in fixed-size reads, hashing it on the way.
+    Returns (path, sha256); the caller removes the file.
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                data = source.read(SPOOL_READ_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def count_pdf_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def extract_page_texts(path: str, start: int, end: int) -> List[str]:
+    """
+    Extracts the text of pages [start, end). Runs inside the worker processes.
+    """
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+async def aiter_pdf_pages(
+    path: str,
+    content_hash: str,
+    pool=None,
+    pages_per_task: int = PDF_PAGES_PER_TASK
+) -> AsyncIterator[str]:
+    """
+    Yields the text of every page of the PDF at `path`, in order, as soon as its page
+    range is extracted. All ranges are submitted to the worker pool up front; results
+    are cached by `content_hash`, so re-uploading the same PDF skips extraction.
+    """
+    with _text_cache_lock:
+        cached = _text_cache.get(content_hash)
+    if cached is not None:
+        print(f"PDF text cache hit ({len(cached)} pages)")
+        for page in cached:
+            yield page
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = pool or get_process_pool()
+    page_count = await asyncio.to_thread(count_pdf_pages, path)
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    futures = [loop.run_in_executor(pool, extract_page_texts, path, start, end) for start, end in ranges] if pool else []
+
+    pages = []
+    try:
+        for i, (start, end) in enumerate(ranges):
+            page_texts = await futures[i] if futures else await asyncio.to_thread(extract_page_texts, path, start, end)
+            pages.extend(page_texts)
+            for text in page_texts:
+                yield text
+    finally:
+        for future in futures:
+            future.cancel()
+
+    entry = tuple(pages)
+    if _text_cache.getsizeof(entry) <= _text_cache.maxsize:
+        with _text_cache_lock:
+            _text_cache[content_hash] = entry
+
+
+async def aextract_pdf_pages(path: str, content_hash: str, pool=None, pages_per_task: int = PDF_PAGES_PER_TASK) -> List[str]:
+    """
+    Extracts the text of every page of the PDF at `path`, one string per page.
+    Returns an empty list if the PDF cannot be read.
+    """
+    try:
+        return [page async for page in aiter_pdf_pages(path, content_hash, pool, pages_per_task)]
+    except Exception as e:
+        print(f"Error reading PDF: {e}")
+        return []
+
+
+def text_cache_stats() -> dict:
+    return {
+        "entries": len(_text_cache),
+        "chars": _text_cache.currsize,
+        "max_chars": _text_cache.maxsize,
+    }
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+# Registrations are leases on the gateway; each instance renews its lease this often
+HEARTBEAT_INTERVAL = float(os.getenv("SERVICE_HEARTBEAT_S", "10"))
+
+
+class GatewayRegistration:
+    """
+    Registers a service instance with the gateway, keeps its lease alive with
+    periodic heartbeats, and deregisters it on shutdown.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        service_url: str,
+        gateway_url: str,
+        display_name: Optional[str] = None,
+        interval: float = HEARTBEAT_INTERVAL,
+        max_retries: int = 10,
+        retry_delay: float = 2.0
+    ):
+        self.name = name
+        self.service_url = service_url
+        self.gateway_url = gateway_url
+        self.display_name = display_name or name
+        self.interval = interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def _register(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post(
+            f"{self.gateway_url}/registry/register",
+            json={"name": self.name, "url": self.service_url},
+            timeout=5.0
+        )
+
+    async def start(self) -> bool:
+        """
+        Registers with retry, then starts the heartbeat. Heartbeats keep retrying even if
+        the initial registration failed, so the instance joins once the gateway is up.
+        """
+        registered = False
+        async with httpx.AsyncClient() as client:
+            for attempt in range(self.max_retries):
+                try:
+                    print(
+                        f"Registering {self.display_name} at {self.service_url} with Gateway {self.gateway_url} "
+                        f"(Attempt {attempt+1}/{self.max_retries})..."
+                    )
+                    resp = await self._register(client)
+                    if resp.status_code == 200:
+                        print(f"Successfully registered {self.display_name}")
+                        registered = True
+                        break
+                    print(f"Registration failed with status {resp.status_code}")
+                except Exception as e:
+                    print(f"Failed to register service (Attempt {attempt+1}): {e}")
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+            else:
+                print("CRITICAL: Failed to register service after all attempts.")
+
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        return registered
+
+    async def _run_heartbeat(self):
+        async with httpx.AsyncClient() as client:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    resp = await self._register(client)
+                    if resp.status_code != 200:
+                        print(f"Heartbeat for {self.display_name} failed with status {resp.status_code}")
+                except Exception as e:
+                    print(f"Heartbeat for {self.display_name} failed: {e}")
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+        # Deregistration
+        try:
+            async with httpx.AsyncClient() as client:
+                await client.post(
+                    f"{self.gateway_url}/registry/deregister",
+                    json={"name": self.name, "url": self.service_url}
+                )
+        except Exception as e:
+            print(f"Failed to deregister service: {e}")
@@ -1,4 +1,308 @@
-from typing import List
+import math
+import re
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Rough average for Latin-script text; used until a provider reports real usage.
+CHARS_PER_TOKEN = 4
+
+# Approximate characters per token by script, per provider tokenizer.
+# Sinhala and Tamil split into far more tokens than English, especially with
+# byte-level BPE vocabularies (Llama/Qwen on Groq).
+TOKEN_PROFILES = {
+    "default": {"latin": CHARS_PER_TOKEN, "sinhala": 1.0, "tamil": 1.0, "other": 2.0},
+    "groq": {"latin": CHARS_PER_TOKEN, "sinhala": 0.7, "tamil": 0.8, "other": 1.5},
+    "gemini": {"latin": CHARS_PER_TOKEN, "sinhala": 2.0, "tamil": 2.0, "other": 3.0},
+}
+
+SINHALA_CHARS = re.compile("[඀-෿]")
+TAMIL_CHARS = re.compile("[஀-௿]")
+NON_ASCII_CHARS = re.compile("[^\x00-\x7F]")
+
+# Lines that open a section: markdown headings, "Chapter 3", "Unit 2", "1.2 Motion",
+# Sinhala "පරිච්ඡේදය" / Tamil "அத்தியாயம்" (chapter), and short ALL-CAPS titles
+HEADING_PATTERN = re.compile(
+    r"^\s*(#{1,6}\s+\S"
+    r"|(chapter|unit|section|lesson|part)\s+\w+"
+    r"|\d+(\.\d+)*\.?\s+\S.{0,80}$"
+    r"|.{0,40}(පරිච්ඡේදය|அத்தியாயம்))",
+    re.IGNORECASE
+)
+
+PARAGRAPH, LINE, WORD, PIECE = "\n\n", "\n", " ", ""
+# Split levels: a unit too big for any chunk is split into the next level down
+LEVEL_PARAGRAPH, LEVEL_LINE, LEVEL_WORD, LEVEL_PIECE = range(4)
+
+
+def _count(pattern: re.Pattern, text: str) -> int:
+    return pattern.subn("", text)[1]
+
+
+def estimate_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    Estimates the number of LLM tokens in text without calling a tokenizer.
+    Sinhala and Tamil characters are weighted using the provider's profile.
+    """
+    if not text:
+        return 0
+    profile = TOKEN_PROFILES.get((provider or "default").lower(), TOKEN_PROFILES["default"])
+    non_ascii = _count(NON_ASCII_CHARS, text)
+    if not non_ascii:
+        return math.ceil(len(text) / profile["latin"])
+    sinhala = _count(SINHALA_CHARS, text)
+    tamil = _count(TAMIL_CHARS, text)
+    other = non_ascii - sinhala - tamil
+    return math.ceil(
+        (len(text) - non_ascii) / profile["latin"]
+        + sinhala / profile["sinhala"]
+        + tamil / profile["tamil"]
+        + other / profile["other"]
+    )
+
+
+def token_counter(provider: Optional[str] = None) -> Callable[[str], int]:
+    return lambda text: estimate_tokens(text, provider)
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 120:
+        return False
+    if HEADING_PATTERN.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 4 and len(line) <= 60 and all(c.isupper() for c in letters)
+
+
+class _ChunkPacker:
+    """
+    Greedily packs text units into chunks of at most `budget` (as measured by `measure`).
+
+    Units arrive as paragraphs; one that cannot fit even an empty chunk is split into
+    lines, then words, then hard pieces. Hard pieces are measured and cut to the room
+    left, so no chunk exceeds the budget.
+
+    Headings never end a chunk: they wait as pending units and are emitted with the
+    text that follows them. Overlap units (already emitted) are dropped first when
+    room is short; pending headings are never dropped.
+    """
+
+    def __init__(self, budget: int, measure: Callable[[str], int], overlap: int = 0, heading_fill: Optional[float] = 0.5):
+        self.budget = max(1, budget)
+        self.measure = measure
+        self.overlap = max(0, min(overlap, self.budget // 2))
+        self.heading_fill = heading_fill
+        self._sep_cost = {sep: measure(sep) for sep in (PARAGRAPH, LINE, WORD, PIECE)}
+        self.units: List[Tuple[str, str, int, bool]] = [] # (separator, text, size, is_heading)
+        self.size = 0
+        self.carried = 0 # leading overlap units repeated from the previous chunk
+
+    def _cost(self, sep: str, size: int) -> int:
+        return size + (self._sep_cost[sep] if self.units else 0)
+
+    def _append(self, unit: Tuple[str, str, int, bool]):
+        self.size += self._cost(unit[0], unit[2])
+        self.units.append(unit)
+
+    def _reset(self, overlap: List[Tuple[str, str, int, bool]], pending: List[Tuple[str, str, int, bool]] = ()):
+        self.units, self.size = [], 0
+        for unit in list(overlap) + list(pending):
+            self._append(unit)
+        self.carried = len(overlap)
+
+    def _room(self, sep: str) -> int:
+        return self.budget - self.size - self._cost(sep, 0)
+
+    def _fits(self, sep: str, size: int) -> bool:
+        return self.size + self._cost(sep, size) <= self.budget
+
+    def _join(self, units) -> str:
+        return "".join((sep if i else "") + text for i, (sep, text, _, _) in enumerate(units)).strip()
+
+    def flush(self) -> Optional[str]:
+        # Never end a chunk on a heading: move trailing headings to the next chunk
+        carry = []
+        while len(self.units) > self.carried and self.units[-1][3]:
+            carry.insert(0, self.units.pop())
+        if len(self.units) <= self.carried:
+            # Nothing new since the last chunk; drop the overlap, keep the headings
+            self._reset([], carry)
+            return None
+        chunk = self._join(self.units)
+
+        tail, tail_size = [], 0
+        for unit in reversed(self.units):
+            if tail_size + unit[2] > self.overlap:
+                break
+            tail.insert(0, unit)
+            tail_size += unit[2]
+        self._reset(tail, carry)
+        return chunk or None
+
+    def finish(self) -> Optional[str]:
+        if len(self.units) <= self.carried:
+            return None
+        return self._join(self.units) or None
+
+    def add(
+        self,
+        text: str,
+        sep: str = PARAGRAPH,
+        level: int = LEVEL_PARAGRAPH,
+        starts_section: bool = False,
+        heading: bool = False
+    ) -> Iterator[str]:
+        if not text.strip():
+            return
+        size = self.measure(text)
+        if starts_section and self.heading_fill is not None and self.size >= self.heading_fill * self.budget:
+            chunk = self.flush()
+            if chunk:
+                yield chunk
+        if self._fits(sep, size):
+            self._append((sep, text, size, heading))
+            return
+        if size > self.budget and level < LEVEL_PIECE:
+            yield from self._split(text, sep, level, size)
+            return
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+        if not self._fits(sep, size):
+            # Drop the overlap but keep headings waiting for this text
+            self._reset([], self.units[self.carried:])
+        if self._fits(sep, size):
+            self._append((sep, text, size, heading))
+        elif level < LEVEL_PIECE:
+            # Split so the first part can follow the waiting headings
+            yield from self._split(text, sep, level, size)
+        else:
+            yield from self._add_pieces(text, sep)
+
+    def _fit(self, text: str, room: int) -> int:
+        """
+        Length of the longest prefix of text that measures at most `room`.
+        """
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.measure(text[:mid]) <= room:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _add_pieces(self, text: str, sep: str) -> Iterator[str]:
+        # Cut hard pieces to the room actually left: scripts are weighted unevenly, so
+        # a piece of average length can still be over budget
+        while text:
+            cut = self._fit(text, self._room(sep))
+            if not cut:
+                if len(self.units) > self.carried:
+                    # Waiting headings leave no room for any text: emit them on their own
+                    chunk = self._join(self.units)
+                    self._reset([])
+                    yield chunk
+                    continue
+                if self.units:
+                    self._reset([])
+                    continue
+                cut = 1 # a single character over the whole budget
+            piece = text[:cut]
+            self._append((sep, piece, self.measure(piece), False))
+            text, sep = text[cut:], PIECE
+            if text:
+                chunk = self.flush()
+                if chunk:
+                    yield chunk
+
+    def add_page(self, page: str) -> Iterator[str]:
+        for paragraph in page.split(PARAGRAPH):
+            first_line = paragraph.strip().split(LINE, 1)[0]
+            starts_section = self.heading_fill is not None and is_heading(first_line)
+            heading = starts_section and LINE not in paragraph.strip()
+            yield from self.add(paragraph, PARAGRAPH, LEVEL_PARAGRAPH, starts_section, heading)
+
+    def _split(self, text: str, sep: str, level: int, size: int) -> Iterator[str]:
+        # The first part keeps the separator that preceded the whole unit
+        if level == LEVEL_PARAGRAPH:
+            for i, line in enumerate(text.split(LINE)):
+                line_is_heading = self.heading_fill is not None and is_heading(line)
+                yield from self.add(line, sep if i == 0 else LINE, LEVEL_LINE, line_is_heading, line_is_heading)
+        elif level == LEVEL_LINE:
+            # Cut near the budget at the last space instead of packing word by word
+            step = max(1, len(text) * self.budget // size)
+            start, next_sep = 0, sep
+            while start < len(text):
+                end = min(len(text), start + step)
+                space = text.rfind(WORD, start + 1, end) if end < len(text) else -1
+                if space > start:
+                    yield from self.add(text[start:space], next_sep, LEVEL_WORD)
+                    start, next_sep = space + 1, WORD
+                else:
+                    yield from self.add(text[start:end], next_sep, LEVEL_WORD)
+                    start, next_sep = end, PIECE
+        else:
+            # Fill the room left up to the last space that fits, then carry on with the rest
+            space = text.rfind(WORD, 1, self._fit(text, self._room(sep)) + 1)
+            if space > 0:
+                yield from self.add(text[:space], sep, LEVEL_WORD)
+                yield from self.add(text[space + 1:], WORD, LEVEL_WORD)
+                return
+            step = max(1, len(text) * self.budget // size)
+            for i in range(0, len(text), step):
+                yield from self.add(text[i:i + step], sep if i == 0 else PIECE, LEVEL_PIECE)
+
+
+def iter_chunks(
+    pages: Union[str, Iterable[str]],
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    provider: Optional[str] = None,
+    measure: Optional[Callable[[str], int]] = None,
+    respect_headings: bool = True
+) -> Iterator[str]:
+    """
+    Lazily splits text (a string, or an iterable of pages) into chunks of at most
+    `max_tokens` estimated tokens for `provider`.
+
+    Paragraphs are kept whole where possible; headings start a new chunk once the
+    current one is half full and never end one. `overlap_tokens` of trailing
+    paragraphs/lines are repeated at the start of the next chunk. Chunks are yielded
+    as soon as they are complete, so callers can start on the first chunk while
+    later pages are still being read.
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+    packer = _ChunkPacker(
+        max_tokens,
+        measure or token_counter(provider),
+        overlap=overlap_tokens,
+        heading_fill=0.5 if respect_headings else None
+    )
+    for page in pages:
+        yield from packer.add_page(page)
+    chunk = packer.finish()
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(
+    pages: AsyncIterable[str],
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    provider: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    iter_chunks() over pages that arrive asynchronously (e.g. from PDF extraction).
+    """
+    packer = _ChunkPacker(max_tokens, token_counter(provider), overlap=overlap_tokens)
+    async for page in pages:
+        for chunk in packer.add_page(page):
+            yield chunk
+    chunk = packer.finish()
+    if chunk:
+        yield chunk
+
 
 def chunk_text(text: str, max_chars: int = 10000) -> List[str]:
     """
@@ -7,49 +311,8 @@ def chunk_text(text: str, max_chars: int = 10000) -> List[str]:
     """
     if not text:
         return []
-        
+
     if len(text) <= max_chars:
         return [text]
-        
-    chunks = []
-    current_chunk = ""
-    
-    # Split by double newlines (paragraphs)
-    paragraphs = text.split('\n\n')
-    
-    for para in paragraphs:
-        # If adding this paragraph exceeds max, save current chunk and start new
-        if len(current_chunk) + len(para) + 2 > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = ""
-            
-            # If the paragraph itself is too huge, we need to split it further
-            if len(para) > max_chars:
-                # Split by single lines
-                lines = para.split('\n')
-                for line in lines:
-                     if len(current_chunk) + len(line) + 1 > max_chars:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                            current_chunk = ""
-                        
-                        # If line is still too huge, hard split
-                        if len(line) > max_chars:
-                             # This is a very rare case (a single line > 30k chars), just hard chunk
-                             for i in range(0, len(line), max_chars):
-                                 chunks.append(line[i:i+max_chars])
-                        else:
-                            current_chunk += line + "\n"
-                     else:
-                        current_chunk += line + "\n"
-            else:
-                current_chunk += para + "\n\n"
-        else:
-            current_chunk += para + "\n\n"
-            
-    if current_chunk:
-        chunks.append(current_chunk)
-        
-    # Clean up whitespace
-    return [c.strip() for c in chunks if c.strip()]
+
+    return list(iter_chunks(text, max_chars, measure=len, respect_headings=False))
@@ -1,6 +1,5 @@
 import os
 import sys
-import json
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 from src.shared.models.question import GeneratedQuestion
@@ -17,8 +16,8 @@ def test_pdf_gen():
         chapter_name="Kinematics",
         question_type="mcq",
         question_text="Calculate the kinetic energy of a 2kg object moving at 3m/s. Formula: $KE = \\frac{1}{2}mv^2$",
-        options=json.dumps(["9 J", "18 J", "4.5 J", "6 J"]),
-        answer=json.dumps(["9 J"]),
+        options=["9 J", "18 J", "4.5 J", "6 J"],
+        answer=["9 J"],
         explanation="Using $KE = 0.5 * 2 * 3^2$, we get $9$ Joules. This is a scalar quantity."
     )
     
@@ -30,8 +29,8 @@ def test_pdf_gen():
         chapter_name="Kinematics",
         question_type="structured",
         question_text="Derive the equation for velocity: $v = u + at$. Show all steps clearly.",
-        options="[]",
-        answer=json.dumps(["To derive $v = u + at$, we start with the definition of acceleration: $a = \\frac{dv}{dt}$. Rearranging gives $dv = a dt$. Integrating both sides from $t=0$ to $t=t$, we get $\\int_{u}^{v} dv = \\int_{0}^{t} a dt$. Performing the integration: $[v]_{u}^{v} = a[t]_{0}^{t}$, which simplifies to $v - u = at$. Therefore, $v = u + at$."]),
+        options=[],
+        answer=["To derive $v = u + at$, we start with the definition of acceleration: $a = \\frac{dv}{dt}$. Rearranging gives $dv = a dt$. Integrating both sides from $t=0$ to $t=t$, we get $\\int_{u}^{v} dv = \\int_{0}^{t} a dt$. Performing the integration: $[v]_{u}^{v} = a[t]_{0}^{t}$, which simplifies to $v - u = at$. Therefore, $v = u + at$."],
         explanation="This derivation assumes constant acceleration $a$. It is a fundamental kinematic equation."
     )
     
@@ -0,0 +1,54 @@
+"""
+Factories and fakes shared by the test modules (tests/conftest.py targets the old app layout).
+"""
+import io
+
+from reportlab.pdfgen import canvas
+
+from src.shared.models.question import GeneratedQuestion
+
+
+class FakeClock:
+    """
+    A timer to pass as `timer=`; advance it by changing `now`.
+    """
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_question(i: int = 1, **fields) -> GeneratedQuestion:
+    """
+    An MCQ with math in every part (six distinct math spans). `fields` override the defaults.
+    """
+    values = dict(
+        id=i,
+        subject="Physics",
+        grade="11",
+        medium="English",
+        chapter_id="PH01",
+        chapter_name="Kinematics",
+        question_type="mcq",
+        question_text="Acceleration is measured in $m/s^2$",
+        options=["$m/s^2$", "$m/s$", "$kg$", "N"],
+        answer=["$m/s^2$"],
+        explanation="Velocity $v = u + at$ changes by $m/s^2$ per second."
+    )
+    values.update(fields)
+    return GeneratedQuestion(**values)
+
+
+def make_pdf(pages: int = 5, text: str = "about photosynthesis") -> bytes:
+    """
+    A text PDF whose page i reads "Page i <text>".
+    """
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for i in range(pages):
+        pdf.drawString(72, 720, f"Page {i} {text}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -16,8 +16,8 @@ def test_generate_questions(mock_generate, client: TestClient):
             chapter_id="1", chapter_name="Algebra",
             question_type="mcq",
             question_text="What is 2+2?",
-            options='["3", "4", "5"]',
-            answer='"4"',
+            options=["3", "4", "5"],
+            answer=["4"],
             explanation="Basic arithmetic."
         )
     ]
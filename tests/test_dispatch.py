@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.services.gateway.dispatch import ChunkGenerationError, dispatch_chunks, stream_chunks
+
+
+def make_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_results_are_returned_in_chunk_order():
+    async def handler(request: httpx.Request):
+        index = int(request.read().decode().split('"content":"chunk-')[1].split('"')[0])
+        # Later chunks finish first
+        await asyncio.sleep(0.01 * (5 - index))
+        return httpx.Response(200, json=[{"question_text": f"q{index}"}])
+
+    payloads = [{"content": f"chunk-{i}"} for i in range(5)]
+    async with make_client(handler) as client:
+        results = await dispatch_chunks(client, ["http://a", "http://b"], payloads)
+
+    assert [r[0]["question_text"] for r in results] == [f"q{i}" for i in range(5)]
+
+
+async def test_chunks_are_spread_across_instances():
+    hosts = []
+
+    async def handler(request: httpx.Request):
+        hosts.append(request.url.host)
+        return httpx.Response(200, json=[])
+
+    async with make_client(handler) as client:
+        await dispatch_chunks(client, ["http://a", "http://b"], [{}] * 4)
+
+    assert sorted(hosts) == ["a", "a", "b", "b"]
+
+
+async def test_failed_chunk_is_retried_on_another_instance():
+    async def handler(request: httpx.Request):
+        if request.url.host == "bad":
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json=[{"question_text": "ok"}])
+
+    async with make_client(handler) as client:
+        results = await dispatch_chunks(client, ["http://bad", "http://good"], [{}])
+
+    assert results == [[{"question_text": "ok"}]]
+
+
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    async def handler(request: httpx.Request):
+        calls.append(request.url.host)
+        return httpx.Response(422, text="invalid")
+
+    async with make_client(handler) as client:
+        with pytest.raises(ChunkGenerationError) as exc_info:
+            await dispatch_chunks(client, ["http://a", "http://b"], [{}])
+
+    assert exc_info.value.status_code == 422
+    assert len(calls) == 1
+
+
+async def test_concurrency_is_bounded():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=[])
+
+    async with make_client(handler) as client:
+        await dispatch_chunks(client, ["http://a"], [{}] * 8, concurrency=3)
+
+    assert peak == 3
+
+
+async def test_stream_yields_in_completion_order_while_payloads_arrive():
+    async def handler(request: httpx.Request):
+        index = int(request.read().decode().split('"content":"chunk-')[1].split('"')[0])
+        await asyncio.sleep(0.01 * (3 - index))
+        if index == 1:
+            return httpx.Response(422, text="invalid")
+        return httpx.Response(200, json=[{"question_text": f"q{index}"}])
+
+    async def payloads():
+        for i in range(3):
+            yield {"content": f"chunk-{i}"}
+            # Chunk 0 is already on its way before chunk 1 exists
+            await asyncio.sleep(0)
+
+    async with make_client(handler) as client:
+        events = [event async for event in stream_chunks(client, ["http://a"], payloads())]
+
+    assert [index for index, _, _ in events] == [2, 1, 0]
+    assert events[0][1] == [{"question_text": "q2"}]
+    assert events[1][2].status_code == 422
+
+
+async def test_stream_propagates_payload_errors():
+    async def handler(request: httpx.Request):
+        return httpx.Response(200, json=[])
+
+    async def payloads():
+        yield {}
+        raise ValueError("bad pdf")
+
+    async with make_client(handler) as client:
+        with pytest.raises(ValueError):
+            async for _ in stream_chunks(client, ["http://a"], payloads()):
+                pass
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+async def test_stream_reports_unparseable_chunk_instead_of_hanging():
+    async def handler(request: httpx.Request):
+        if b"chunk-1" in request.read():
+            return httpx.Response(200, text="<html>proxy error</html>")
+        return httpx.Response(200, json=[])
+
+    async def payloads():
+        for i in range(3):
+            yield {"content": f"chunk-{i}"}
+
+    async with make_client(handler) as client:
+        events = await asyncio.wait_for(_collect(stream_chunks(client, ["http://a"], payloads())), timeout=5)
+
+    errors = {index: error for index, _, error in events}
+    assert sorted(errors) == [0, 1, 2]
+    assert errors[1].status_code == 502
+    assert errors[0] is None and errors[2] is None
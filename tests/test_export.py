@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.gateway import main as gateway_main
+from src.services.gateway.registry import ServiceRegistry
+from src.services.gateway.export_cache import ExportCache
+from src.shared.utils import internal, workers
+from tests.helpers import make_question
+
+
+@pytest.fixture
+def qbank(monkeypatch, tmp_path):
+    """
+    Serves 5 questions from a fake QBank in pages of 2 and records the requests.
+    """
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if request.url.path == "/questions/version":
+            if request.url.params.get("chapter_id") == "EMPTY":
+                return httpx.Response(200, json={"count": 0, "max_id": None})
+            return httpx.Response(200, json={"count": 5, "max_id": 5})
+        after_id = int(request.url.params.get("after_id", 0))
+        ids = [i for i in range(1, 6) if i > after_id][:2]
+        headers = {"X-Next-After-Id": str(ids[-1])} if ids[-1] < 5 else {}
+        return httpx.Response(200, json=[make_question(i).model_dump(mode="json") for i in ids], headers=headers)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry = ServiceRegistry()
+    registry.register("general_qbank", "http://qbank")
+    monkeypatch.setattr(gateway_main, "service_registry", registry)
+    monkeypatch.setattr(gateway_main.upstreams, "client_for", lambda service_name: client)
+    monkeypatch.setattr(gateway_main, "GATEWAY_EXPORT_PAGE_SIZE", 2)
+    monkeypatch.setattr(workers, "WORKER_PROCESSES", 0)
+    monkeypatch.setattr(gateway_main, "export_cache", ExportCache(directory=str(tmp_path), max_bytes=10**7))
+    return requests
+
+
+EXPORT_PARAMS = {"subject": "Physics", "grade": "11", "medium": "English", "chapter_id": "PH01"}
+
+
+def test_export_streams_pages_into_pdf(qbank):
+    with TestClient(gateway_main.app) as client:
+        response = client.get("/questions/export/pdf", params=EXPORT_PARAMS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    pages = [r for r in qbank if r.url.path == "/questions"]
+    assert [r.url.params.get("after_id") for r in pages] == [None, "2", "4"]
+    assert all(r.url.params["limit"] == "2" and r.url.params["end_id"] == "5" for r in pages)
+
+
+def test_export_without_questions_is_404(qbank):
+    with TestClient(gateway_main.app) as client:
+        response = client.get("/questions/export/pdf", params=dict(EXPORT_PARAMS, chapter_id="EMPTY"))
+    assert response.status_code == 404
+    assert [r.url.path for r in qbank] == ["/questions/version"]
+
+
+def test_export_is_served_from_cache_with_etag(qbank):
+    with TestClient(gateway_main.app) as client:
+        first = client.get("/questions/export/pdf", params=EXPORT_PARAMS)
+        built_requests = len(qbank)
+
+        second = client.get("/questions/export/pdf", params=EXPORT_PARAMS)
+        assert second.content == first.content
+        assert second.headers["etag"] == first.headers["etag"]
+        # Only the version check reached the QBank
+        assert len(qbank) == built_requests + 1
+
+        not_modified = client.get(
+            "/questions/export/pdf", params=EXPORT_PARAMS,
+            headers={"If-None-Match": first.headers["etag"]}
+        )
+        assert not_modified.status_code == 304
+
+
+def test_invalidation_drops_chapter_exports(qbank, monkeypatch):
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "s3cret")
+    with TestClient(gateway_main.app) as client:
+        client.get("/questions/export/pdf", params=EXPORT_PARAMS)
+        assert gateway_main.export_cache.stats()["entries"] == 1
+        response = client.post("/internal/questions/invalidate", json={
+            "subject": "Physics", "grade": "11", "medium": "English", "chapter_id": "PH01"
+        }, headers={"X-Internal-Token": "s3cret"})
+    assert response.json()["removed"] == 1
+    assert gateway_main.export_cache.stats()["entries"] == 0
+
+
+async def test_concurrent_identical_exports_share_one_build(qbank):
+    transport = httpx.ASGITransport(app=gateway_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        responses = await asyncio.gather(*[
+            client.get("/questions/export/pdf", params=EXPORT_PARAMS) for _ in range(5)
+        ])
+
+    assert all(r.status_code == 200 and r.content == responses[0].content for r in responses)
+    # One build fetched the pages; every request still checked the version
+    assert len([r for r in qbank if r.url.path == "/questions"]) == 3
+    assert len([r for r in qbank if r.url.path == "/questions/version"]) == 5
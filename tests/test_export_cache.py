@@ -0,0 +1,33 @@
+import io
+
+from src.services.gateway.export_cache import ExportCache, chapter_hash, export_key
+
+
+def test_key_changes_with_version():
+    params = {"subject": "Physics", "chapter_id": "PH01"}
+    version = {"count": 3, "max_id": 9}
+    assert export_key(params, version) == export_key(dict(reversed(params.items())), version)
+    assert export_key(params, {"count": 3, "max_id": 9}) != export_key(params, {"count": 4, "max_id": 10})
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = ExportCache(directory=str(tmp_path), max_bytes=25)
+    chapter = chapter_hash("Physics", "11", "English", "PH01")
+    cache.put(chapter, "a", io.BytesIO(b"x" * 10))
+    cache.put(chapter, "b", io.BytesIO(b"y" * 10))
+    cache.open(chapter, "a").close() # a is now the most recently used
+    cache.put(chapter, "c", io.BytesIO(b"z" * 10))
+
+    assert cache.open(chapter, "b") is None
+    with cache.open(chapter, "a") as f:
+        assert f.read() == b"x" * 10
+    assert cache.stats()["bytes"] == 20
+
+
+def test_index_survives_restart(tmp_path):
+    chapter = chapter_hash("Physics", "11", "English", "PH01")
+    ExportCache(directory=str(tmp_path)).put(chapter, "a", io.BytesIO(b"pdf"))
+    cache = ExportCache(directory=str(tmp_path))
+    assert cache.stats()["entries"] == 1
+    assert cache.invalidate_chapter(chapter) == 1
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from src.services.gateway.upstream import UpstreamPools, upstream_for
+from src.services.gateway.main import app
+
+
+def test_upstream_for_groups_services():
+    assert upstream_for("auth_service") == "auth"
+    assert upstream_for("science_qbank") == "qbank"
+    assert upstream_for("general_qbank") == "qbank"
+    assert upstream_for("generator") == "generator"
+    assert upstream_for("something_else") == "default"
+
+
+def test_qbank_services_share_one_client():
+    pools = UpstreamPools()
+    assert pools.client_for("science_qbank") is pools.client_for("maths_qbank")
+    assert pools.client_for("science_qbank") is not pools.client_for("generator")
+
+
+def test_pool_limits_from_env(monkeypatch):
+    monkeypatch.setenv("GATEWAY_POOL_QBANK_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("GATEWAY_POOL_KEEPALIVE_EXPIRY", "12.5")
+    pool = UpstreamPools().pool_for("general_qbank")
+    assert pool.max_connections == 7
+    assert pool.keepalive_expiry == 12.5
+
+
+def test_health_reports_pool_stats():
+    with TestClient(app) as client:
+        response = client.get("/health")
+    assert response.status_code == 200
+    pools = response.json()["pools"]
+    assert set(pools) >= {"auth", "qbank", "generator"}
+    assert pools["qbank"]["open_connections"] == 0
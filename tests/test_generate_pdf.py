@@ -0,0 +1,74 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.gateway import main as gateway_main
+from src.services.gateway.registry import ServiceRegistry
+from src.shared.utils import pdf_utils, workers
+from tests.helpers import make_pdf
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """
+    A fake generator that returns one question per chunk, failing chunks that mention page 1.
+    """
+    chunks = []
+
+    def handler(request: httpx.Request):
+        content = json.loads(request.content)["content"]
+        chunks.append(content)
+        if "Page 1 " in content:
+            return httpx.Response(422, text="bad chunk")
+        return httpx.Response(200, json=[{"question_text": content.split(" motion")[0]}])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry = ServiceRegistry()
+    registry.register("generator", "http://generator")
+    monkeypatch.setattr(gateway_main, "service_registry", registry)
+    monkeypatch.setattr(gateway_main.upstreams, "client_for", lambda service_name: client)
+    # One page per chunk
+    monkeypatch.setattr(gateway_main, "GATEWAY_CHUNK_TOKENS", 100)
+    monkeypatch.setattr(workers, "WORKER_PROCESSES", 0)
+    pdf_utils._text_cache.clear()
+    gateway_main.app.dependency_overrides[gateway_main.verify_auth_token] = lambda: {"sub": "test"}
+    yield chunks
+    gateway_main.app.dependency_overrides.clear()
+
+
+def test_pdf_pipeline_streams_one_line_per_chunk(generator):
+    form = {"subject": "Physics", "grade": "11", "medium": "English", "chapter_id": "PH01", "chapter_name": "Motion"}
+    with TestClient(gateway_main.app) as client:
+        response = client.post(
+            "/generate/pdf",
+            data=form,
+            files={"file": ("book.pdf", make_pdf(3, "motion " * 40), "application/pdf")},
+            headers={"Accept": "application/x-ndjson"}
+        )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    chunk_lines = sorted(lines[:-1], key=lambda line: line["chunk_index"])
+    assert [line["status"] for line in chunk_lines] == ["completed", "failed", "completed"]
+    assert chunk_lines[0]["questions"] == [{"question_text": "Page 0"}]
+    assert lines[-1] == {"status": "done", "chunks": 3, "failed": 1, "question_count": 2}
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+async def test_pdf_stream_cleans_up_when_the_body_never_starts(tmp_path, spec_version):
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(make_pdf(1))
+    response = gateway_main._pdf_stream_response(str(path), "hash", {}, None)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    scope = {"type": "http", "asgi": {"spec_version": spec_version}}
+    with pytest.raises(Exception):
+        await response(scope, receive, send)
+    assert not path.exists()
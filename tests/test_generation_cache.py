@@ -0,0 +1,82 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from src.services.generator.cache import GenerationCache, GenerationCacheEntry, cache_key
+from src.shared.models.question import GeneratedQuestion, SyllabusContent
+
+
+class Provider:
+    def __init__(self, name, model="m1"):
+        self.provider_name = name
+        self.model_name = model
+
+
+def make_content(text="Photosynthesis makes food.", **overrides) -> SyllabusContent:
+    fields = dict(
+        subject="Science", grade="10", medium="English",
+        chapter_id="CH05", chapter_name="Plants", content=text
+    )
+    fields.update(overrides)
+    return SyllabusContent(**fields)
+
+
+def make_questions(content: SyllabusContent):
+    return [GeneratedQuestion(
+        subject=content.subject, grade=content.grade, medium=content.medium,
+        chapter_id=content.chapter_id, chapter_name=content.chapter_name,
+        question_type="mcq", question_text="What do plants make?",
+        options=["Food", "Rocks"], answer=["Food"],
+        explanation="Photosynthesis."
+    )]
+
+
+@pytest.fixture(name="cache")
+def cache_fixture():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return GenerationCache(engine=engine, enabled=True, max_entries=2, max_age_days=30)
+
+
+def test_key_depends_on_prompt_parameters():
+    content = make_content()
+    base = cache_key(content, "Groq", "m1")
+    assert cache_key(make_content(chapter_id="OTHER"), "Groq", "m1") == base
+    assert cache_key(make_content(medium="Sinhala"), "Groq", "m1") != base
+    assert cache_key(content, "Gemini", "m1") != base
+    assert cache_key(content, "Groq", "m2") != base
+
+
+def test_round_trip_rebinds_chapter(cache):
+    provider = Provider("Groq")
+    cache.store(make_content(), provider, make_questions(make_content()))
+
+    hit = cache.lookup(make_content(chapter_id="CH99", chapter_name="Re-upload"), [provider])
+    assert len(hit) == 1
+    assert hit[0].chapter_id == "CH99"
+    assert hit[0].id is None
+    assert hit[0].answer == ["Food"]
+
+
+def test_miss_and_force_regenerate(cache):
+    provider = Provider("Groq")
+    assert cache.lookup(make_content(), [provider]) is None
+    cache.store(make_content(), provider, make_questions(make_content()))
+    assert cache.lookup(make_content(force_regenerate=True), [provider]) is None
+
+
+def test_lookup_prefers_provider_order(cache):
+    primary, fallback = Provider("Gemini"), Provider("Groq")
+    cache.store(make_content(), fallback, make_questions(make_content()))
+    assert cache.lookup(make_content(), [primary, fallback]) is not None
+
+
+def test_lru_eviction(cache):
+    provider = Provider("Groq")
+    for text in ["a", "b", "c"]:
+        cache.store(make_content(text), provider, make_questions(make_content(text)))
+
+    with Session(cache.engine) as session:
+        assert len(session.exec(select(GenerationCacheEntry)).all()) == 2
+    assert cache.lookup(make_content("a"), [provider]) is None
+    assert cache.lookup(make_content("c"), [provider]) is not None
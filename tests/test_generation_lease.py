@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.services.generator.cache import GenerationCache
+from src.services.generator.lease import GenerationLease, GenerationLeases, flight_key
+from src.services.generator.service import GeneratorService
+from src.shared.models.question import GeneratedQuestion, SyllabusContent
+
+CONTENT = SyllabusContent(
+    subject="Science", grade="10", medium="English",
+    chapter_id="1", chapter_name="Forces", content="Force equals mass times acceleration."
+)
+
+
+class SlowProvider:
+    provider_name = "slow"
+    model_name = "m1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def agenerate_questions(self, content: SyllabusContent):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return [GeneratedQuestion(
+            subject=content.subject, grade=content.grade, medium=content.medium,
+            chapter_id=content.chapter_id, chapter_name=content.chapter_name,
+            question_type="mcq", question_text="What is force?", options=["ma"], answer=["ma"]
+        )]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # A file database, so the lease is shared by separate connections like separate replicas
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def make_replica(engine, provider) -> GeneratorService:
+    service = GeneratorService(
+        cache=GenerationCache(engine=engine, enabled=True),
+        leases=GenerationLeases(engine=engine, enabled=True, lease=5, poll_interval=0.01)
+    )
+    service.providers = [provider]
+    return service
+
+
+def test_key_ignores_chapter_and_provider():
+    other_chapter = CONTENT.model_copy(update={"chapter_id": "2", "chapter_name": "Motion"})
+    assert flight_key(CONTENT) == flight_key(other_chapter)
+    assert flight_key(CONTENT) != flight_key(CONTENT.model_copy(update={"generation_type": "advanced"}))
+
+
+async def test_identical_generations_on_two_replicas_share_one_llm_call(engine):
+    provider = SlowProvider()
+    first, second = make_replica(engine, provider), make_replica(engine, provider)
+    other_chapter = CONTENT.model_copy(update={"chapter_id": "2"})
+
+    results = await asyncio.gather(first.agenerate_questions(CONTENT), second.agenerate_questions(other_chapter))
+
+    assert provider.calls == 1
+    assert [q.question_text for q in results[1]] == ["What is force?"]
+    assert results[1][0].chapter_id == "2"
+    assert first.leases.leaders + second.leases.leaders == 1
+    with Session(engine) as session:
+        assert session.get(GenerationLease, flight_key(CONTENT)) is None
+
+
+def test_expired_lease_is_taken_over(engine):
+    leases = GenerationLeases(engine=engine, lease=5)
+    with Session(engine) as session:
+        session.add(GenerationLease(key="k", owner="dead", expires_at=time.time() - 1))
+        session.commit()
+
+    assert leases.try_acquire("k", "alive")
+    assert not leases.try_acquire("k", "another")
+    leases.release("k", "alive")
+    assert not leases.is_held("k")
+
+
+async def test_winner_rechecks_cache_after_acquiring_lease(engine):
+    leases = GenerationLeases(engine=engine, lease=5)
+    generated = []
+
+    async def generate():
+        generated.append(1)
+        return ["fresh"]
+
+    # A previous holder finished (and cached its result) after this caller's first lookup
+    result = await leases.run("k", generate, lambda: ["cached"])
+
+    assert result == ["cached"]
+    assert generated == []
+    assert not leases.is_held("k")
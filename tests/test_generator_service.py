@@ -0,0 +1,138 @@
+import asyncio
+from typing import List
+
+from src.services.generator.providers.base import BaseLLMProvider
+from src.services.generator.cache import GenerationCache
+from src.services.generator.health import ProviderHealth
+from src.services.generator.service import GeneratorService
+from src.shared.models.question import GeneratedQuestion, SyllabusContent
+
+CONTENT = SyllabusContent(
+    subject="Science", grade="10", medium="English",
+    chapter_id="1", chapter_name="Forces", content="Force equals mass times acceleration."
+)
+
+
+class FakeProvider(BaseLLMProvider):
+    def __init__(self, name: str, fail: bool = False, delay: float = 0):
+        self.name = name
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = False
+
+    @property
+    def provider_name(self) -> str:
+        return self.name
+
+    def _result(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return [GeneratedQuestion(
+            subject=content.subject, grade=content.grade, medium=content.medium,
+            chapter_id=content.chapter_id, chapter_name=content.chapter_name,
+            question_type="mcq", question_text=f"From {self.name}"
+        )]
+
+    def generate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        return self._result(content)
+
+    async def agenerate_questions(self, content: SyllabusContent) -> List[GeneratedQuestion]:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self._result(content)
+
+
+def make_service(*providers, policy: str = "sequential") -> GeneratorService:
+    service = GeneratorService(cache=GenerationCache(enabled=False), dispatch_policy=policy)
+    service.providers = list(providers)
+    return service
+
+
+async def test_async_generation_uses_primary():
+    primary, fallback = FakeProvider("primary"), FakeProvider("fallback")
+    result = await make_service(primary, fallback).agenerate_questions(CONTENT)
+    assert [q.question_text for q in result] == ["From primary"]
+    assert fallback.calls == 0
+
+
+async def test_async_generation_falls_back_on_error():
+    primary, fallback = FakeProvider("primary", fail=True), FakeProvider("fallback")
+    result = await make_service(primary, fallback).agenerate_questions(CONTENT)
+    assert [q.question_text for q in result] == ["From fallback"]
+
+
+async def test_async_generation_returns_empty_when_all_fail():
+    service = make_service(FakeProvider("a", fail=True), FakeProvider("b", fail=True))
+    assert await service.agenerate_questions(CONTENT) == []
+
+
+async def test_hedged_generation_starts_fallback_after_p95_and_cancels_primary():
+    primary, fallback = FakeProvider("primary", delay=1), FakeProvider("fallback")
+    service = make_service(primary, fallback, policy="hedged")
+    service.health.min_samples = 1
+    service.health.record_success("primary", 0.02)
+
+    result = await asyncio.wait_for(service.agenerate_questions(CONTENT), timeout=0.5)
+
+    assert [q.question_text for q in result] == ["From fallback"]
+    assert primary.cancelled
+
+
+async def test_hedged_generation_keeps_fast_primary():
+    primary, fallback = FakeProvider("primary"), FakeProvider("fallback")
+    result = await make_service(primary, fallback, policy="hedged").agenerate_questions(CONTENT)
+    assert [q.question_text for q in result] == ["From primary"]
+    assert fallback.calls == 0
+
+
+async def test_race_returns_first_valid_result():
+    slow, failing, fast = FakeProvider("slow", delay=1), FakeProvider("failing", fail=True), FakeProvider("fast", delay=0.01)
+    service = make_service(slow, failing, fast, policy="race")
+
+    result = await asyncio.wait_for(service.agenerate_questions(CONTENT), timeout=0.5)
+
+    assert [q.question_text for q in result] == ["From fast"]
+    assert slow.cancelled
+    stats = service.health.stats()
+    assert stats["failing"]["failures"] == 1
+    assert stats["fast"]["successes"] == 1
+
+
+async def test_open_circuit_skips_provider_until_probe():
+    now = [0.0]
+    primary, fallback = FakeProvider("primary", fail=True), FakeProvider("fallback")
+    service = make_service(primary, fallback)
+    service.health = ProviderHealth(failure_threshold=2, cooldown=30, timer=lambda: now[0])
+
+    for _ in range(3):
+        await service.agenerate_questions(CONTENT)
+    assert primary.calls == 2
+    assert service.health.stats()["primary"]["state"] == "open"
+
+    # After the cooldown one probe goes through; its success closes the circuit
+    now[0] = 31
+    primary.fail = False
+    result = await service.agenerate_questions(CONTENT)
+    assert [q.question_text for q in result] == ["From primary"]
+    assert service.health.stats()["primary"]["state"] == "closed"
+
+
+def test_routing_prefers_faster_and_cheaper_provider():
+    slow, fast = FakeProvider("slow"), FakeProvider("fast")
+    health = ProviderHealth(min_samples=2)
+    assert health.route([slow, fast]) == [slow, fast]
+
+    for _ in range(2):
+        health.record_success("slow", 2.0)
+        health.record_success("fast", 0.5)
+    assert health.route([slow, fast]) == [fast, slow]
+
+    # Four times the cost cancels out the latency advantage; ties keep the configured order
+    health._stats["fast"].cost = 4.0
+    assert health.route([slow, fast]) == [slow, fast]
+    assert health.weights() == {"slow": 0.5, "fast": 0.5}
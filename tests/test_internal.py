@@ -0,0 +1,71 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.auth import main as auth_main
+from src.services.gateway import main as gateway_main
+from src.services.generator import main as generator_main
+from src.shared.models.question import GeneratedQuestion
+from src.shared.utils import internal
+
+
+@pytest.fixture
+def gateways(monkeypatch):
+    """
+    Two fake gateway replicas that record the invalidations they receive.
+    """
+    received = []
+
+    def handler(request: httpx.Request):
+        received.append((request.url.host, request.url.path, request.headers.get("X-Internal-Token")))
+        if request.url.host == "gateway-down":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"status": "invalidated"})
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        internal.httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs)
+    )
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "s3cret")
+    return received
+
+
+def test_gateway_urls_prefers_the_replica_list(monkeypatch):
+    monkeypatch.setenv("GATEWAY_URLS", "http://gateway-1:8000/, http://gateway-2:8000")
+    assert internal.gateway_urls("http://gateway:8000") == ["http://gateway-1:8000", "http://gateway-2:8000"]
+    monkeypatch.delenv("GATEWAY_URLS")
+    assert internal.gateway_urls("http://gateway:8000") == ["http://gateway:8000"]
+
+
+async def test_token_invalidation_reaches_every_gateway(gateways, monkeypatch):
+    monkeypatch.setenv("GATEWAY_URLS", "http://gateway-1,http://gateway-down,http://gateway-2")
+    await auth_main.publish_token_invalidation("admin", "alice")
+    assert sorted(gateways) == [
+        ("gateway-1", "/internal/auth/invalidate", "s3cret"),
+        ("gateway-2", "/internal/auth/invalidate", "s3cret"),
+        ("gateway-down", "/internal/auth/invalidate", "s3cret"),
+    ]
+
+
+async def test_question_invalidation_reaches_every_gateway(gateways, monkeypatch):
+    monkeypatch.setenv("GATEWAY_URLS", "http://gateway-1,http://gateway-2")
+    chapter = {"subject": "Physics", "grade": "11", "medium": "English", "chapter_id": "PH01"}
+    questions = [GeneratedQuestion(**chapter, chapter_name="Motion", question_text=f"Q{i}") for i in range(3)]
+    await generator_main.publish_questions_changed(questions)
+    assert sorted(gateways) == [
+        ("gateway-1", "/internal/questions/invalidate", "s3cret"),
+        ("gateway-2", "/internal/questions/invalidate", "s3cret"),
+    ]
+
+
+def test_internal_endpoints_require_the_shared_token(monkeypatch):
+    body = {"type": "admin", "sub": "alice"}
+    with TestClient(gateway_main.app) as client:
+        monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "")
+        assert client.post("/internal/auth/invalidate", json=body).status_code == 403
+
+        monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "s3cret")
+        assert client.post("/internal/auth/invalidate", json=body).status_code == 403
+        assert client.post("/internal/auth/invalidate", json=body, headers={"X-Internal-Token": "guess"}).status_code == 403
+        response = client.post("/internal/auth/invalidate", json=body, headers={"X-Internal-Token": "s3cret"})
+        assert response.status_code == 200
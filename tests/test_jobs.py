@@ -0,0 +1,132 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from src.services.generator import jobs
+from src.shared.models.job import JobRequest
+from src.shared.models.question import GeneratedQuestion
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(jobs, "engine", engine)
+    return engine
+
+
+def make_request(chunks):
+    return JobRequest(
+        subject="Science", grade="10", medium="English",
+        chapter_id="1", chapter_name="Forces", chunks=chunks
+    )
+
+
+def make_worker(engine, fail_on=()):
+    async def process(content):
+        if content.content in fail_on:
+            raise RuntimeError("LLM error")
+        question = GeneratedQuestion(
+            subject=content.subject, grade=content.grade, medium=content.medium,
+            chapter_id=content.chapter_id, chapter_name=content.chapter_name,
+            question_type="mcq", question_text=f"Q from {content.content}"
+        )
+        with Session(engine) as session:
+            session.add(question)
+            session.commit()
+            session.refresh(question)
+        return [question]
+
+    return jobs.JobWorker(process, name="test")
+
+
+async def run_all(worker):
+    while True:
+        claimed = worker.claim_next("test#0")
+        if claimed is None:
+            return
+        await worker.process_chunk(*claimed)
+
+
+async def test_job_processes_chunks_in_order(engine):
+    with Session(engine) as session:
+        job = jobs.create_job(session, make_request(["a", "b", "c"]))
+        assert jobs.job_status(session, job).status == "pending"
+
+    await run_all(make_worker(engine))
+
+    with Session(engine) as session:
+        job = session.get(jobs.GenerationJob, job.id)
+        status = jobs.job_status(session, job)
+        assert status.status == "completed"
+        assert status.completed_chunks == 3
+        questions = jobs.job_questions(session, job.id)
+        assert [q.question_text for q in questions] == ["Q from a", "Q from b", "Q from c"]
+        assert [q.question_text for q in jobs.job_questions(session, job.id, after_chunk=0)] == ["Q from b", "Q from c"]
+
+
+async def test_partial_results_while_running(engine):
+    with Session(engine) as session:
+        job = jobs.create_job(session, make_request(["a", "b"]))
+
+    worker = make_worker(engine)
+    await worker.process_chunk(*worker.claim_next("test#0"))
+
+    with Session(engine) as session:
+        status = jobs.job_status(session, session.get(jobs.GenerationJob, job.id))
+        assert status.status == "running"
+        assert status.completed_chunks == 1
+        assert len(jobs.job_questions(session, job.id)) == 1
+
+
+async def test_failed_chunk_is_retried_then_marked_failed(engine, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CHUNK_MAX_ATTEMPTS", 2)
+    with Session(engine) as session:
+        job = jobs.create_job(session, make_request(["ok", "bad"]))
+
+    await run_all(make_worker(engine, fail_on={"bad"}))
+
+    with Session(engine) as session:
+        status = jobs.job_status(session, session.get(jobs.GenerationJob, job.id))
+        assert status.status == "completed"
+        assert status.failed_chunks == 1
+        assert status.chunks[1].attempts == 2
+        assert status.error == "1 of 2 chunk(s) failed"
+
+
+async def test_cancel_stops_pending_chunks(engine):
+    with Session(engine) as session:
+        job = jobs.create_job(session, make_request(["a", "b"]))
+        jobs.cancel_job(session, job)
+
+    worker = make_worker(engine)
+    assert worker.claim_next("test#0") is None
+
+    with Session(engine) as session:
+        status = jobs.job_status(session, session.get(jobs.GenerationJob, job.id))
+        assert status.status == "cancelled"
+        assert {c.status for c in status.chunks} == {"cancelled"}
+
+
+async def test_reclaimed_chunk_is_finished_only_by_the_current_holder(engine, monkeypatch):
+    with Session(engine) as session:
+        job = jobs.create_job(session, make_request(["a"]))
+
+    worker = make_worker(engine)
+    stale = worker.claim_next("replica-1#0")
+    # The first claim's lease expires and another replica takes the chunk over
+    monkeypatch.setattr(jobs, "JOB_CHUNK_LEASE_SECONDS", -1)
+    current = worker.claim_next("replica-2#0")
+    assert current[4] == stale[4] + 1
+
+    await worker.process_chunk(*current)
+    with Session(engine) as session:
+        finished = [q.id for q in jobs.job_questions(session, job.id)]
+    # The stale claim's late result is discarded
+    await worker.process_chunk(*stale)
+
+    with Session(engine) as session:
+        status = jobs.job_status(session, session.get(jobs.GenerationJob, job.id))
+        assert status.status == "completed"
+        assert status.chunks[0].attempts == 2
+        assert [q.id for q in jobs.job_questions(session, job.id)] == finished
@@ -0,0 +1,27 @@
+import json
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+
+from src.shared.utils.json_utils import dumps, loads, passthrough, questions_json
+from tests.helpers import make_question
+
+
+def test_questions_json_matches_fastapi_encoding():
+    questions = [
+        make_question(i, medium="Sinhala", chapter_name="මිනුම්", question_text=f"ප්‍රශ්නය {i}")
+        for i in range(1, 4)
+    ]
+    assert json.loads(questions_json(questions)) == jsonable_encoder(questions)
+
+
+def test_dumps_round_trips_non_ascii_and_int_keys():
+    assert loads(dumps({"text": "ප්‍රශ්නය", 1: [1.5, None]})) == {"text": "ප්‍රශ්නය", "1": [1.5, None]}
+
+
+def test_passthrough_keeps_upstream_body_and_status():
+    upstream = httpx.Response(202, content=b'{"id":"job"}', headers={"content-type": "application/json"})
+    response = passthrough(upstream)
+    assert response.status_code == 202
+    assert response.body == b'{"id":"job"}'
+    assert response.media_type == "application/json"
@@ -19,7 +19,7 @@ def test_language_filtering(client: TestClient):
                 chapter_id="5", chapter_name="Kandy Era",
                 question_type="mcq",
                 question_text="Sinhala Question 1",
-                options="[]", answer='""'
+                options=[], answer=[]
             )
         ]
         
@@ -35,7 +35,7 @@ def test_language_filtering(client: TestClient):
                 chapter_id="5", chapter_name="Kandy Era",
                 question_type="mcq",
                 question_text="English Question 1",
-                options="[]", answer='""'
+                options=[], answer=[]
             )
         ]
         
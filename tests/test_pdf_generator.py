@@ -0,0 +1,110 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.shared.utils import pdf_generator
+from src.shared.utils.pdf_generator import (
+    split_math_spans, render_math_span, math_markup, generate_question_pdf,
+    collect_math_spans, prerender_math, agenerate_question_pdf, write_question_pdf
+)
+from tests.helpers import make_question
+
+
+@pytest.fixture(autouse=True)
+def clear_math_cache(monkeypatch):
+    pdf_generator._math_cache.clear()
+    monkeypatch.setattr(pdf_generator, "MATH_RENDER_CACHE_DIR", None)
+    for key in pdf_generator._math_stats:
+        pdf_generator._math_stats[key] = 0
+
+
+def test_split_math_spans():
+    assert split_math_spans("a $x^2$ b $y$") == [(False, "a "), (True, "x^2"), (False, " b "), (True, "y")]
+    assert split_math_spans("no math") == [(False, "no math")]
+    assert split_math_spans("cost $5") == [(False, "cost $5")]
+
+
+def test_repeated_span_renders_once():
+    first = render_math_span("m/s^2", 10)
+    second = render_math_span("m/s^2", 10)
+    assert first is second
+    assert first.width > 0 and first.height > 0
+    assert pdf_generator._math_stats["misses"] == 1
+    assert pdf_generator._math_stats["hits"] == 1
+
+
+def test_disk_cache_is_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_generator, "MATH_RENDER_CACHE_DIR", str(tmp_path))
+    image = render_math_span(r"\frac{1}{2}mv^2", 12)
+    assert len(list(tmp_path.glob("*.png"))) == 1
+
+    pdf_generator._math_cache.clear()
+    cached = render_math_span(r"\frac{1}{2}mv^2", 12)
+    assert cached.png == image.png
+    assert cached.depth == pytest.approx(image.depth, abs=1e-3)
+    assert pdf_generator._math_stats["disk_hits"] == 1
+
+
+def test_markup_escapes_text_and_keeps_broken_math():
+    markup = math_markup(r"a < b and $\frac{$ and $x$", 10)
+    assert "a &lt; b" in markup
+    assert markup.count("<img") == 1
+
+
+def test_generate_pdf_with_math():
+    question = make_question()
+    buffer = generate_question_pdf([question, question])
+    assert buffer.getvalue().startswith(b"%PDF")
+    # Six distinct (span, size, colour) combinations; the second question is all cache hits
+    assert pdf_generator._math_stats["misses"] == 6
+
+
+def test_collect_math_spans_is_unique_per_style():
+    spans = collect_math_spans([make_question(), make_question()])
+    assert len(spans) == 6
+    assert ("m/s^2", 12, "#000000") in spans
+    assert ("m/s^2", 10, "#ff0000") in spans
+
+
+async def test_prerender_math_in_worker_processes():
+    questions = [make_question()]
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        await prerender_math(questions, pool=pool, batch_size=4)
+    finally:
+        pool.shutdown()
+    assert len(pdf_generator._math_cache) == 6
+    assert pdf_generator._math_stats["misses"] == 0
+
+    # The build only hits the primed cache
+    buffer = await agenerate_question_pdf(questions)
+    assert buffer.getvalue().startswith(b"%PDF")
+    assert pdf_generator._math_stats["misses"] == 0
+
+
+async def test_cache_reads_do_not_wait_for_rasterising():
+    questions = [make_question()]
+    for span in collect_math_spans(questions):
+        render_math_span(*span)
+    # A build thread rasterising a new span holds the Matplotlib lock
+    with pdf_generator._render_lock:
+        assert render_math_span("m/s^2", 12) is not None
+        await asyncio.wait_for(prerender_math(questions, pool=None), timeout=5)
+
+
+def test_write_question_pdf_accepts_page_iterator():
+    consumed = []
+
+    def pages():
+        for n in range(3):
+            consumed.append(n)
+            yield [make_question()]
+
+    iterator = pages()
+    buffer = io.BytesIO()
+    assert write_question_pdf(iterator, buffer) == 3
+    assert consumed == [0, 1, 2]
+    assert buffer.getvalue().startswith(b"%PDF")
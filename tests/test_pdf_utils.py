@@ -0,0 +1,53 @@
+import hashlib
+import io
+
+import pytest
+
+from src.shared.utils import pdf_utils
+from src.shared.utils.pdf_utils import (
+    extract_text_from_pdf, spool_to_disk, aextract_pdf_pages, join_page_texts
+)
+from tests.helpers import make_pdf
+
+
+@pytest.fixture(autouse=True)
+def clear_text_cache():
+    pdf_utils._text_cache.clear()
+
+
+def test_extract_text_from_pdf_keeps_page_order():
+    text = extract_text_from_pdf(make_pdf(3))
+    assert text.index("Page 0") < text.index("Page 1") < text.index("Page 2")
+    assert extract_text_from_pdf(b"not a pdf") == ""
+
+
+async def test_page_ranges_and_cache(monkeypatch):
+    path, content_hash = spool_to_disk(io.BytesIO(make_pdf(5)))
+    monkeypatch.setattr(pdf_utils, "get_process_pool", lambda: None)
+
+    pages = await aextract_pdf_pages(path, content_hash, pages_per_task=2)
+    assert [p.split()[1] for p in pages] == ["0", "1", "2", "3", "4"]
+    assert join_page_texts(pages) == extract_text_from_pdf(open(path, "rb").read())
+
+    # A re-upload of the same bytes never opens the file
+    pdf_utils.os.remove(path)
+    assert await aextract_pdf_pages(path, content_hash) == pages
+
+
+def test_spool_hash_matches_content():
+    data = make_pdf(1)
+    path, content_hash = spool_to_disk(io.BytesIO(data))
+    try:
+        assert content_hash == hashlib.sha256(data).hexdigest()
+        assert open(path, "rb").read() == data
+    finally:
+        pdf_utils.os.remove(path)
+
+
+async def test_unreadable_pdf_returns_no_pages(monkeypatch):
+    monkeypatch.setattr(pdf_utils, "get_process_pool", lambda: None)
+    path, content_hash = spool_to_disk(io.BytesIO(b"not a pdf"))
+    try:
+        assert await aextract_pdf_pages(path, content_hash) == []
+    finally:
+        pdf_utils.os.remove(path)
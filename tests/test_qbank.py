@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from src.services.qbank import main as qbank_main
+from src.services.qbank.main import app
+from src.shared.core.database import create_indexes, get_session
+from src.shared.models.question import GeneratedQuestion
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(7):
+            session.add(GeneratedQuestion(
+                subject="Science", grade="10", medium="English" if i % 2 == 0 else "Sinhala",
+                chapter_id="1", chapter_name="Forces",
+                question_type="mcq", question_text=f"Q{i}",
+                options=[str(n) for n in range(4 if i < 3 else 2)], answer=["0"]
+            ))
+        session.commit()
+    return engine
+
+
+@pytest.fixture(name="client")
+def client_fixture(engine, monkeypatch):
+    monkeypatch.setattr(qbank_main, "engine", engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_composite_indexes_exist(engine):
+    names = {index["name"] for index in inspect(engine).get_indexes("generatedquestion")}
+    assert {"ix_generatedquestion_chapter", "ix_generatedquestion_medium_subject"} <= names
+
+
+def test_create_indexes_is_repeatable_with_expression_index(engine):
+    create_indexes(engine)
+    create_indexes(engine)
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM generatedquestion "
+            "WHERE question_type = 'mcq' AND json_array_length(options) = 4"
+        ).all()
+    assert "ix_generatedquestion_type_option_count" in str(plan)
+
+
+def test_keyset_pagination_walks_all_rows(client: TestClient):
+    seen = []
+    params = {"limit": 3, "include_total": "true"}
+    while True:
+        response = client.get("/questions", params=params)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "7"
+        seen.extend(q["question_text"] for q in response.json())
+        next_after_id = response.headers.get("X-Next-After-Id")
+        if not next_after_id:
+            break
+        params["after_id"] = next_after_id
+
+    assert seen == [f"Q{i}" for i in range(7)]
+
+
+def test_filters_apply_with_pagination(client: TestClient):
+    response = client.get("/questions", params={"medium": "Sinhala", "limit": 2})
+    data = response.json()
+    assert [q["question_text"] for q in data] == ["Q1", "Q3"]
+    assert response.headers["X-Next-After-Id"] == str(data[-1]["id"])
+    assert "X-Total-Count" not in response.headers
+
+
+def test_limit_is_bounded(client: TestClient):
+    assert client.get("/questions", params={"limit": 0}).status_code == 422
+
+
+def test_ndjson_stream_returns_all_rows(client: TestClient, monkeypatch):
+    monkeypatch.setattr(qbank_main, "STREAM_BATCH_SIZE", 2)
+    response = client.get(
+        "/questions",
+        params={"medium": "English", "limit": 1, "include_total": "true"},
+        headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["X-Total-Count"] == "4"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["question_text"] for r in rows] == ["Q0", "Q2", "Q4", "Q6"]
+
+
+def test_questions_version(client: TestClient):
+    assert client.get("/questions/version").json() == {"count": 7, "max_id": 7}
+    assert client.get("/questions/version", params={"medium": "Sinhala"}).json() == {"count": 3, "max_id": 6}
+    assert client.get("/questions/version", params={"chapter_id": "missing"}).json() == {"count": 0, "max_id": None}
+
+
+def test_options_are_json_arrays_and_filterable_by_count(client: TestClient):
+    response = client.get("/questions", params={"question_type": "mcq", "option_count": 4})
+    data = response.json()
+    assert [q["question_text"] for q in data] == ["Q0", "Q1", "Q2"]
+    assert data[0]["options"] == ["0", "1", "2", "3"]
+    assert data[0]["answer"] == ["0"]
+    assert client.get("/questions/version", params={"option_count": 2}).json() == {"count": 4, "max_id": 7}
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from src.services.generator.writer import QuestionWriter, save_questions_bulk
+from src.shared.models.question import GeneratedQuestion
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def make_questions(n, chapter="CH01"):
+    return [GeneratedQuestion(
+        subject="Science", grade="10", medium="English", chapter_id=chapter, chapter_name="Forces",
+        question_type="mcq", question_text=f"{chapter} Q{i}", options=["a", "b"], answer=["a"]
+    ) for i in range(n)]
+
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_bulk_insert_returns_ids_in_one_statement(engine):
+    statements = count_statements(engine)
+    questions = save_questions_bulk(make_questions(30), engine)
+
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    assert len(inserts) == 1
+    assert not any(s.lstrip().upper().startswith("SELECT") for s in statements)
+    with Session(engine) as session:
+        stored = {q.id: q.question_text for q in session.exec(select(GeneratedQuestion)).all()}
+    assert {q.id: q.question_text for q in questions} == stored
+
+
+async def test_concurrent_writes_share_one_commit(engine):
+    writer = QuestionWriter(engine=engine, flush_window=0.05)
+    results = await asyncio.gather(*(writer.write(make_questions(5, f"CH{i}")) for i in range(4)))
+
+    assert writer.stats()["batches"] == 1
+    assert writer.stats()["rows"] == 20
+    for i, questions in enumerate(results):
+        assert all(q.id is not None and q.chapter_id == f"CH{i}" for q in questions)
+
+
+async def test_bad_write_only_fails_its_caller(engine):
+    writer = QuestionWriter(engine=engine, flush_window=0.05)
+    bad = make_questions(1)
+    bad[0].question_text = None # NOT NULL violation
+
+    good, failed = await asyncio.gather(writer.write(make_questions(2)), writer.write(bad), return_exceptions=True)
+
+    assert all(q.id is not None for q in good)
+    assert isinstance(failed, Exception)
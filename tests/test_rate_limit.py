@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+from sqlmodel import create_engine
+
+from src.services.generator.rate_limit import (
+    DatabaseBucketStore, InMemoryBucketStore, RateLimitBucket, RateLimiter, parse_reset_duration
+)
+from tests.helpers import FakeClock
+
+
+def make_limiter(rpm=60, tpm=6000):
+    clock = FakeClock()
+    return RateLimiter("test:model", rpm, tpm, store=InMemoryBucketStore(timer=clock)), clock
+
+
+def test_requests_within_budget_do_not_wait():
+    limiter, _ = make_limiter()
+    assert limiter._try_acquire(2000) == 0
+    assert limiter._try_acquire(2000) == 0
+
+
+def test_token_budget_exhaustion_reports_wait():
+    limiter, clock = make_limiter(tpm=6000)
+    assert limiter._try_acquire(6000) == 0
+    # 6000 TPM refills at 100 tokens/second
+    assert limiter._try_acquire(1000) == pytest.approx(10.0)
+    clock.now += 10
+    assert limiter._try_acquire(1000) == 0
+
+
+def test_request_budget_is_enforced_and_tokens_are_returned():
+    limiter, clock = make_limiter(rpm=1, tpm=6000)
+    assert limiter._try_acquire(100) == 0
+    assert limiter._try_acquire(100) == pytest.approx(60.0)
+    clock.now += 60
+    # The refused call must not have consumed tokens
+    assert limiter._try_acquire(5900) == 0
+
+
+def test_usage_settlement_refunds_overestimates():
+    limiter, _ = make_limiter(tpm=6000)
+    assert limiter._try_acquire(6000) == 0
+    limiter.record_usage(estimated_tokens=6000, actual_tokens=1000)
+    assert limiter._try_acquire(5000) == 0
+
+
+def test_headers_correct_the_bucket():
+    limiter, _ = make_limiter(tpm=6000)
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "500"})
+    assert limiter._try_acquire(1000) == pytest.approx(5.0)
+
+
+def test_retry_after_blocks_the_bucket():
+    limiter, clock = make_limiter(tpm=6000)
+    limiter.update_from_headers({"retry-after": "30"})
+    assert limiter._try_acquire(1) > 29
+    clock.now += 31
+    assert limiter._try_acquire(1) == 0
+
+
+async def test_acquire_waits_for_budget(monkeypatch):
+    limiter, clock = make_limiter(tpm=6000)
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("src.services.generator.rate_limit.asyncio.sleep", fake_sleep)
+    await limiter.acquire(6000)
+    await limiter.acquire(3000)
+    assert slept == [pytest.approx(30.0)]
+
+
+def test_database_store_does_not_overspend_across_replicas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'buckets.db'}")
+    RateLimitBucket.__table__.create(engine)
+    clock = FakeClock()
+    start = threading.Barrier(4)
+    granted = []
+
+    def replica():
+        # Separate stores, like separate generator processes; all race to create the row
+        store = DatabaseBucketStore(timer=clock, bind=engine)
+        start.wait()
+        granted.append(sum(store.take("groq:tokens", 50, 1e-9, 1) == 0 for _ in range(40)))
+
+    threads = [threading.Thread(target=replica) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(granted) == 50
+    assert DatabaseBucketStore(timer=clock, bind=engine).take("groq:tokens", 50, 1e-9, 1) > 0
+
+
+def test_database_store_refills_and_settles(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'buckets.db'}")
+    RateLimitBucket.__table__.create(engine)
+    clock = FakeClock()
+    limiter = RateLimiter("test:model", 60, 6000, store=DatabaseBucketStore(timer=clock, bind=engine))
+    assert limiter._try_acquire(6000) == 0
+    assert limiter._try_acquire(1000) == pytest.approx(10.0)
+    limiter.record_usage(estimated_tokens=6000, actual_tokens=5500)
+    assert limiter._try_acquire(1000) == pytest.approx(5.0)
+    clock.now += 5
+    assert limiter._try_acquire(1000) == 0
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("7.66s", 7.66),
+    ("2m59.56s", 179.56),
+    ("1h2m", 3720.0),
+    ("250ms", 0.25),
+    ("12", 12.0),
+    (None, None),
+])
+def test_parse_reset_duration(value, expected):
+    result = parse_reset_duration(value)
+    assert result == (pytest.approx(expected) if expected is not None else None)
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+
+from src.services.gateway.dispatch import dispatch_chunks
+from src.services.gateway.registry import ServiceRegistry, for_service
+
+
+def test_lease_expires_without_heartbeat():
+    now = [0.0]
+    registry = ServiceRegistry(lease=30, timer=lambda: now[0])
+    registry.register("generator", "http://a")
+    registry.register("generator", "http://b")
+
+    now[0] = 20
+    registry.register("generator", "http://a") # heartbeat
+    now[0] = 40
+    assert registry.urls("generator") == ["http://a"]
+    assert registry.pick("generator") == "http://a"
+
+
+async def test_failed_health_checks_evict_and_passing_ones_readmit():
+    registry = ServiceRegistry(evict_after=2, readmit_after=2)
+    registry.register("generator", "http://a")
+    registry.register("generator", "http://b")
+    down = {"a"}
+
+    async def handler(request: httpx.Request):
+        if request.url.host in down:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json={"status": "ok"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await registry.check_all(client)
+        assert registry.has("generator") and len(registry.urls("generator")) == 2
+        await registry.check_all(client)
+        assert registry.urls("generator") == ["http://b"]
+
+        down.clear()
+        await registry.check_all(client)
+        assert registry.urls("generator") == ["http://b"]
+        await registry.check_all(client)
+        assert sorted(registry.urls("generator")) == ["http://a", "http://b"]
+
+
+async def test_routes_to_instance_with_fewest_outstanding_requests():
+    registry = ServiceRegistry(policy="least_outstanding")
+    registry.register("generator", "http://a")
+    registry.register("generator", "http://b")
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request):
+        if request.url.path == "/slow":
+            await release.wait()
+        return httpx.Response(200, json=[])
+
+    async with httpx.AsyncClient(transport=registry.transport(httpx.MockTransport(handler))) as client:
+        slow = asyncio.create_task(client.get("http://a/slow"))
+        await asyncio.sleep(0.01)
+        assert registry.stats()["generator"][0]["outstanding"] == 1
+        assert [registry.pick("generator") for _ in range(5)] == ["http://b"] * 5
+
+        release.set()
+        await slow
+    stats = {i["url"]: i for i in registry.stats()["generator"]}
+    assert stats["http://a"]["outstanding"] == 0
+    assert stats["http://a"]["requests"] == 1
+
+
+async def test_dispatch_retries_on_another_registered_instance():
+    registry = ServiceRegistry()
+    registry.register("generator", "http://bad")
+    registry.register("generator", "http://good")
+    hosts = []
+
+    async def handler(request: httpx.Request):
+        hosts.append(request.url.host)
+        if request.url.host == "bad":
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json=[{"question_text": "ok"}])
+
+    async with httpx.AsyncClient(transport=registry.transport(httpx.MockTransport(handler))) as client:
+        results = await dispatch_chunks(client, registry.picker("generator"), [{}] * 4)
+
+    assert results == [[{"question_text": "ok"}]] * 4
+    # A chunk that failed on "bad" is retried on "good", never on "bad" again
+    assert hosts.count("good") == 4
+    assert len(hosts) <= 8
+
+
+async def test_services_sharing_an_origin_are_tracked_separately():
+    registry = ServiceRegistry()
+    registry.register("science_qbank", "http://qbank:8002")
+    registry.register("general_qbank", "http://qbank:8002")
+
+    async def handler(request: httpx.Request):
+        return httpx.Response(200, json=[])
+
+    async with httpx.AsyncClient(transport=registry.transport(httpx.MockTransport(handler))) as client:
+        await client.get("http://qbank:8002/questions", extensions=for_service("science_qbank"))
+        await client.get("http://qbank:8002/questions", extensions=for_service("science_qbank"))
+        await client.get("http://qbank:8002/questions", extensions=for_service("general_qbank"))
+        # Ambiguous without a service: not counted against either
+        await client.get("http://qbank:8002/questions")
+
+        stats = registry.stats()
+        assert stats["science_qbank"][0]["requests"] == 2
+        assert stats["general_qbank"][0]["requests"] == 1
+
+        # Once the origin is unambiguous again, untagged requests are counted
+        registry.deregister("science_qbank", "http://qbank:8002")
+        await client.get("http://qbank:8002/questions")
+    assert registry.stats()["general_qbank"][0]["requests"] == 2
@@ -0,0 +1,95 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.gateway import main as gateway_main
+from src.services.gateway.registry import ServiceRegistry
+from src.services.gateway.response_cache import ResponseCache, cache_key
+from src.shared.utils import internal
+from tests.helpers import FakeClock
+
+
+def test_key_ignores_parameter_order_and_types():
+    assert cache_key({"grade": 10, "subject": "Physics"}) == cache_key({"subject": "Physics", "grade": "10"})
+
+
+def test_entries_expire_and_respect_byte_bound():
+    clock = FakeClock(1000.0)
+    cache = ResponseCache(ttl=30, max_bytes=2000, max_entry_bytes=2000, timer=clock)
+    cache.put(cache_key({"chapter_id": "1"}), b"x" * 700, {}, cache.generation())
+    cache.put(cache_key({"chapter_id": "2"}), b"y" * 700, {}, cache.generation())
+    cache.put(cache_key({"chapter_id": "3"}), b"z" * 700, {}, cache.generation())
+    # The least recently used entry made room for the third
+    assert cache.get(cache_key({"chapter_id": "1"})) is None
+    assert cache.get(cache_key({"chapter_id": "3"})).body == b"z" * 700
+
+    clock.now += 31
+    assert cache.get(cache_key({"chapter_id": "3"})) is None
+
+
+def test_invalidation_drops_matching_and_broader_queries_only():
+    cache = ResponseCache(ttl=60)
+    chapter = {"subject": "Physics", "grade": "11", "medium": "English"}
+    keys = {
+        "same": cache_key({**chapter, "chapter_id": "PH01", "limit": 50}),
+        "subject": cache_key({"subject": "Physics"}),
+        "other_chapter": cache_key({**chapter, "chapter_id": "PH02"}),
+        "other_subject": cache_key({"subject": "Chemistry"}),
+    }
+    for key in keys.values():
+        cache.put(key, b"[]", {}, cache.generation())
+
+    assert cache.invalidate_chapter("Physics", "11", "English", "PH01") == 2
+    assert cache.get(keys["same"]) is None
+    assert cache.get(keys["subject"]) is None
+    assert cache.get(keys["other_chapter"]) is not None
+    assert cache.get(keys["other_subject"]) is not None
+
+
+def test_fill_started_before_invalidation_is_discarded():
+    cache = ResponseCache(ttl=60)
+    generation = cache.generation()
+    cache.invalidate_chapter("Physics", "11", "English", "PH01")
+    cache.put(cache_key({"subject": "Physics"}), b"[]", {}, generation)
+    assert cache.get(cache_key({"subject": "Physics"})) is None
+
+
+@pytest.fixture
+def qbank(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, content=b'[{"id": 1}]', headers={"X-Next-After-Id": "1"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry = ServiceRegistry()
+    registry.register("general_qbank", "http://qbank")
+    monkeypatch.setattr(gateway_main, "service_registry", registry)
+    monkeypatch.setattr(gateway_main.upstreams, "client_for", lambda service_name: client)
+    monkeypatch.setattr(gateway_main, "response_cache", ResponseCache(ttl=60))
+    monkeypatch.setattr(internal, "INTERNAL_API_TOKEN", "s3cret")
+    return requests
+
+
+def test_gateway_serves_repeat_reads_from_cache_until_invalidated(qbank):
+    params = {"subject": "Physics", "grade": "11", "medium": "English", "chapter_id": "PH01"}
+    with TestClient(gateway_main.app) as client:
+        first = client.get("/questions", params=params)
+        second = client.get("/questions", params=dict(reversed(params.items())))
+        # Unauthenticated callers cannot flush the cache
+        assert client.post("/internal/questions/invalidate", json=params).status_code == 403
+        assert client.get("/questions", params=params).headers["X-Cache"] == "HIT"
+        client.post("/internal/questions/invalidate", json=params, headers={"X-Internal-Token": "s3cret"})
+        third = client.get("/questions", params=params)
+
+    assert [r.headers["X-Cache"] for r in (first, second, third)] == ["MISS", "HIT", "MISS"]
+    assert second.content == b'[{"id": 1}]'
+    assert second.headers["X-Next-After-Id"] == "1"
+    assert len(qbank) == 2
+
+
+def test_forward_params_drops_unset_values():
+    params = gateway_main._forward_params(subject="Physics", grade="", medium=None, option_count=0, include_total=True)
+    assert params == {"subject": "Physics", "option_count": 0, "include_total": "true"}
+    assert gateway_main._forward_params(include_total=False) == {}
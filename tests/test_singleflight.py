@@ -0,0 +1,104 @@
+import asyncio
+import io
+
+import pytest
+
+from src.services.gateway.singleflight import SharedFile, SingleFlight
+
+
+async def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*[flights.do("key", fetch) for _ in range(10)])
+
+    assert results == [1] * 10
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "shared": 9}
+    # Once finished, the next call starts afresh
+    assert await flights.do("key", fetch) == 2
+
+
+async def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(*[flights.do("key", fail) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+async def test_cancelled_caller_does_not_cancel_shared_work():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.create_task(flights.do("key", fetch))
+    second = asyncio.create_task(flights.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+def test_shared_file_closes_after_last_reader():
+    fileobj = io.BytesIO(b"abcdefgh")
+    shared = SharedFile(fileobj)
+    shared.share(2)
+
+    first, second = shared.iter_chunks(3), shared.iter_chunks(3)
+    assert next(first) == b"abc"
+    assert b"".join(second) == b"abcdefgh"
+    assert not fileobj.closed
+    assert next(first) == b"def"
+    assert b"".join(first) == b"gh"
+    assert fileobj.closed
+
+
+async def test_waiter_cancelled_after_result_gives_up_its_share():
+    flights = SingleFlight()
+    fileobj = io.BytesIO(b"pdf")
+
+    async def build():
+        await asyncio.sleep(0.01)
+        return SharedFile(fileobj)
+
+    hooks = {"on_shared": lambda result, waiters: result.share(waiters), "on_abandoned": lambda result: result.release()}
+    first = asyncio.create_task(flights.do("key", build, **hooks))
+    second = asyncio.create_task(flights.do("key", build, **hooks))
+    await asyncio.sleep(0)
+    # The build has finished and both callers were counted, but neither has resumed yet
+    await flights._flights["key"].task
+    second.cancel()
+
+    shared = await first
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    assert b"".join(shared.iter_chunks(2)) == b"pdf"
+    assert fileobj.closed
+
+
+def test_closing_an_unread_reader_releases_its_share_once():
+    fileobj = io.BytesIO(b"abcdefgh")
+    shared = SharedFile(fileobj)
+    shared.share(2)
+
+    unread = shared.iter_chunks(3)
+    unread.close()
+    unread.close()
+    assert not fileobj.closed
+    assert list(unread) == []
+
+    assert b"".join(shared.iter_chunks(3)) == b"abcdefgh"
+    assert fileobj.closed
@@ -1,5 +1,7 @@
+import random
+
 import pytest
-from src.shared.utils.text_utils import chunk_text
+from src.shared.utils.text_utils import chunk_text, estimate_tokens, iter_chunks
 
 def test_chunk_text_small():
     text = "This is a small text."
@@ -28,3 +30,71 @@ def test_chunk_text_long_line():
 
 def test_chunk_text_empty():
     assert chunk_text("") == []
+
+def test_estimate_tokens_weights_scripts():
+    assert estimate_tokens("abcd" * 10) == 10
+    sinhala = "ගුරුත්වාකර්ෂණය" * 10
+    assert estimate_tokens(sinhala) > estimate_tokens("x" * len(sinhala))
+    assert estimate_tokens(sinhala, "groq") > estimate_tokens(sinhala, "gemini")
+
+def test_iter_chunks_respects_token_budget():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(100))
+    chunks = list(iter_chunks(text, max_tokens=200))
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 200 for c in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+def test_iter_chunks_starts_sections_at_headings():
+    body = "\n\n".join("sentence " * 30 for _ in range(4))
+    text = f"Chapter 1 Motion\n\n{body}\n\nChapter 2 Forces\n\n{body}"
+    chunks = list(iter_chunks(text, max_tokens=400))
+    assert any(c.startswith("Chapter 2 Forces") for c in chunks)
+    assert not any(c.endswith("Chapter 2 Forces") for c in chunks)
+
+def test_iter_chunks_overlap():
+    paragraphs = [f"p{i} " + "x " * 20 for i in range(10)]
+    chunks = list(iter_chunks("\n\n".join(paragraphs), max_tokens=40, overlap_tokens=15))
+    # Each chunk repeats the last paragraph of the one before it
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_paragraph = previous.split("\n\n")[-1]
+        assert chunk.startswith(last_paragraph)
+
+def test_iter_chunks_is_lazy_over_pages():
+    pulled = []
+    def pages():
+        for i in range(50):
+            pulled.append(i)
+            yield "text " * 100
+    first = next(iter_chunks(pages(), max_tokens=150))
+    assert first
+    assert len(pulled) < 50
+
+def test_iter_chunks_keeps_heading_that_cannot_share_a_chunk():
+    chunks = list(iter_chunks(["Page one text.\n\nMore.", "Chapter 2\n\nStuff here"], 6))
+    assert "".join("".join(chunks).split()) == "".join("Page one text. More. Chapter 2 Stuff here".split())
+    assert "Chapter 2" not in chunks
+
+def test_iter_chunks_loses_no_text_and_stays_in_budget():
+    words = ["force", "ගුරුත්වාකර්ෂණය", "விசை", "ශක්තිය", "x" * 30, "a"]
+    headings = ["Chapter 2", "# Heading", "1.2 Motion"]
+    for seed in range(300):
+        rng = random.Random(seed)
+        pages = []
+        for _ in range(rng.randint(1, 3)):
+            paragraphs = []
+            for _ in range(rng.randint(1, 6)):
+                if rng.random() < 0.3:
+                    paragraphs.append(rng.choice(headings))
+                    continue
+                lines = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 25))) for _ in range(rng.randint(1, 3))]
+                paragraphs.append("\n".join(lines))
+            pages.append("\n\n".join(paragraphs))
+        pages.append("end")
+        budget = rng.randint(20, 80)
+        provider = rng.choice([None, "groq", "gemini"])
+        chunks = list(iter_chunks(pages, max_tokens=budget, provider=provider))
+
+        assert "".join("".join(chunks).split()) == "".join("".join(pages).split())
+        assert all(estimate_tokens(c, provider) <= budget for c in chunks)
+        # Headings always travel with the text that follows them
+        assert not any(c in headings or c.split("\n\n")[-1] in headings for c in chunks)
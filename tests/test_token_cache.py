@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from src.services.gateway.token_cache import TokenCache
+from src.shared.utils.auth import create_access_token
+from tests.helpers import FakeClock
+
+
+def make_token(sub: str, token_type: str = "api_key", minutes: int = 60) -> str:
+    return create_access_token({"sub": sub, "type": token_type}, expires_delta=timedelta(minutes=minutes))
+
+
+def test_cache_hit_after_put():
+    cache = TokenCache(maxsize=10, ttl=60)
+    token = make_token("key-1")
+    assert cache.get(token) is None
+    cache.put(token, {"status": "valid", "user": "admin"})
+    assert cache.get(token) == {"status": "valid", "user": "admin"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock(1_000_000_000.0)
+    cache = TokenCache(maxsize=10, ttl=30, timer=clock)
+    token = make_token("key-1")
+    cache.put(token, {"status": "valid"})
+    clock.now += 31
+    assert cache.get(token) is None
+
+
+def test_expired_jwt_is_not_cached():
+    cache = TokenCache(maxsize=10, ttl=60)
+    token = make_token("key-1", minutes=-1)
+    cache.put(token, {"status": "valid"})
+    assert cache.get(token) is None
+
+
+def test_invalidate_by_subject():
+    cache = TokenCache(maxsize=10, ttl=60)
+    revoked = make_token("key-1")
+    other = make_token("key-2")
+    cache.put(revoked, {"status": "valid"})
+    cache.put(other, {"status": "valid"})
+
+    assert cache.invalidate("api_key", "key-1") == 1
+    assert cache.get(revoked) is None
+    assert cache.get(other) is not None
+
+
+def test_lru_bound():
+    cache = TokenCache(maxsize=2, ttl=60)
+    tokens = [make_token(f"key-{i}") for i in range(3)]
+    for token in tokens:
+        cache.put(token, {"status": "valid"})
+    assert cache.get(tokens[0]) is None
+    assert cache.get(tokens[2]) is not None
+
+
+def test_verification_in_flight_during_invalidation_is_not_cached():
+    cache = TokenCache(maxsize=10, ttl=60)
+    revoked = make_token("key-1")
+    other = make_token("key-2")
+    generation, other_generation = cache.generation(revoked), cache.generation(other)
+
+    # The revocation arrives while both verifications are still in flight
+    cache.invalidate("api_key", "key-1")
+    cache.put(revoked, {"status": "valid"}, generation)
+    cache.put(other, {"status": "valid"}, other_generation)
+
+    assert cache.get(revoked) is None
+    assert cache.get(other) is not None
+    # A verification started after the revocation is cached as usual
+    cache.put(revoked, {"status": "valid"}, cache.generation(revoked))
+    assert cache.get(revoked) is not None